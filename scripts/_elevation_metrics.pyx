@@ -0,0 +1,56 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+==============================================================================
+Elevation Metrics Kernel (optional C extension)
+==============================================================================
+Module: _elevation_metrics.pyx
+Purpose: Single-pass max/min/gain/loss over an int32 elevation profile
+Author: Road Explorer Portugal
+==============================================================================
+
+Optional speed-up for elevation.calculate_elevation_metrics() on very long
+profiles (e.g. dense terrain-RGB sampling). elevation.py uses it when the
+compiled module is importable and falls back to Numba/NumPy otherwise.
+
+The kernel takes int32 (const int[::1]), not int16: calculate_elevation_metrics()
+already holds the profile as contiguous int32 for the NumPy/Numba paths, so
+the same buffer is passed without another cast or copy.
+
+Build in place (from scripts/):
+    pip install cython
+    CFLAGS="-O3 -march=native" cythonize -i _elevation_metrics.pyx
+==============================================================================
+"""
+
+from libc.stdint cimport int64_t
+
+
+def metrics(const int[::1] a):
+    """
+    Max, min, cumulative gain and loss in one streaming pass.
+
+    Args:
+        a: Contiguous int32 elevations (at least one value)
+
+    Returns:
+        tuple: (max, min, gain, loss)
+    """
+    cdef Py_ssize_t i, n = a.shape[0]
+    cdef int v, d
+    cdef int mx = a[0]
+    cdef int mn = a[0]
+    cdef int64_t gain = 0
+    cdef int64_t loss = 0
+
+    with nogil:
+        for i in range(1, n):
+            v = a[i]
+            d = v - a[i - 1]
+            gain += d if d > 0 else 0
+            loss += -d if d < 0 else 0
+            if v > mx:
+                mx = v
+            elif v < mn:
+                mn = v
+
+    return mx, mn, gain, loss
@@ -0,0 +1,148 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+==============================================================================
+Route Geometry Kernel (optional C extension)
+==============================================================================
+Module: _geom_kernel.pyx
+Purpose: Haversine length + spherical Douglas-Peucker of a route in one kernel
+Author: Road Explorer Portugal
+==============================================================================
+
+Optional speed-up for metrics.measure_and_simplify() on long Layer-4
+routes. The length is accumulated while the unit vectors for the
+simplification are written, so the coordinates are read once; the DP scan
+and the compaction of kept rows run on that buffer without the GIL.
+metrics.py uses it when the compiled module is importable and falls back
+to haversine_path_km() + douglas_peucker() otherwise (same offsets).
+
+Build in place (from scripts/):
+    pip install cython
+    CFLAGS="-O3 -march=native" cythonize -i _geom_kernel.pyx
+==============================================================================
+"""
+
+import numpy as np
+
+from libc.math cimport asin, cos, fabs, sin, sqrt, M_PI
+
+
+cdef inline double _arc(double dx, double dy, double dz) nogil:
+    """Angle (radians) subtended by a chord between two unit vectors."""
+    cdef double half = sqrt(dx * dx + dy * dy + dz * dz) * 0.5
+    return 2.0 * asin(half if half < 1.0 else 1.0)
+
+
+def simplify_route(const double[:, ::1] coords, double tolerance, double radius_km):
+    """
+    Haversine length and Douglas-Peucker simplification of a (lon, lat) route.
+
+    Args:
+        coords: Contiguous (N, 2) float64 array of (lon, lat), N >= 1
+        tolerance: Maximum deviation in radians (epsilon_m / earth radius)
+        radius_km: Earth radius used for the length
+
+    Returns:
+        tuple: (length_km, kept (M, 2) float64 array)
+    """
+    cdef Py_ssize_t n = coords.shape[0]
+    cdef Py_ssize_t i, j, k, best_k, top, m
+    cdef double to_rad = M_PI / 180.0
+    cdef double lon, lat, cos_lat, prev_lon, prev_lat, prev_cos, s_lat, s_lon
+    cdef double total = 0.0
+    cdef double ax, ay, az, bx, by, bz, nx, ny, nz, ux, uy, uz, vx, vy, vz
+    cdef double px, py, pz, length, d, best
+    cdef bint degenerate
+
+    xyz_arr = np.empty((n, 3), dtype=np.float64)
+    keep_arr = np.zeros(n, dtype=np.uint8)
+    stack_arr = np.empty(2 * n + 2, dtype=np.intp)
+    cdef double[:, ::1] xyz = xyz_arr
+    cdef unsigned char[::1] keep = keep_arr
+    cdef Py_ssize_t[::1] stack = stack_arr
+
+    with nogil:
+        # Pass 1: unit vectors and haversine length together
+        for i in range(n):
+            lon = coords[i, 0] * to_rad
+            lat = coords[i, 1] * to_rad
+            cos_lat = cos(lat)
+            xyz[i, 0] = cos_lat * cos(lon)
+            xyz[i, 1] = cos_lat * sin(lon)
+            xyz[i, 2] = sin(lat)
+            if i > 0:
+                s_lat = sin((lat - prev_lat) * 0.5)
+                s_lon = sin((lon - prev_lon) * 0.5)
+                total += asin(sqrt(s_lat * s_lat + prev_cos * cos_lat * s_lon * s_lon))
+            prev_lon = lon
+            prev_lat = lat
+            prev_cos = cos_lat
+
+        # Pass 2: Douglas-Peucker keep mask (explicit stack of spans)
+        keep[0] = 1
+        keep[n - 1] = 1
+        top = 0
+        if n > 2:
+            stack[0] = 0
+            stack[1] = n - 1
+            top = 2
+
+        while top > 0:
+            top -= 2
+            i = stack[top]
+            j = stack[top + 1]
+            if j - i < 2:
+                continue
+
+            ax = xyz[i, 0]; ay = xyz[i, 1]; az = xyz[i, 2]
+            bx = xyz[j, 0]; by = xyz[j, 1]; bz = xyz[j, 2]
+            nx = ay * bz - az * by
+            ny = az * bx - ax * bz
+            nz = ax * by - ay * bx
+            length = sqrt(nx * nx + ny * ny + nz * nz)
+            degenerate = length < 1e-12
+            if not degenerate:
+                nx = nx / length; ny = ny / length; nz = nz / length
+            # p · (n × a) >= 0 and p · (b × n) >= 0  <=>  projection on the arc
+            ux = ny * az - nz * ay; uy = nz * ax - nx * az; uz = nx * ay - ny * ax
+            vx = by * nz - bz * ny; vy = bz * nx - bx * nz; vz = bx * ny - by * nx
+
+            best = -1.0
+            best_k = i + 1
+            for k in range(i + 1, j):
+                px = xyz[k, 0]; py = xyz[k, 1]; pz = xyz[k, 2]
+                if degenerate:
+                    d = _arc(px - ax, py - ay, pz - az)
+                elif px * ux + py * uy + pz * uz >= 0 and px * vx + py * vy + pz * vz >= 0:
+                    d = fabs(px * nx + py * ny + pz * nz)
+                    d = asin(d if d < 1.0 else 1.0)
+                else:
+                    d = _arc(px - ax, py - ay, pz - az)
+                    d = min(d, _arc(px - bx, py - by, pz - bz))
+                if d > best:
+                    best = d
+                    best_k = k
+
+            if best > tolerance:
+                keep[best_k] = 1
+                stack[top] = i
+                stack[top + 1] = best_k
+                stack[top + 2] = best_k
+                stack[top + 3] = j
+                top += 4
+
+        m = 0
+        for i in range(n):
+            m += keep[i]
+
+    # Pass 3: compact the kept rows
+    out_arr = np.empty((m, 2), dtype=np.float64)
+    cdef double[:, ::1] out = out_arr
+    with nogil:
+        m = 0
+        for i in range(n):
+            if keep[i]:
+                out[m, 0] = coords[i, 0]
+                out[m, 1] = coords[i, 1]
+                m += 1
+
+    return 2.0 * radius_km * total, out_arr
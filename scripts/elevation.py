@@ -9,33 +9,274 @@ Author: Road Explorer Portugal
 ==============================================================================
 """
 
-import requests
-import time
+import asyncio
+import importlib
+import io
+import logging
+import math
+import re
+import sqlite3
+import numpy as np
 import os
-from typing import List, Tuple, Dict, Optional
-from dotenv import load_dotenv
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Tuple, Dict, Optional
 
+from json_utils import loads as _json_loads  # orjson when installed
 
-# Load environment variables
-load_dotenv()
+if TYPE_CHECKING:
+    import aiohttp
+
+# Network libraries (requests, aiohttp, aiolimiter, dotenv) and optional
+# extras are imported on first use, so callers that only need
+# calculate_elevation_metrics() don't pay their import cost.
+
+# Progress and errors go through logging so callers choose the verbosity
+# (CLI entry points configure a plain INFO handler)
+logger = logging.getLogger(__name__)
 
 
 # ==============================================================================
 # Configuration
 # ==============================================================================
 
-MAPBOX_TOKEN = os.getenv("MAPBOX_TOKEN", "")
 MAPBOX_TILEQUERY_URL = "https://api.mapbox.com/v4/mapbox.mapbox-terrain-v2/tilequery"
-
-# Rate limiting (Mapbox free tier: 100,000 requests/month)
-RATE_LIMIT_DELAY = 0.05  # 50ms delay = max 20 requests/second
+MAPBOX_TERRAIN_TILE_URL = "https://api.mapbox.com/v4/mapbox.mapbox-terrain-v2/{z}/{x}/{y}.mvt"
+
+MAPBOX_TERRAIN_RGB_URL = "https://api.mapbox.com/v4/mapbox.terrain-rgb/{z}/{x}/{y}.pngraw"
+
+# Elevation source for route sampling (None: read ELEVATION_STRATEGY from .env):
+#   "tilequery"   - one Tilequery request per sampled point (default)
+#   "tiles"       - download the terrain vector tiles under the route once and
+#                   resolve elevations locally (needs mapbox-vector-tile)
+#   "terrain-rgb" - bilinear interpolation on locally stored terrain-RGB
+#                   raster tiles, Tilequery as fallback (needs Pillow)
+ELEVATION_STRATEGY: Optional[str] = None
+TILE_ZOOM = 14  # Highest zoom with full contour detail in mapbox-terrain-v2
+TILE_CACHE_SIZE = 64  # Decoded tiles kept in memory
+TILE_GRID_SIZE = 256  # Tiles are rasterized to a 256x256 int16 grid (~7m cells)
+TILE_NODATA = -32768  # Grid value for cells outside every contour polygon
+TERRAIN_RGB_ZOOM = 12  # ~30m pixels over Portugal
+TERRAIN_RGB_TILE_SIZE = 256
+
+# Rate limiting (Mapbox free tier: 100,000 requests/month, 600 requests/minute)
+RATE_LIMIT_PER_SECOND = 20
+RATE_LIMIT_PER_MINUTE = 600
+RATE_LIMIT_DELAY = 1 / RATE_LIMIT_PER_SECOND  # average spacing (used for estimates)
 SAMPLE_INTERVAL = 50  # Sample every Nth point to reduce API calls (increased for long roads)
 
+# Concurrency (Tilequery requests in flight at once, shared keep-alive pool)
+MAX_CONCURRENT_REQUESTS = 16
+REQUEST_TIMEOUT = 10  # seconds
+MAX_RETRIES = 3  # Retries per point after HTTP 429
+DEFAULT_RETRY_AFTER = 1.0  # seconds, when 429 comes without a usable Retry-After
+
+# Persistent elevation cache (shared by all roads and runs)
+CACHE_DIR = Path(__file__).parent / "cache"
+ELEVATION_CACHE_FILE = CACHE_DIR / "elevation_cache.sqlite"
+CACHE_PRECISION = 1e4  # Round to 4 decimals (~11m) so nearby routes share entries
+TERRAIN_RGB_DIR = CACHE_DIR / "terrain_rgb"  # One .npy elevation raster per tile
+
+
+@lru_cache(maxsize=1)
+def _lazy_token() -> str:
+    """Load .env on first use and return MAPBOX_TOKEN ("" if not set)."""
+    from dotenv import load_dotenv
+    load_dotenv()
+    return os.getenv("MAPBOX_TOKEN", "")
+
+
+def _elevation_strategy() -> str:
+    """ELEVATION_STRATEGY override, or the value from the environment/.env."""
+    if ELEVATION_STRATEGY is not None:
+        return ELEVATION_STRATEGY
+    _lazy_token()  # makes sure .env has been loaded
+    return os.getenv("ELEVATION_STRATEGY", "tilequery")
+
+
+@lru_cache(maxsize=None)
+def _optional(module_name: str):
+    """Import an optional dependency on first use (None if not installed)."""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        return None
+
+
+# ==============================================================================
+# Rate Limiters
+# ==============================================================================
+# Token buckets shared by every concurrent Tilequery request. Both must have a
+# token before a request goes out, so bursts run at full speed until either the
+# per-second or the per-minute budget is spent. Module-level so the per-minute
+# budget also holds across consecutive roads in a batch run; the limiters are
+# bound to one event loop, so every batch runs on the same loop (_run_async).
+
+_EVENT_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+@lru_cache(maxsize=1)
+def _get_limiters():
+    """Create (once) the per-minute and per-second token buckets."""
+    from aiolimiter import AsyncLimiter
+    return (
+        AsyncLimiter(max_rate=RATE_LIMIT_PER_MINUTE, time_period=60),
+        AsyncLimiter(max_rate=RATE_LIMIT_PER_SECOND, time_period=1)
+    )
+
+
+def _run_async(coro):
+    """Run a coroutine to completion on the module's persistent event loop."""
+    global _EVENT_LOOP
+    if _EVENT_LOOP is None or _EVENT_LOOP.is_closed():
+        _EVENT_LOOP = asyncio.new_event_loop()
+    return _EVENT_LOOP.run_until_complete(coro)
+
+
+# ==============================================================================
+# HTTP Session
+# ==============================================================================
+# One pooled session for the synchronous requests (single-point lookups and
+# terrain tiles) so HTTPS keep-alive avoids a TLS handshake per call.
+# Transient errors and 429s are retried with exponential backoff.
+
+@lru_cache(maxsize=1)
+def _get_session():
+    """Create (once) a requests session with connection pooling and retries."""
+    from http_utils import create_session
+
+    return create_session(
+        retries=MAX_RETRIES,
+        status_forcelist=(429, 502, 503, 504),
+        pool_size=MAX_CONCURRENT_REQUESTS
+    )
+
+
+# ==============================================================================
+# Elevation Cache
+# ==============================================================================
+# SQLite table of elevations keyed by rounded (lat, lon). Overlapping routes
+# and repeated runs reuse earlier lookups instead of hitting the API again.
+# Only successful lookups are stored; failures are retried on the next run.
+# Writes are batched per route (executemany in one transaction, WAL mode).
+
+_CACHE_DB: Optional[sqlite3.Connection] = None
+
+
+def _get_cache_db() -> sqlite3.Connection:
+    """Open (once) the elevation cache database, creating it if needed."""
+    global _CACHE_DB
+    if _CACHE_DB is None:
+        CACHE_DIR.mkdir(exist_ok=True)
+        _CACHE_DB = sqlite3.connect(ELEVATION_CACHE_FILE)
+        # WAL + NORMAL: commits append to the log without an fsync per write
+        _CACHE_DB.execute("PRAGMA journal_mode=WAL")
+        _CACHE_DB.execute("PRAGMA synchronous=NORMAL")
+        _CACHE_DB.execute(
+            "CREATE TABLE IF NOT EXISTS elev (key INTEGER PRIMARY KEY, ele INTEGER)"
+        )
+        _CACHE_DB.execute(
+            "CREATE TABLE IF NOT EXISTS tiles ("
+            "z INTEGER, x INTEGER, y INTEGER, grid BLOB, PRIMARY KEY (z, x, y))"
+        )
+    return _CACHE_DB
+
+
+def _cache_key(lat: float, lon: float) -> int:
+    """
+    Pack a coordinate rounded to 4 decimals into a single integer key.
+
+    Latitude and longitude are shifted to non-negative ranges and scaled to
+    integers; longitude needs at most 22 bits (360 * 1e4), so it fits below
+    latitude shifted by 24 bits.
+    """
+    lat_key = round((lat + 90) * CACHE_PRECISION)
+    lon_key = round((lon + 180) * CACHE_PRECISION)
+    return (lat_key << 24) | lon_key
+
+
+def _cache_keys(points: np.ndarray) -> np.ndarray:
+    """
+    Vectorized _cache_key() for an (N, 2) array of (lon, lat) points.
+
+    np.round and round() both round half to even, so keys match exactly.
+    """
+    lat_keys = np.round((points[:, 1] + 90) * CACHE_PRECISION).astype(np.int64)
+    lon_keys = np.round((points[:, 0] + 180) * CACHE_PRECISION).astype(np.int64)
+    return (lat_keys << 24) | lon_keys
+
+
+def _cache_get(key: int) -> Optional[int]:
+    """Return the cached elevation for a key, or None on cache miss."""
+    row = _get_cache_db().execute(
+        "SELECT ele FROM elev WHERE key = ?", (key,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _cache_put_many(rows: List[Tuple[int, int]]) -> None:
+    """Store (key, elevation) rows in one transaction."""
+    db = _get_cache_db()
+    with db:
+        db.executemany("INSERT OR IGNORE INTO elev (key, ele) VALUES (?, ?)", rows)
+
 
 # ==============================================================================
 # Elevation Fetching
 # ==============================================================================
 
+def _tilequery_url(lat: float, lon: float) -> str:
+    """Build the Tilequery URL for a point (Mapbox uses lon,lat order)."""
+    return f"{MAPBOX_TILEQUERY_URL}/{lon},{lat}.json"
+
+
+def _tilequery_params() -> Dict[str, str]:
+    """Query parameters shared by every Tilequery request."""
+    return {
+        "access_token": _lazy_token(),
+        "layers": "contour"
+    }
+
+
+def _parse_elevation(data: Dict) -> Optional[int]:
+    """
+    Extract elevation from a Tilequery response.
+
+    Returns:
+        Optional[int]: Elevation of the first contour feature, or None if the
+                       location has no elevation data (e.g. ocean points)
+    """
+    if data.get('features') and len(data['features']) > 0:
+        elevation = data['features'][0]['properties'].get('ele', 0)
+        return int(elevation)
+
+    return None
+
+
+# First "ele" in the payload belongs to the first feature's properties
+_ELE_PATTERN = re.compile(rb'"ele"\s*:\s*(-?\d+(?:\.\d+)?)')
+
+
+def _extract_elevation(content: bytes) -> Optional[int]:
+    """
+    Extract the first feature's elevation straight from the raw response.
+
+    Only features[0].properties.ele is needed, so a single regex search
+    avoids materializing the whole FeatureCollection. Payloads without a
+    match (e.g. no features) go through the full JSON parse.
+
+    Returns:
+        Optional[int]: Elevation in meters, or None if unavailable
+    """
+    match = _ELE_PATTERN.search(content)
+    if match:
+        return int(float(match.group(1)))
+
+    return _parse_elevation(_json_loads(content))
+
+
 def get_elevation_from_mapbox(lat: float, lon: float) -> Optional[int]:
     """
     Get elevation for a single GPS point from Mapbox Tilequery API.
@@ -61,69 +302,224 @@ def get_elevation_from_mapbox(lat: float, lon: float) -> Optional[int]:
     API Limits:
         - Mapbox free tier: 100,000 requests/month
         - Rate limit: 600 requests/minute
-        - Use RATE_LIMIT_DELAY to stay within limits
+        - Route batches are paced by the shared token buckets
 
     Note:
         - Coordinates must be within valid ranges
         - Returns None for ocean points (no elevation data)
         - Accuracy: ±10m for most locations
+        - Results are cached on disk (ELEVATION_CACHE_FILE, ~11m resolution)
     """
 
-    if not MAPBOX_TOKEN:
+    cached = _cache_get(_cache_key(lat, lon))
+    if cached is not None:
+        return cached
+
+    if not _lazy_token():
         return None
 
-    try:
-        # Build API URL (note: Mapbox uses lon,lat order)
-        url = f"{MAPBOX_TILEQUERY_URL}/{lon},{lat}.json"
+    import requests
 
-        # API parameters
-        params = {
-            "access_token": MAPBOX_TOKEN,
-            "layers": "contour"
-        }
-
-        # Make request with timeout
-        response = requests.get(url, params=params, timeout=10)
+    try:
+        # Make request with timeout (note: Mapbox uses lon,lat order)
+        response = _get_session().get(
+            _tilequery_url(lat, lon),
+            params=_tilequery_params(),
+            timeout=REQUEST_TIMEOUT
+        )
         response.raise_for_status()
 
-        # Parse JSON response
-        data = response.json()
-
-        # Extract elevation from first feature
-        if data.get('features') and len(data['features']) > 0:
-            elevation = data['features'][0]['properties'].get('ele', 0)
-            return int(elevation)
+        elevation = _extract_elevation(response.content)
+        if elevation is not None:
+            _cache_put_many([(_cache_key(lat, lon), elevation)])
 
-        # No elevation data available for this location
-        return None
+        return elevation
 
     except requests.Timeout:
-        print(f"   ⚠️  Timeout fetching elevation for ({lat}, {lon})")
+        logger.warning("   ⚠️  Timeout fetching elevation for (%s, %s)", lat, lon)
         return None
     except requests.HTTPError as e:
         if e.response.status_code == 401:
-            print(f"   ❌ Invalid MAPBOX_TOKEN")
+            logger.error("   ❌ Invalid MAPBOX_TOKEN")
         else:
-            print(f"   ⚠️  HTTP error {e.response.status_code} for ({lat}, {lon})")
+            logger.warning("   ⚠️  HTTP error %s for (%s, %s)", e.response.status_code, lat, lon)
         return None
     except Exception as e:
-        print(f"   ⚠️  Error fetching elevation: {e}")
+        logger.warning("   ⚠️  Error fetching elevation: %s", e)
         return None
 
 
+@dataclass
+class _Throttle:
+    """429 back-off state shared by the tasks of one batch."""
+    guard: asyncio.Semaphore  # size 1: throttled tasks resume one at a time
+    until: float = 0.0  # loop time before which no retry should be sent
+
+
+async def _fetch_one(
+    session: "aiohttp.ClientSession",
+    sem: asyncio.Semaphore,
+    throttle: _Throttle,
+    lat: float,
+    lon: float
+) -> Optional[int]:
+    """
+    Fetch elevation for a single point inside a shared aiohttp session.
+
+    The semaphore caps how many Tilequery requests are in flight at once and
+    the stacked token buckets pace them within Mapbox's per-second and
+    per-minute limits; errors are reported and mapped to None, like
+    get_elevation_from_mapbox().
+
+    On 429 the task backs off until the server's Retry-After interval has
+    passed and tries again (up to MAX_RETRIES). The back-off happens outside
+    the concurrency slot, so other tasks keep going, and behind the shared
+    throttle guard, so throttled tasks resume one at a time instead of
+    stampeding together.
+
+    Args:
+        session (aiohttp.ClientSession): Shared session (keep-alive pool)
+        sem (asyncio.Semaphore): Concurrency limit
+        throttle (_Throttle): Shared 429 back-off state
+        lat (float): Latitude
+        lon (float): Longitude
+
+    Returns:
+        Optional[int]: Elevation in meters, or None if unavailable
+    """
+    import aiohttp
+
+    from http_utils import parse_retry_after
+
+    per_minute, per_second = _get_limiters()
+
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            async with sem, per_minute, per_second:
+                async with session.get(_tilequery_url(lat, lon), params=_tilequery_params()) as response:
+                    if response.status != 429 or attempt == MAX_RETRIES:
+                        response.raise_for_status()
+                        content = await response.read()
+                        return _extract_elevation(content)
+
+                    delay = parse_retry_after(response.headers.get("Retry-After"), DEFAULT_RETRY_AFTER)
+
+            logger.debug("   ⏳ 429 for (%s, %s), retrying in %.1fs", lat, lon, delay)
+            now = asyncio.get_running_loop().time
+            throttle.until = max(throttle.until, now() + delay)
+            async with throttle.guard:
+                await asyncio.sleep(max(0.0, throttle.until - now()))
+
+    except asyncio.TimeoutError:
+        logger.warning("   ⚠️  Timeout fetching elevation for (%s, %s)", lat, lon)
+    except aiohttp.ClientResponseError as e:
+        if e.status == 401:
+            logger.error("   ❌ Invalid MAPBOX_TOKEN")
+        else:
+            logger.warning("   ⚠️  HTTP error %s for (%s, %s)", e.status, lat, lon)
+    except Exception as e:
+        logger.warning("   ⚠️  Error fetching elevation: %s", e)
+
+    return None
+
+
+async def _fetch_elevations(points: List[Tuple[float, float]]) -> List[Optional[int]]:
+    """
+    Fetch elevations for many (lon, lat) points concurrently.
+
+    A single TCPConnector is shared by the whole batch so keep-alive
+    amortizes TLS handshakes, and at most MAX_CONCURRENT_REQUESTS calls
+    run at the same time.
+
+    Args:
+        points (List[Tuple[float, float]]): List of (lon, lat) tuples
+
+    Returns:
+        List[Optional[int]]: Elevations in input order (None for failures)
+    """
+    import aiohttp
+
+    sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    throttle = _Throttle(guard=asyncio.Semaphore(1))
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONCURRENT_REQUESTS,
+        limit_per_host=MAX_CONCURRENT_REQUESTS
+    )
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        tasks = [_fetch_one(session, sem, throttle, lat, lon) for lon, lat in points]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    return [None if isinstance(r, BaseException) else r for r in results]
+
+
+def _fetch_missing_elevations(points: np.ndarray) -> List[Optional[int]]:
+    """
+    Resolve elevations for cache misses with the configured strategy.
+
+    Args:
+        points (np.ndarray): (N, 2) array of (lon, lat)
+
+    Returns:
+        List[Optional[int]]: Elevations in input order (None if unavailable)
+    """
+    strategy = _elevation_strategy()
+
+    if strategy == "tiles" and _optional("mapbox_vector_tile") is not None:
+        # Download each terrain vector tile under the route once
+        return _elevations_from_tiles(points)
+
+    fetched: List[Optional[int]] = [None] * len(points)
+    pending = list(range(len(points)))
+
+    if strategy == "terrain-rgb" and _optional("PIL.Image") is not None:
+        # Local rasters first; only failed tiles fall through to Tilequery
+        fetched = _elevations_from_terrain_rgb(points)
+        pending = [i for i, elevation in enumerate(fetched) if elevation is None]
+    elif strategy in ("tiles", "terrain-rgb"):
+        logger.warning("   ⚠️  Optional dependency for %s not installed, using Tilequery", strategy)
+
+    if pending:
+        logger.info("   🔀 Concurrency: %d requests in flight", MAX_CONCURRENT_REQUESTS)
+        logger.info("   ⏱️  Estimated time: %.1fs (rate limit)", len(pending) * RATE_LIMIT_DELAY)
+
+        # Fetch the rest concurrently
+        for i, elevation in zip(pending, _run_async(_fetch_elevations(points[pending]))):
+            fetched[i] = elevation
+
+    return fetched
+
+
+@lru_cache(maxsize=128)
+def _sample_idx(n: int, stride: int) -> np.ndarray:
+    """
+    Indices of every `stride`-th point plus the last one.
+
+    Cached per (n, stride): batch runs reuse the same interval, so the index
+    array is built once and shared (read-only) across routes.
+    """
+    idx = np.arange(0, n, stride, dtype=np.int64)
+    if idx[-1] != n - 1:
+        idx = np.append(idx, n - 1)
+    idx.setflags(write=False)
+    return idx
+
+
 def get_elevations_for_route(
-    coordinates: List[Tuple[float, float]],
+    coordinates: "List[Tuple[float, float]] | np.ndarray",
     sample_interval: int = SAMPLE_INTERVAL
 ) -> List[int]:
     """
     Get elevation data for a route, sampling every Nth point.
 
     Fetches elevation for sampled points along the route to reduce API calls
-    while maintaining reasonable accuracy. Includes rate limiting to respect
-    Mapbox API guidelines.
+    while maintaining reasonable accuracy. Requests are issued concurrently
+    (bounded by MAX_CONCURRENT_REQUESTS) over a shared aiohttp session and
+    paced by token buckets rather than a fixed delay per call.
 
     Args:
-        coordinates (List[Tuple[float, float]]): List of (lon, lat) tuples
+        coordinates: List of (lon, lat) tuples or (N, 2) float64 array
         sample_interval (int): Sample every Nth point (default: 10)
 
     Returns:
@@ -138,53 +534,466 @@ def get_elevations_for_route(
 
     Note:
         - Sampling reduces API calls: 1000 points → 100 calls (interval=10)
-        - Rate limiting: 50ms delay between requests
+        - Concurrency: up to MAX_CONCURRENT_REQUESTS requests in flight
+        - Rate limiting: RATE_LIMIT_PER_SECOND and RATE_LIMIT_PER_MINUTE buckets
         - Failed requests are skipped (not included in result)
         - Always includes first and last point elevations
+        - Cached points (ELEVATION_CACHE_FILE) are not requested again
+        - ELEVATION_STRATEGY=tiles resolves points from terrain vector tiles
+          (one request per tile instead of one per point)
+        - ELEVATION_STRATEGY=terrain-rgb interpolates from local terrain-RGB
+          rasters (no network once tiles are stored)
+        - Synchronous façade over an event loop; call it from sync code only
     """
 
-    if not coordinates or len(coordinates) < 2:
+    if coordinates is None or len(coordinates) < 2:
         return []
 
-    elevations = []
+    # (N, 2) array of (lon, lat)
+    coords = np.asarray(coordinates, dtype=np.float64)
 
     # Sample coordinates at specified interval
     # Always include first and last points
-    sampled_indices = list(range(0, len(coordinates), sample_interval))
-    if sampled_indices[-1] != len(coordinates) - 1:
-        sampled_indices.append(len(coordinates) - 1)
+    sampled_points = coords[_sample_idx(len(coords), sample_interval)]
 
-    print(f"   📊 Sampling {len(sampled_indices)} points from {len(coordinates)} total")
-    print(f"   ⏱️  Estimated time: {len(sampled_indices) * RATE_LIMIT_DELAY:.1f}s")
+    logger.info("   📊 Sampling %d points from %d total", len(sampled_points), len(coords))
 
-    # Fetch elevations with rate limiting
-    for idx, coord_idx in enumerate(sampled_indices):
-        lon, lat = coordinates[coord_idx]
+    # Collapse points that share a cache cell (~11m) so each cell is looked
+    # up once; `inverse` scatters the results back to route order
+    keys, first_index, inverse = np.unique(
+        _cache_keys(sampled_points), return_index=True, return_inverse=True
+    )
+    unique_points = sampled_points[first_index]
 
-        # Fetch elevation
-        elevation = get_elevation_from_mapbox(lat, lon)
+    logger.info("   📍 Unique cells: %d/%d", len(keys), len(sampled_points))
 
-        if elevation is not None:
-            elevations.append(elevation)
+    # Serve what we can from the cache
+    results = [_cache_get(int(key)) for key in keys]
+    missing = [i for i, elevation in enumerate(results) if elevation is None]
 
-        # Rate limiting (except for last request)
-        if idx < len(sampled_indices) - 1:
-            time.sleep(RATE_LIMIT_DELAY)
+    logger.info("   💾 Cache hits: %d/%d", len(results) - len(missing), len(results))
 
-        # Progress indicator every 20 points
-        if (idx + 1) % 20 == 0:
-            print(f"   📍 Progress: {idx + 1}/{len(sampled_indices)} points")
+    if missing and _lazy_token():
+        missing_points = unique_points[missing]
 
-    print(f"   ✅ Fetched {len(elevations)} elevation values")
+        fetched = _fetch_missing_elevations(missing_points)
+
+        # Store the new values for next time (single transaction)
+        new_rows = []
+        for i, elevation in zip(missing, fetched):
+            if elevation is not None:
+                new_rows.append((int(keys[i]), elevation))
+                results[i] = elevation
+        _cache_put_many(new_rows)
+
+    elevations = [results[j] for j in inverse if results[j] is not None]
+
+    logger.info("   ✅ Fetched %d elevation values", len(elevations))
 
     return elevations
 
 
+# ==============================================================================
+# Vector Tile Strategy
+# ==============================================================================
+# Contours in mapbox-terrain-v2 are nested polygons ("area at or above ele"),
+# so a point's elevation is the highest ele among the polygons containing it.
+# This is what Tilequery computes server-side; doing it locally turns one
+# request per point into one request per z14 tile (~2.4km wide).
+
+def _lonlat_to_tile(lon: float, lat: float, zoom: int = TILE_ZOOM) -> Tuple[float, float]:
+    """
+    Convert a coordinate to fractional slippy-map tile coordinates.
+
+    Returns:
+        Tuple[float, float]: (x, y) where the integer part is the tile index
+                             and the fraction is the position inside the tile
+    """
+    n = 2 ** zoom
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+    return x, y
+
+
+def _download_contour_tile(x: int, y: int, zoom: int) -> Tuple[int, List[Tuple[int, List[np.ndarray]]]]:
+    """
+    Download and decode the contour layer of one terrain vector tile.
+
+    Args:
+        x (int): Tile column
+        y (int): Tile row
+        zoom (int): Zoom level
+
+    Returns:
+        Tuple[int, List[Tuple[int, List[np.ndarray]]]]: Tile extent and a list
+        of (ele, rings) per contour polygon, rings in tile pixels (y down)
+    """
+    url = MAPBOX_TERRAIN_TILE_URL.format(z=zoom, x=x, y=y)
+    response = _get_session().get(url, params={"access_token": _lazy_token()}, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+
+    tile = _optional("mapbox_vector_tile").decode(response.content, default_options={"y_coord_down": True})
+    layer = tile.get('contour')
+    if not layer:
+        return 4096, []
+
+    polygons = []
+    for feature in layer['features']:
+        geometry = feature['geometry']
+        if geometry['type'] == 'Polygon':
+            parts = [geometry['coordinates']]
+        elif geometry['type'] == 'MultiPolygon':
+            parts = geometry['coordinates']
+        else:
+            continue
+
+        rings = [np.asarray(ring, dtype=np.float64) for part in parts for ring in part]
+        polygons.append((int(feature['properties'].get('ele', 0)), rings))
+
+    return layer.get('extent', 4096), polygons
+
+
+def _rasterize_contours(extent: int, polygons: List[Tuple[int, List[np.ndarray]]]) -> np.ndarray:
+    """
+    Rasterize contour polygons into an int16 elevation grid.
+
+    Polygons are painted in ascending ele order, so each cell ends up with
+    the highest contour containing its center. Each polygon is filled with a
+    vectorized even-odd scanline: every edge crossing of a row center toggles
+    the cells to its right, and a cumulative sum gives the parity.
+
+    Args:
+        extent (int): Tile extent in pixels
+        polygons: List of (ele, rings) from _download_contour_tile()
+
+    Returns:
+        np.ndarray: (TILE_GRID_SIZE, TILE_GRID_SIZE) int16 grid, rows top-down,
+                    TILE_NODATA where no contour covers the cell
+    """
+    size = TILE_GRID_SIZE
+    cell = extent / size
+    centers = (np.arange(size) + 0.5) * cell
+    grid = np.full((size, size), TILE_NODATA, dtype=np.int16)
+
+    for ele, rings in sorted(polygons, key=lambda polygon: polygon[0]):
+        # All edges of all rings (holes included) for even-odd filling
+        x0 = np.concatenate([ring[:, 0] for ring in rings])
+        y0 = np.concatenate([ring[:, 1] for ring in rings])
+        x1 = np.concatenate([np.roll(ring[:, 0], -1) for ring in rings])
+        y1 = np.concatenate([np.roll(ring[:, 1], -1) for ring in rings])
+
+        rows, edges = np.nonzero((y0 > centers[:, None]) != (y1 > centers[:, None]))
+        if rows.size == 0:
+            continue
+
+        t = (centers[rows] - y0[edges]) / (y1[edges] - y0[edges])
+        x_cross = x0[edges] + t * (x1[edges] - x0[edges])
+
+        # First cell whose center lies right of the crossing
+        cols = np.clip(np.floor(x_cross / cell - 0.5).astype(np.int64) + 1, 0, size)
+
+        toggles = np.zeros((size, size + 1), dtype=np.int32)
+        np.add.at(toggles, (rows, cols), 1)
+        inside = (np.cumsum(toggles[:, :size], axis=1) & 1).astype(bool)
+
+        grid[inside] = ele
+
+    return grid
+
+
+def _encode_grid(grid: np.ndarray) -> bytes:
+    """Delta-encode (mostly zeros for contour plateaus) and zstd-compress a grid."""
+    deltas = np.diff(grid.ravel(), prepend=np.int16(0)).astype(np.int16)
+    return _optional("zstandard").ZstdCompressor(level=3).compress(deltas.tobytes())
+
+
+def _decode_grid(blob: bytes) -> np.ndarray:
+    """Inverse of _encode_grid() (int16 wrap-around cancels out in cumsum)."""
+    deltas = np.frombuffer(_optional("zstandard").ZstdDecompressor().decompress(blob), dtype=np.int16)
+    return np.cumsum(deltas, dtype=np.int16).reshape(TILE_GRID_SIZE, TILE_GRID_SIZE)
+
+
+@lru_cache(maxsize=TILE_CACHE_SIZE)
+def _load_elevation_grid(x: int, y: int, zoom: int = TILE_ZOOM) -> np.ndarray:
+    """
+    Get the elevation grid for one terrain tile.
+
+    Grids are read from the SQLite cache (zstd-compressed int16 blobs) when
+    available; otherwise the tile is downloaded, rasterized and stored.
+    Raises on network/decoding errors so failures are not memoized.
+
+    Args:
+        x (int): Tile column
+        y (int): Tile row
+        zoom (int): Zoom level
+
+    Returns:
+        np.ndarray: (TILE_GRID_SIZE, TILE_GRID_SIZE) int16 elevation grid
+    """
+    persist = _optional("zstandard") is not None
+
+    if persist:
+        row = _get_cache_db().execute(
+            "SELECT grid FROM tiles WHERE z = ? AND x = ? AND y = ?", (zoom, x, y)
+        ).fetchone()
+        if row:
+            return _decode_grid(row[0])
+
+    extent, polygons = _download_contour_tile(x, y, zoom)
+    grid = _rasterize_contours(extent, polygons)
+
+    if persist:
+        db = _get_cache_db()
+        with db:
+            db.execute(
+                "INSERT OR REPLACE INTO tiles (z, x, y, grid) VALUES (?, ?, ?, ?)",
+                (zoom, x, y, _encode_grid(grid))
+            )
+
+    return grid
+
+
+def _elevations_from_tiles(points: List[Tuple[float, float]]) -> List[Optional[int]]:
+    """
+    Resolve elevations for (lon, lat) points from terrain vector tiles.
+
+    Points are grouped by tile so every tile under the route is loaded once;
+    each tile is rasterized to an elevation grid that is kept in an LRU cache
+    and, with zstandard installed, persisted in the SQLite cache.
+
+    Args:
+        points (List[Tuple[float, float]]): List of (lon, lat) tuples
+
+    Returns:
+        List[Optional[int]]: Elevations in input order (None if unavailable)
+    """
+    results: List[Optional[int]] = [None] * len(points)
+
+    by_tile = defaultdict(list)
+    for i, (lon, lat) in enumerate(points):
+        tx, ty = _lonlat_to_tile(lon, lat)
+        by_tile[(int(tx), int(ty))].append((i, tx, ty))
+
+    logger.info("   🧩 Resolving %d points from %d terrain tiles", len(points), len(by_tile))
+
+    for (x, y), members in by_tile.items():
+        try:
+            grid = _load_elevation_grid(x, y)
+        except Exception as e:
+            logger.warning("   ⚠️  Error loading terrain tile %d/%d/%d: %s", TILE_ZOOM, x, y, e)
+            continue
+
+        for i, tx, ty in members:
+            col = min(int((tx - x) * TILE_GRID_SIZE), TILE_GRID_SIZE - 1)
+            row = min(int((ty - y) * TILE_GRID_SIZE), TILE_GRID_SIZE - 1)
+            elevation = int(grid[row, col])
+            if elevation != TILE_NODATA:
+                results[i] = elevation
+
+    return results
+
+
+# ==============================================================================
+# Terrain-RGB Strategy
+# ==============================================================================
+# mapbox.terrain-rgb encodes elevation in the pixel colour:
+#   ele = -10000 + (R * 256 * 256 + G * 256 + B) * 0.1
+# Each tile is downloaded once, decoded to an int16 raster and stored as .npy
+# under TERRAIN_RGB_DIR; later runs memory-map it, so a lookup is four array
+# reads and a bilinear blend instead of an HTTP round-trip.
+
+@lru_cache(maxsize=TILE_CACHE_SIZE)
+def _load_terrain_rgb_tile(x: int, y: int, zoom: int = TERRAIN_RGB_ZOOM) -> np.ndarray:
+    """
+    Get the elevation raster of one terrain-RGB tile (memory-mapped).
+
+    Raises on network/decoding errors so failures are not memoized.
+
+    Args:
+        x (int): Tile column
+        y (int): Tile row
+        zoom (int): Zoom level
+
+    Returns:
+        np.ndarray: (256, 256) int16 elevations in meters, rows top-down
+    """
+    tile_file = TERRAIN_RGB_DIR / f"{zoom}_{x}_{y}.npy"
+
+    if not tile_file.exists():
+        url = MAPBOX_TERRAIN_RGB_URL.format(z=zoom, x=x, y=y)
+        response = _get_session().get(url, params={"access_token": _lazy_token()}, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+
+        image = _optional("PIL.Image").open(io.BytesIO(response.content))
+        rgb = np.asarray(image.convert("RGB"), dtype=np.int32)
+        raster = -10000 + (rgb[..., 0] * 65536 + rgb[..., 1] * 256 + rgb[..., 2]) * 0.1
+
+        TERRAIN_RGB_DIR.mkdir(parents=True, exist_ok=True)
+        np.save(tile_file, np.round(raster).astype(np.int16))
+
+    return np.load(tile_file, mmap_mode="r")
+
+
+def _bilinear(raster: np.ndarray, px: np.ndarray, py: np.ndarray) -> np.ndarray:
+    """
+    Bilinear interpolation at fractional pixel positions (pixel centers at +0.5).
+
+    Positions are clamped to the tile, so the outer half pixel uses the
+    nearest edge values instead of reading the neighbouring tile.
+    """
+    size = raster.shape[0]
+    fx = np.clip(px - 0.5, 0, size - 1)
+    fy = np.clip(py - 0.5, 0, size - 1)
+
+    x0 = np.floor(fx).astype(np.int64)
+    y0 = np.floor(fy).astype(np.int64)
+    x1 = np.minimum(x0 + 1, size - 1)
+    y1 = np.minimum(y0 + 1, size - 1)
+    wx = fx - x0
+    wy = fy - y0
+
+    top = raster[y0, x0] * (1 - wx) + raster[y0, x1] * wx
+    bottom = raster[y1, x0] * (1 - wx) + raster[y1, x1] * wx
+    return top * (1 - wy) + bottom * wy
+
+
+def _elevations_from_terrain_rgb(points: np.ndarray) -> List[Optional[int]]:
+    """
+    Interpolate elevations for (lon, lat) points from terrain-RGB tiles.
+
+    Args:
+        points (np.ndarray): (N, 2) array of (lon, lat)
+
+    Returns:
+        List[Optional[int]]: Elevations in input order (None where the tile
+                             could not be loaded)
+    """
+    results: List[Optional[int]] = [None] * len(points)
+
+    by_tile = defaultdict(list)
+    for i, (lon, lat) in enumerate(points):
+        tx, ty = _lonlat_to_tile(lon, lat, TERRAIN_RGB_ZOOM)
+        by_tile[(int(tx), int(ty))].append((i, tx, ty))
+
+    logger.info("   🗻 Interpolating %d points from %d terrain-RGB tiles", len(points), len(by_tile))
+
+    for (x, y), members in by_tile.items():
+        try:
+            raster = _load_terrain_rgb_tile(x, y)
+        except Exception as e:
+            logger.warning("   ⚠️  Error loading terrain-RGB tile %d/%d/%d: %s", TERRAIN_RGB_ZOOM, x, y, e)
+            continue
+
+        index, tx, ty = (np.array(column) for column in zip(*members))
+        values = _bilinear(
+            raster,
+            (tx - x) * TERRAIN_RGB_TILE_SIZE,
+            (ty - y) * TERRAIN_RGB_TILE_SIZE
+        )
+        for i, value in zip(index, values):
+            results[i] = int(round(value))
+
+    return results
+
+
+def get_elevation_local(lat: float, lon: float) -> Optional[int]:
+    """
+    Get elevation for a single point from the local terrain-RGB rasters.
+
+    Downloads the covering tile on first use; afterwards lookups are served
+    from the memory-mapped raster without any network access.
+
+    Args:
+        lat (float): Latitude
+        lon (float): Longitude
+
+    Returns:
+        Optional[int]: Interpolated elevation in meters, or None if the tile
+                       is unavailable (no Pillow, no token, network error)
+
+    Example:
+        >>> get_elevation_local(40.2833, -7.5000)  # Covilhã
+        672
+    """
+    if _optional("PIL.Image") is None:
+        return None
+
+    return _elevations_from_terrain_rgb(np.array([[lon, lat]], dtype=np.float64))[0]
+
+
+def prefetch_terrain_rgb(bbox: Tuple[float, float, float, float]) -> int:
+    """
+    Download every terrain-RGB tile covering a bounding box.
+
+    Use once for a region (e.g. a batch of roads) so later elevation lookups
+    never touch the network.
+
+    Args:
+        bbox: Bounding box (south, west, north, east), same as osm_bbox
+
+    Returns:
+        int: Number of tiles available locally after the prefetch
+    """
+    south, west, north, east = bbox
+    x_min, y_min = (int(v) for v in _lonlat_to_tile(west, north, TERRAIN_RGB_ZOOM))
+    x_max, y_max = (int(v) for v in _lonlat_to_tile(east, south, TERRAIN_RGB_ZOOM))
+
+    available = 0
+    for x in range(x_min, x_max + 1):
+        for y in range(y_min, y_max + 1):
+            try:
+                _load_terrain_rgb_tile(x, y)
+                available += 1
+            except Exception as e:
+                logger.warning("   ⚠️  Error loading terrain-RGB tile %d/%d/%d: %s", TERRAIN_RGB_ZOOM, x, y, e)
+
+    logger.info("   🗻 %d terrain-RGB tiles available for bbox %s", available, bbox)
+    return available
+
+
 # ==============================================================================
 # Elevation Metrics Calculation
 # ==============================================================================
 
-def calculate_elevation_metrics(elevations: List[int]) -> Dict[str, int]:
+def _metrics_loop(a):
+    """Max/min/gain/loss in one streaming pass (no temporary masks)."""
+    mx = a[0]
+    mn = a[0]
+    gain = 0
+    loss = 0
+    for i in range(1, a.size):
+        v = a[i]
+        d = v - a[i - 1]
+        # Conditional expressions lower to branchless selects
+        gain += d if d > 0 else 0
+        loss += -d if d < 0 else 0
+        if v > mx:
+            mx = v
+        elif v < mn:
+            mn = v
+    return mx, mn, gain, loss
+
+
+@lru_cache(maxsize=1)
+def _get_metrics_kernel():
+    """
+    Pick the fastest available single-pass metrics kernel (on first use).
+
+    Order: compiled C extension (_elevation_metrics.pyx, built with
+    cythonize), then _metrics_loop JIT-compiled by Numba, then None
+    (NumPy path in calculate_elevation_metrics).
+    """
+    extension = _optional("_elevation_metrics")
+    if extension is not None:
+        return extension.metrics
+
+    numba = _optional("numba")
+    if numba is None:
+        return None
+    return numba.njit(cache=True)(_metrics_loop)
+
+
+def calculate_elevation_metrics(elevations: "List[int] | np.ndarray") -> Dict[str, int]:
     """
     Calculate elevation statistics from elevation data.
 
@@ -193,7 +1002,7 @@ def calculate_elevation_metrics(elevations: List[int]) -> Dict[str, int]:
     the simple difference between start and end elevations.
 
     Args:
-        elevations (List[int]): List of elevations in meters (ordered by route)
+        elevations (List[int] | np.ndarray): Elevations in meters (ordered by route)
 
     Returns:
         Dict[str, int]: Dictionary with elevation metrics:
@@ -214,9 +1023,11 @@ def calculate_elevation_metrics(elevations: List[int]) -> Dict[str, int]:
         - Requires at least 2 elevation points
         - Gain/loss are cumulative (sum of all ups/downs)
         - Empty input returns all zeros
+        - Uses the compiled _elevation_metrics extension if built, else a
+          Numba kernel when numba is installed, else NumPy
     """
 
-    if not elevations or len(elevations) < 1:
+    if elevations is None or len(elevations) < 1:
         return {
             'elevation_max': 0,
             'elevation_min': 0,
@@ -224,34 +1035,34 @@ def calculate_elevation_metrics(elevations: List[int]) -> Dict[str, int]:
             'elevation_loss': 0
         }
 
-    # Calculate max and min elevations
-    elevation_max = max(elevations)
-    elevation_min = min(elevations)
+    # Contiguous int32 array: reductions run as vectorized C loops
+    a = np.ascontiguousarray(elevations, dtype=np.int32)
 
-    # Calculate cumulative elevation gain and loss
-    elevation_gain = 0
-    elevation_loss = 0
-
-    for i in range(len(elevations) - 1):
-        diff = elevations[i+1] - elevations[i]
+    # Single-pass kernel: C extension if built, else Numba JIT (see _get_metrics_kernel)
+    kernel = _get_metrics_kernel()
+    if kernel is not None:
+        mx, mn, gain, loss = kernel(a)
+        return {
+            'elevation_max': int(mx),
+            'elevation_min': int(mn),
+            'elevation_gain': int(gain),
+            'elevation_loss': int(loss)
+        }
 
-        if diff > 0:
-            # Going uphill
-            elevation_gain += diff
-        elif diff < 0:
-            # Going downhill
-            elevation_loss += abs(diff)
+    d = np.diff(a)
 
+    # Cumulative gain (uphill diffs) and loss (downhill diffs): clamping with
+    # np.maximum is branchless and avoids building boolean masks
     return {
-        'elevation_max': int(elevation_max),
-        'elevation_min': int(elevation_min),
-        'elevation_gain': int(elevation_gain),
-        'elevation_loss': int(elevation_loss)
+        'elevation_max': int(a.max()),
+        'elevation_min': int(a.min()),
+        'elevation_gain': int(np.maximum(d, 0).sum(dtype=np.int64)),
+        'elevation_loss': int(np.maximum(-d, 0).sum(dtype=np.int64))
     }
 
 
 def calculate_elevation_for_coordinates(
-    coordinates: List[Tuple[float, float]],
+    coordinates: "List[Tuple[float, float]] | np.ndarray",
     sample_interval: int = SAMPLE_INTERVAL
 ) -> Dict[str, int]:
     """
@@ -262,7 +1073,7 @@ def calculate_elevation_for_coordinates(
     elevation data for a route.
 
     Args:
-        coordinates (List[Tuple[float, float]]): List of (lon, lat) tuples
+        coordinates: List of (lon, lat) tuples or (N, 2) float64 array
         sample_interval (int): Sample every Nth point (default: 10)
 
     Returns:
@@ -281,11 +1092,11 @@ def calculate_elevation_for_coordinates(
     Note:
         - This function makes API calls to Mapbox
         - Requires MAPBOX_TOKEN in .env
-        - Uses rate limiting (50ms delay per request)
-        - May take several seconds for long routes
+        - Requests run concurrently (MAX_CONCURRENT_REQUESTS in flight)
+        - May take a few seconds for long routes
     """
 
-    if not coordinates or len(coordinates) < 2:
+    if coordinates is None or len(coordinates) < 2:
         return {
             'elevation_max': 0,
             'elevation_min': 0,
@@ -294,12 +1105,12 @@ def calculate_elevation_for_coordinates(
         }
 
     # Step 1: Fetch elevations for sampled route points
-    print(f"   🏔️  Fetching elevation data...")
+    logger.info("   🏔️  Fetching elevation data...")
     elevations = get_elevations_for_route(coordinates, sample_interval)
 
     # Step 2: Calculate metrics from elevation data
     if not elevations:
-        print(f"   ⚠️  No elevation data retrieved")
+        logger.warning("   ⚠️  No elevation data retrieved")
         return {
             'elevation_max': 0,
             'elevation_min': 0,
@@ -309,11 +1120,11 @@ def calculate_elevation_for_coordinates(
 
     metrics = calculate_elevation_metrics(elevations)
 
-    print(f"   ✅ Elevation metrics calculated:")
-    print(f"      Max: {metrics['elevation_max']}m")
-    print(f"      Min: {metrics['elevation_min']}m")
-    print(f"      Gain: {metrics['elevation_gain']}m")
-    print(f"      Loss: {metrics['elevation_loss']}m")
+    logger.info("   ✅ Elevation metrics calculated:")
+    logger.info("      Max: %dm", metrics['elevation_max'])
+    logger.info("      Min: %dm", metrics['elevation_min'])
+    logger.info("      Gain: %dm", metrics['elevation_gain'])
+    logger.info("      Loss: %dm", metrics['elevation_loss'])
 
     return metrics
 
@@ -322,26 +1133,26 @@ def calculate_elevation_for_coordinates(
 # Helper Functions
 # ==============================================================================
 
-def estimate_api_calls(coordinates: List[Tuple[float, float]], sample_interval: int) -> int:
+def estimate_api_calls(coordinates: "List[Tuple[float, float]] | np.ndarray", sample_interval: int) -> int:
     """
     Estimate number of API calls needed.
 
     Args:
-        coordinates (List[Tuple[float, float]]): List of coordinates
+        coordinates: List of coordinates or (N, 2) array
         sample_interval (int): Sample interval
 
     Returns:
-        int: Estimated number of API calls
+        int: Estimated number of API calls (ceil of points / interval)
     """
-    return len(coordinates) // sample_interval
+    return (len(coordinates) + sample_interval - 1) // sample_interval
 
 
-def estimate_time(coordinates: List[Tuple[float, float]], sample_interval: int) -> float:
+def estimate_time(coordinates: "List[Tuple[float, float]] | np.ndarray", sample_interval: int) -> float:
     """
     Estimate time needed for elevation fetching (with rate limiting).
 
     Args:
-        coordinates (List[Tuple[float, float]]): List of coordinates
+        coordinates: List of coordinates or (N, 2) array
         sample_interval (int): Sample interval
 
     Returns:
@@ -356,13 +1167,16 @@ def estimate_time(coordinates: List[Tuple[float, float]], sample_interval: int)
 # ==============================================================================
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     print("=" * 70)
     print("Elevation Data - Placeholder Test")
     print("=" * 70)
 
     # Check if MAPBOX_TOKEN is set
-    if MAPBOX_TOKEN:
-        print(f"✅ MAPBOX_TOKEN is set (starts with: {MAPBOX_TOKEN[:10]}...)")
+    mapbox_token = _lazy_token()
+    if mapbox_token:
+        print(f"✅ MAPBOX_TOKEN is set (starts with: {mapbox_token[:10]}...)")
     else:
         print("⚠️  MAPBOX_TOKEN not found in .env file")
         print("   Copy .env.example to .env and add your token")
@@ -11,11 +11,19 @@ Author: Road Explorer Portugal
 
 import os
 import json
-import requests
+import numpy as np
+from dataclasses import dataclass, field, fields
+from functools import lru_cache
 from pathlib import Path
-from math import radians, sin, cos, sqrt, atan2
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 
+from http_utils import create_session
+from json_utils import loads, write_json
+from metrics import haversine_km, haversine_path_km
+from polyline_utils import decode_polyline, format_coordinates
+import route_cache
+
 # Load environment
 load_dotenv()
 
@@ -23,69 +31,139 @@ load_dotenv()
 MAPBOX_TOKEN = os.getenv('MAPBOX_TOKEN')
 ROADS_DATA_FILE = Path(__file__).parent / "roads_data.json"
 
-
-def haversine(lon1, lat1, lon2, lat2):
-    """Calculate distance between two points in km."""
-    R = 6371
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    return R * c
+# Directions API request shape (token added per call)
+DIRECTIONS_URL = "https://api.mapbox.com/directions/v5/mapbox/driving/"
+DIRECTIONS_PARAMS = {
+    'geometries': 'polyline6',  # ~half the payload of GeoJSON, decoded with NumPy
+    'overview': 'full',  # Full geometry (all points)
+    'steps': 'false',  # Geometry only: no turn-by-turn steps...
+    'alternatives': 'false'  # ...and no alternative routes in the payload
+}
+TWO_POINT_COORDS_TMPL = "{:.6f},{:.6f};{:.6f},{:.6f}"
 
 
 def calculate_total_distance(coords):
-    """Calculate total distance along path."""
-    if len(coords) < 2:
-        return 0.0
-    total = 0.0
-    for i in range(len(coords) - 1):
-        lon1, lat1 = coords[i]
-        lon2, lat2 = coords[i + 1]
-        total += haversine(lon1, lat1, lon2, lat2)
-    return total
-
-
-def fetch_route_with_waypoints(waypoints, mapbox_token):
+    """Calculate total distance along path (vectorized haversine)."""
+    return haversine_path_km(coords)
+
+
+@lru_cache(maxsize=1)
+def _get_session():
+    """Shared session: keep-alive across waypoint batches, retries on 429/5xx."""
+    return create_session()
+
+
+@dataclass(slots=True)
+class Road:
+    """One roads_data.json entry (slotted: compact and fast attribute access)."""
+    code: str
+    name: str
+    region: str
+    description: str = ""
+    start_point_name: str = ""
+    end_point_name: str = ""
+    surface: str = "asphalt"
+    category: str = ""
+    expected_distance_km: float = 0.0
+    osm_ref: Optional[str] = None
+    osm_bbox: Optional[List[float]] = None
+    intermediate_towns: List[str] = field(default_factory=list)
+    use_external_geometry: bool = False
+    geometry_file: Optional[str] = None
+    # Kept as dicts ('lat', 'lon', 'name'): passed straight to the Directions helpers
+    waypoints: List[Dict[str, Any]] = field(default_factory=list)
+
+
+_ROAD_FIELDS = frozenset(f.name for f in fields(Road))
+
+
+@lru_cache(maxsize=4)
+def _load_roads(path, mtime):
+    """Parse roads_data.json once per (path, mtime); edits invalidate the cache."""
+    try:
+        import msgspec
+    except ImportError:
+        roads = json.loads(Path(path).read_text())
+        return [Road(**{k: v for k, v in road.items() if k in _ROAD_FIELDS}) for road in roads]
+
+    # Decodes straight into Road objects in C (unknown keys are ignored)
+    return msgspec.json.decode(Path(path).read_bytes(), type=List[Road])
+
+
+def _load_roads_data():
+    """Load roads_data.json, reusing the parsed list across process_road calls."""
+    if not ROADS_DATA_FILE.exists():
+        raise FileNotFoundError(f"roads_data.json not found at {ROADS_DATA_FILE}")
+    return _load_roads(str(ROADS_DATA_FILE), ROADS_DATA_FILE.stat().st_mtime)
+
+
+@lru_cache(maxsize=4)
+def _index_roads(path, mtime):
+    """Map road code -> road definition for one (path, mtime) snapshot."""
+    return {road.code: road for road in _load_roads(path, mtime)}
+
+
+def _roads_by_code():
+    """O(1) road lookup table built once per roads_data.json version."""
+    _load_roads_data()  # raises FileNotFoundError if missing
+    return _index_roads(str(ROADS_DATA_FILE), ROADS_DATA_FILE.stat().st_mtime)
+
+
+def _coords_string(waypoints):
     """
-    Fetch route from Mapbox Directions API using multiple waypoints.
+    Format waypoints as "lon1,lat1;lon2,lat2;..." (6 decimals, ~0.1 m).
 
-    Args:
-        waypoints: List of dicts with 'lat' and 'lon' keys
-        mapbox_token: Mapbox API token
+    Waypoints are packed into one (N, 2) array and formatted in a single
+    %-format (format_coordinates) instead of one f-string per dict lookup.
+    """
+    arr = np.fromiter(
+        (v for wp in waypoints for v in (wp['lon'], wp['lat'])),
+        dtype=np.float64,
+        count=2 * len(waypoints)
+    ).reshape(-1, 2)
+    return format_coordinates(arr)
 
-    Returns:
-        tuple: (coordinates list, distance_km, route_info dict)
 
-    Raises:
-        Exception: If API request fails
+def _route_distance(coords, route_info, verify):
+    """Mapbox-reported distance in km, or our haversine recompute when auditing."""
+    if verify:
+        return calculate_total_distance(coords)
+    return route_info['distance_m'] / 1000.0
+
+
+def _request_route(coords_str, mapbox_token, waypoint_count, verify=False):
     """
-    if not waypoints or len(waypoints) < 2:
-        raise ValueError("Need at least 2 waypoints")
+    Request (or load from cache) the Directions route for a coordinates string.
 
-    if len(waypoints) > 25:
-        raise ValueError("Mapbox supports maximum 25 waypoints")
+    Args:
+        coords_str: "lon1,lat1;lon2,lat2;..." waypoint string
+        mapbox_token: Mapbox API token
+        waypoint_count: Number of waypoints in coords_str
+        verify: Recompute the distance from the geometry instead of trusting Mapbox
 
-    # Build coordinates string: "lon1,lat1;lon2,lat2;..."
-    coords_str = ";".join([f"{wp['lon']},{wp['lat']}" for wp in waypoints])
+    Returns:
+        tuple: ((N, 2) float64 coordinates array, distance_km, route_info dict)
+    """
+    url = DIRECTIONS_URL + coords_str
 
-    url = f"https://api.mapbox.com/directions/v5/mapbox/driving/{coords_str}"
+    params = {'access_token': mapbox_token, **DIRECTIONS_PARAMS}
 
-    params = {
-        'access_token': mapbox_token,
-        'geometries': 'geojson',
-        'overview': 'full',  # Full geometry (all points)
-        'steps': 'false'
-    }
+    # Shared Directions cache (route_cache): same key as mapbox_directions()
+    cache_key = route_cache.request_key(url, params)
+    cached = route_cache.get_entry(cache_key)
+    if cached is not None and 'distance_m' in cached[1]:
+        coords, route_info = cached
+        route_info['waypoints_used'] = waypoint_count
+        print(f"   Loaded route from cache ({len(coords)} points)")
+        return coords, _route_distance(coords, route_info, verify), route_info
 
-    print(f"   API request with {len(waypoints)} waypoints...")
+    print(f"   API request with {waypoint_count} waypoints...")
     print(f"   URL: {url[:100]}...")
 
-    response = requests.get(url, params=params, timeout=30)
+    response = _get_session().get(url, params=params, timeout=30)
     response.raise_for_status()
 
-    data = response.json()
+    data = loads(response.content)  # orjson when installed
 
     if data.get('code') != 'Ok':
         raise Exception(f"Mapbox API error: {data.get('code')} - {data.get('message')}")
@@ -96,25 +174,68 @@ def fetch_route_with_waypoints(waypoints, mapbox_token):
 
     route = routes[0]
     geometry = route['geometry']
-    coords = geometry['coordinates']
+    # Contiguous (N, 2) array from here on (distance, WKT and JSON consume it directly)
+    coords = decode_polyline(geometry, precision=6)
 
     route_info = {
         'distance_m': route['distance'],
         'duration_s': route['duration'],
-        'waypoints_used': len(waypoints)
+        'waypoints_used': waypoint_count
     }
 
-    our_distance = calculate_total_distance(coords)
+    route_cache.put(cache_key, coords, {
+        'distance_m': route_info['distance_m'],
+        'duration_s': route_info['duration_s']
+    })
+
+    return coords, _route_distance(coords, route_info, verify), route_info
+
 
-    return coords, our_distance, route_info
+def _fetch_two_point(lon1, lat1, lon2, lat2, mapbox_token, verify=False):
+    """Start/end-only route (no intermediate waypoints): fixed-shape URL, no packing."""
+    coords_str = TWO_POINT_COORDS_TMPL.format(lon1, lat1, lon2, lat2)
+    return _request_route(coords_str, mapbox_token, 2, verify)
 
 
-def process_road(road_code):
+def fetch_route_with_waypoints(waypoints, mapbox_token, verify=False):
+    """
+    Fetch route from Mapbox Directions API using multiple waypoints.
+
+    Args:
+        waypoints: List of dicts with 'lat' and 'lon' keys
+        mapbox_token: Mapbox API token
+        verify: Recompute distance_km with haversine (audit) instead of
+            using the Mapbox-reported route distance
+
+    Returns:
+        tuple: ((N, 2) float64 coordinates array, distance_km, route_info dict)
+
+    Raises:
+        Exception: If API request fails
+    """
+    if not waypoints or len(waypoints) < 2:
+        raise ValueError("Need at least 2 waypoints")
+
+    if len(waypoints) == 2:
+        start, end = waypoints
+        return _fetch_two_point(start['lon'], start['lat'], end['lon'], end['lat'], mapbox_token, verify)
+
+    if len(waypoints) > 25:
+        raise ValueError("Mapbox supports maximum 25 waypoints")
+
+    # Build coordinates string: "lon1,lat1;lon2,lat2;..."
+    coords_str = _coords_string(waypoints)
+
+    return _request_route(coords_str, mapbox_token, len(waypoints), verify)
+
+
+def process_road(road_code, audit=False):
     """
     Process a single road by code, fetching geometry with waypoints.
 
     Args:
         road_code: Road code (e.g., "N222")
+        audit: Also recompute the distance from the geometry and print both
 
     Returns:
         dict: Road data with coordinates
@@ -123,28 +244,17 @@ def process_road(road_code):
     print(f"Processing: {road_code}")
     print("=" * 70)
 
-    # Load roads data
-    if not ROADS_DATA_FILE.exists():
-        raise FileNotFoundError(f"roads_data.json not found at {ROADS_DATA_FILE}")
-
-    with open(ROADS_DATA_FILE, 'r') as f:
-        roads_data = json.load(f)
-
-    # Find the road
-    road_info = None
-    for road in roads_data:
-        if road['code'] == road_code:
-            road_info = road
-            break
+    # Find the road (index cached between calls)
+    road_info = _roads_by_code().get(road_code)
 
     if not road_info:
         raise ValueError(f"Road {road_code} not found in roads_data.json")
 
-    print(f"Name: {road_info['name']}")
-    print(f"Description: {road_info.get('description', 'N/A')}")
+    print(f"Name: {road_info.name}")
+    print(f"Description: {road_info.description or 'N/A'}")
 
     # Check if road has waypoints
-    waypoints = road_info.get('waypoints', [])
+    waypoints = road_info.waypoints
 
     if not waypoints:
         print("\nWARNING: No waypoints defined for this road")
@@ -152,8 +262,8 @@ def process_road(road_code):
 
         # Fallback to start/end
         waypoints = [
-            {"lat": 41.164, "lon": -7.788, "name": road_info['start_point_name']},
-            {"lat": 41.178, "lon": -7.548, "name": road_info['end_point_name']}
+            {"lat": 41.164, "lon": -7.788, "name": road_info.start_point_name},
+            {"lat": 41.178, "lon": -7.548, "name": road_info.end_point_name}
         ]
 
     print(f"\nWaypoints: {len(waypoints)}")
@@ -166,12 +276,13 @@ def process_road(road_code):
     if not MAPBOX_TOKEN:
         raise ValueError("MAPBOX_TOKEN not set in .env")
 
-    coords, distance_km, route_info = fetch_route_with_waypoints(waypoints, MAPBOX_TOKEN)
+    coords, distance_km, route_info = fetch_route_with_waypoints(waypoints, MAPBOX_TOKEN, verify=audit)
 
     print(f"\nRoute fetched successfully!")
     print(f"   Points: {len(coords)}")
     print(f"   Distance (Mapbox): {route_info['distance_m'] / 1000:.2f} km")
-    print(f"   Distance (calculated): {distance_km:.2f} km")
+    if audit:
+        print(f"   Distance (calculated): {distance_km:.2f} km")
     print(f"   Duration: {route_info['duration_s'] / 60:.0f} minutes")
 
     density = len(coords) / distance_km if distance_km > 0 else 0
@@ -186,14 +297,20 @@ def process_road(road_code):
         print(f"   GOOD geometry quality")
 
     # Validate endpoints
-    start_lon, start_lat = coords[0]
-    end_lon, end_lat = coords[-1]
+    start_lon, start_lat = coords[0].tolist()
+    end_lon, end_lat = coords[-1].tolist()
 
     first_wp = waypoints[0]
     last_wp = waypoints[-1]
 
-    start_dist = haversine(start_lon, start_lat, first_wp['lon'], first_wp['lat'])
-    end_dist = haversine(end_lon, end_lat, last_wp['lon'], last_wp['lat'])
+    # Both endpoint checks in one vectorized call
+    endpoints = coords[[0, -1]]
+    start_dist, end_dist = haversine_km(
+        endpoints[:, 0],
+        endpoints[:, 1],
+        np.array([first_wp['lon'], last_wp['lon']]),
+        np.array([first_wp['lat'], last_wp['lat']])
+    ).tolist()
 
     print(f"\nEndpoint validation:")
     print(f"   Start distance from first waypoint: {start_dist:.2f} km")
@@ -201,10 +318,10 @@ def process_road(road_code):
 
     # Build output data
     output_data = {
-        'code': road_info['code'],
-        'name': road_info['name'],
-        'region': road_info['region'],
-        'description': road_info.get('description', ''),
+        'code': road_info.code,
+        'name': road_info.name,
+        'region': road_info.region,
+        'description': road_info.description,
         'point_count': len(coords),
         'distance_km': round(distance_km, 2),
         'density': round(density, 2),
@@ -212,9 +329,9 @@ def process_road(road_code):
         'start_lon': start_lon,
         'end_lat': end_lat,
         'end_lon': end_lon,
-        'start_point_name': road_info.get('start_point_name', ''),
-        'end_point_name': road_info.get('end_point_name', ''),
-        'surface': road_info.get('surface', 'asphalt'),
+        'start_point_name': road_info.start_point_name,
+        'end_point_name': road_info.end_point_name,
+        'surface': road_info.surface,
         'data_source': 'mapbox_waypoints',
         'waypoints_used': len(waypoints),
         'coordinates': coords
@@ -223,38 +340,48 @@ def process_road(road_code):
     return output_data
 
 
+def _linestring_wkt(coords):
+    """WKT LINESTRING for (lon, lat) coords, formatted by GEOS when shapely is installed."""
+    try:
+        import shapely
+    except ImportError:
+        wkt_coords = ", ".join([f"{lon} {lat}" for lon, lat in np.asarray(coords).tolist()])
+        return f"LINESTRING({wkt_coords})"
+
+    # rounding_precision=-1 keeps full float precision (same values as the fallback)
+    return shapely.to_wkt(shapely.LineString(coords), rounding_precision=-1)
+
+
 def save_road_data(road_data):
-    """Save road data to JSON and WKT files."""
+    """Save road data to JSON and WKT files (returns both paths and the WKT)."""
     code = road_data['code']
     output_dir = Path(__file__).parent
 
     # Save JSON
     json_file = output_dir / f"{code}_waypoints_route.json"
-    with open(json_file, 'w') as f:
-        json.dump(road_data, f, indent=2)
+    write_json(json_file, road_data)
     print(f"\nSaved JSON to: {json_file}")
 
     # Save WKT
-    coords = road_data['coordinates']
-    wkt_coords = ", ".join([f"{lon} {lat}" for lon, lat in coords])
-    wkt_geometry = f"LINESTRING({wkt_coords})"
+    wkt_geometry = _linestring_wkt(road_data['coordinates'])
 
     wkt_file = output_dir / f"{code}_waypoints_route.wkt"
     with open(wkt_file, 'w') as f:
         f.write(wkt_geometry)
     print(f"Saved WKT to: {wkt_file}")
 
-    return json_file, wkt_file
+    return json_file, wkt_file, wkt_geometry
 
 
-def generate_sql(road_data, sql_file):
-    """Generate SQL UPDATE statement."""
+def generate_sql(road_data, sql_file, wkt=None):
+    """Generate SQL UPDATE statement (reads the WKT file unless wkt is given)."""
     code = road_data['code']
 
     # Read WKT
-    wkt_file = Path(__file__).parent / f"{code}_waypoints_route.wkt"
-    with open(wkt_file, 'r') as f:
-        wkt = f.read()
+    if wkt is None:
+        wkt_file = Path(__file__).parent / f"{code}_waypoints_route.wkt"
+        with open(wkt_file, 'r') as f:
+            wkt = f.read()
 
     sql = f'''-- Update {code} geometry with Mapbox route using waypoints
 -- This ensures the route follows the actual road path
@@ -289,26 +416,27 @@ WHERE code = '{code}';
     print(f"Saved SQL to: {sql_file}")
 
 
-def main():
-    import sys
-
-    if len(sys.argv) < 2:
-        print("Usage: python fetch_road_with_waypoints.py <ROAD_CODE>")
-        print("Example: python fetch_road_with_waypoints.py N222")
-        return 1
+def run_road(road_code, audit=False):
+    """
+    Fetch, save and generate SQL for one road, printing a summary.
 
-    road_code = sys.argv[1].upper()
+    Args:
+        road_code: Road code (e.g., "N222")
+        audit: Recompute and print our own distance (see process_road)
 
+    Returns:
+        bool: True on success, False if any step failed
+    """
     try:
         # Process road
-        road_data = process_road(road_code)
+        road_data = process_road(road_code, audit)
 
         # Save files
-        json_file, wkt_file = save_road_data(road_data)
+        json_file, wkt_file, wkt = save_road_data(road_data)
 
         # Generate SQL
         sql_file = Path(__file__).parent / f"update_{road_code}_waypoints.sql"
-        generate_sql(road_data, sql_file)
+        generate_sql(road_data, sql_file, wkt)
 
         # Summary
         print(f"\n{'='*70}")
@@ -328,14 +456,41 @@ def main():
         print(f"Next: Run SQL script to update database")
         print(f"{'='*70}")
 
-        return 0
+        return True
 
     except Exception as e:
         print(f"\nERROR: {e}")
         import traceback
         traceback.print_exc()
+        return False
+
+
+def main():
+    import sys
+
+    args = sys.argv[1:]
+    audit = '--audit' in args
+    road_codes = [code.upper() for code in args if code != '--audit']
+
+    if not road_codes:
+        print("Usage: python fetch_road_with_waypoints.py [--audit] <ROAD_CODE> [<ROAD_CODE> ...]")
+        print("Example: python fetch_road_with_waypoints.py N222 N247 N338")
+        print("   --audit  Recompute each route distance and compare with Mapbox")
         return 1
 
+    # One process for the whole batch: the HTTP session, parsed
+    # roads_data.json and Directions cache stay warm between roads
+    failed = [code for code in road_codes if not run_road(code, audit)]
+
+    if len(road_codes) > 1:
+        print(f"\n{'='*70}")
+        print(f"BATCH SUMMARY - {len(road_codes) - len(failed)}/{len(road_codes)} roads processed")
+        if failed:
+            print(f"   Failed: {', '.join(failed)}")
+        print(f"{'='*70}")
+
+    return 1 if failed else 0
+
 
 if __name__ == "__main__":
     exit(main())
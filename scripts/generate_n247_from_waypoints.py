@@ -8,7 +8,8 @@ Purpose: Generate N247 road geometry using waypoints + Directions API
 
 Strategy:
 1. Load 6 waypoints from n247_waypoints.json
-2. Process sections with Directions API (waypoint_i → waypoint_i+1)
+2. Route through all waypoints with Directions API (one request for ≤25
+   waypoints; section-by-section as fallback)
 3. Validate quality (distance ~45km, density ≥2.0 pts/km)
 4. Save as JSON for import into process_roads.py
 
@@ -21,19 +22,24 @@ Why this approach:
 """
 
 import os
-import json
+import numpy as np
 from typing import List, Tuple, Dict
 from pathlib import Path
 from dotenv import load_dotenv
 
 # Import our modules
-from mapbox_directions import mapbox_directions
-from metrics import calculate_total_distance
+from json_utils import read_json, write_json
+from mapbox_directions import (
+    MAX_WAYPOINTS_PER_REQUEST, route_section_by_section, route_through_waypoints
+)
 from validation import get_quality_report
 
 load_dotenv()
 MAPBOX_TOKEN = os.getenv("MAPBOX_TOKEN", "")
 
+# Section requests in flight at once (shared mapbox_directions session)
+MAX_CONCURRENT_SECTIONS = 4
+
 
 def load_waypoints(waypoints_file: str = "n247_waypoints.json") -> Dict:
     """Load waypoints from JSON file."""
@@ -42,8 +48,8 @@ def load_waypoints(waypoints_file: str = "n247_waypoints.json") -> Dict:
     if not file_path.exists():
         raise FileNotFoundError(f"Waypoints file not found: {waypoints_file}")
 
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # orjson when installed (json_utils falls back to json)
+    data = read_json(file_path)
 
     return data
 
@@ -51,11 +57,12 @@ def load_waypoints(waypoints_file: str = "n247_waypoints.json") -> Dict:
 def process_n247_section_by_section(
     waypoints: List[Dict],
     mapbox_token: str
-) -> Tuple[List[Tuple[float, float]], Dict]:
+) -> Tuple[np.ndarray, Dict]:
     """
     Process N247 by generating routes for each section (waypoint_i → waypoint_i+1).
 
-    Uses Directions API to generate route geometry between waypoints.
+    Fallback when route_through_waypoints() fails: one Directions request per
+    section, failures isolated per section (see route_section_by_section()).
 
     NOTE: Directions API optimizes for speed/distance, which may cause detours.
     For N247, this is acceptable as OSM data is too fragmented (174 disconnected
@@ -66,111 +73,13 @@ def process_n247_section_by_section(
         mapbox_token: Mapbox API token
 
     Returns:
-        Tuple of (merged_coordinates, metadata)
+        Tuple of (merged (N, 2) coordinate array, metadata)
     """
-    print(f"\n🗺️  Processing {len(waypoints)-1} sections with Directions API...")
-
-    all_sections = []
-    failed_sections = []
-    total_sections = len(waypoints) - 1
-
-    for i in range(len(waypoints) - 1):
-        wp1 = waypoints[i]
-        wp2 = waypoints[i + 1]
-
-        section_name = f"{wp1['name']} → {wp2['name']}"
-        section_num = i + 1
-
-        print(f"\n🔹 Section {section_num}/{total_sections}: {section_name}")
-
-        # Just use the 2 waypoints (start, end)
-        # Directions API will generate the detailed route
-        section_coords = [
-            (wp1['lon'], wp1['lat']),
-            (wp2['lon'], wp2['lat'])
-        ]
-
-        try:
-            route_coords = mapbox_directions(section_coords, mapbox_token)
-
-            if not route_coords or len(route_coords) < 10:
-                print(f"   ❌ FAILED: Directions API returned too few points")
-                failed_sections.append(section_name)
-                continue
-
-            matched_coords = route_coords
-
-            distance_km = calculate_total_distance(matched_coords)
-            density = len(matched_coords) / distance_km if distance_km > 0 else 0
-
-            print(f"   ✅ SUCCESS")
-            print(f"      Points: {len(matched_coords)}")
-            print(f"      Distance: {distance_km:.2f} km")
-            print(f"      Density: {density:.2f} pts/km")
-
-            all_sections.append({
-                'name': section_name,
-                'coordinates': matched_coords,
-                'distance_km': distance_km
-            })
-
-        except Exception as e:
-            print(f"   ❌ FAILED: {e}")
-            failed_sections.append(section_name)
-
-    # Check if we have enough successful sections
-    success_rate = len(all_sections) / total_sections
-
-    print(f"\n{'='*70}")
-    print(f"📊 Section Processing Results:")
-    print(f"   ✅ Successful: {len(all_sections)}/{total_sections} ({success_rate*100:.0f}%)")
-    print(f"   ❌ Failed: {len(failed_sections)}/{total_sections}")
-    print(f"{'='*70}")
-
-    if success_rate < 0.70:
-        print(f"\n❌ REJECTED: Only {success_rate*100:.0f}% sections successful (need ≥70%)")
-        if failed_sections:
-            print(f"   Failed sections:")
-            for section_name in failed_sections:
-                print(f"   • {section_name}")
-        raise ValueError("Too many sections failed")
-
-    if not all_sections:
-        raise ValueError("No sections processed successfully")
-
-    # Merge sections (remove duplicate points at boundaries)
-    print(f"\n🔗 Merging {len(all_sections)} sections...")
-    merged_coords = []
-
-    for i, section in enumerate(all_sections):
-        coords = section['coordinates']
-
-        if i == 0:
-            # First section: add all points
-            merged_coords.extend(coords)
-        else:
-            # Skip first point if it duplicates last point
-            if merged_coords and coords and merged_coords[-1] == coords[0]:
-                merged_coords.extend(coords[1:])
-            else:
-                merged_coords.extend(coords)
-
-    total_distance = sum(s['distance_km'] for s in all_sections)
-
-    print(f"   🔗 Merged into {len(merged_coords)} total points")
-    print(f"   📏 Total distance: {total_distance:.2f} km")
-
-    return merged_coords, {
-        'sections_successful': len(all_sections),
-        'sections_failed': len(failed_sections),
-        'sections_total': total_sections,
-        'output_points': len(merged_coords),
-        'distance_km': total_distance
-    }
+    return route_section_by_section(waypoints, mapbox_token, max_workers=MAX_CONCURRENT_SECTIONS)
 
 
 def save_n247_geometry(
-    coordinates: List[Tuple[float, float]],
+    coordinates: np.ndarray,
     metadata: Dict,
     output_file: str = "n247_from_waypoints.json"
 ) -> None:
@@ -187,8 +96,7 @@ def save_n247_geometry(
 
     output_path = Path(__file__).parent / output_file
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    write_json(output_path, data)
 
     print(f"\n💾 Saved to {output_file}")
 
@@ -214,16 +122,24 @@ def main():
         print(f"✅ Loaded {len(waypoints)} waypoints")
         print(f"   Expected distance: {expected_distance:.0f} km")
 
-        # Step 2: Process sections with Directions
-        print("\n🗺️  Step 2: Processing sections with Directions API...")
-        print(f"   Strategy: Generate route for each section (waypoint_i → waypoint_i+1)")
+        # Step 2: Route through all waypoints with Directions
+        print("\n🗺️  Step 2: Routing with Directions API...")
+        print(f"   Strategy: One request through all waypoints (max {MAX_WAYPOINTS_PER_REQUEST} per request)")
         print(f"   Sections: {len(waypoints) - 1}")
         print(f"   ⚠️  Note: Directions may optimize routes (potential detours)")
 
-        matched_coords, metadata = process_n247_section_by_section(
-            waypoints,
-            MAPBOX_TOKEN
-        )
+        try:
+            matched_coords, metadata = route_through_waypoints(
+                waypoints,
+                MAPBOX_TOKEN
+            )
+        except Exception as e:
+            # Fall back to one request per section (failures isolated per section)
+            print(f"\n⚠️  Single-request routing failed ({e}), processing section by section...")
+            matched_coords, metadata = process_n247_section_by_section(
+                waypoints,
+                MAPBOX_TOKEN
+            )
 
         # Step 3: Validate quality
         print("\n🔍 Step 3: Validating quality...")
@@ -9,7 +9,8 @@ Purpose: Generate N2 road geometry using waypoints + Map Matching API
 Strategy:
 1. Load 11 waypoints from n2_waypoints.json
 2. Densify waypoints (add intermediate points every ~10-15km)
-3. Process with Map Matching API (in batches if needed)
+3. Route through all waypoints in one Directions request (section by
+   section if that fails)
 4. Validate quality (distance ~739km, density ≥2.0 pts/km)
 5. Save as JSON for import into process_roads.py
 
@@ -22,96 +23,142 @@ Why this approach:
 """
 
 import os
-import json
-from typing import List, Tuple, Dict
+from functools import lru_cache
+from typing import List, Sequence, Tuple, Dict
 from pathlib import Path
-from geopy.distance import geodesic
+from types import MappingProxyType
+import numpy as np
 from dotenv import load_dotenv
 
 # Import our modules
-from mapbox_directions import mapbox_directions
-from metrics import calculate_total_distance
+from json_utils import read_json, write_json
+from mapbox_directions import (
+    MAX_WAYPOINTS_PER_REQUEST, route_section_by_section, route_through_waypoints
+)
+from metrics import haversine_km
 from validation import get_quality_report
 
 load_dotenv()
 MAPBOX_TOKEN = os.getenv("MAPBOX_TOKEN", "")
 
+# Section requests in flight at once (10 sections stay far below the
+# Directions limit of 300 requests/minute)
+MAX_CONCURRENT_SECTIONS = 6
 
-def load_waypoints(waypoints_file: str = "n2_waypoints.json") -> Dict:
-    """Load waypoints from JSON file."""
+# Segments longer than this are densified along the great circle (slerp);
+# below it, straight lines in lon/lat differ from it by far less than a road
+SLERP_MIN_SEGMENT_KM = 100.0
+
+
+@lru_cache(maxsize=8)
+def _read_waypoints(waypoints_file: str) -> Dict:
+    """Parse a waypoints file once per name (see load_waypoints)."""
     file_path = Path(__file__).parent / waypoints_file
 
     if not file_path.exists():
         raise FileNotFoundError(f"Waypoints file not found: {waypoints_file}")
 
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # orjson when installed (json_utils falls back to json)
+    data = read_json(file_path)
 
+    data['waypoints'] = tuple(MappingProxyType(wp) for wp in data['waypoints'])
     return data
 
 
+def load_waypoints(waypoints_file: str = "n2_waypoints.json") -> Dict:
+    """Load waypoints from JSON file (own dict per call; waypoints are read-only and shared)."""
+    return dict(_read_waypoints(waypoints_file))
+
+
 def densify_waypoints(
-    waypoints: List[Dict],
+    waypoints: Sequence[Dict],
     target_spacing_km: float = 10.0
-) -> List[Tuple[float, float]]:
+) -> np.ndarray:
     """
     Densify waypoints by adding intermediate points along straight lines.
 
     This creates a denser set of input points for Map Matching to work with.
     Map Matching will then align these to actual roads.
 
+    Segment lengths (haversine) and all interpolated points are computed
+    with NumPy in one pass; no per-point Python work. Segments longer than
+    SLERP_MIN_SEGMENT_KM are interpolated along the great circle (slerp).
+
     Args:
         waypoints: List of waypoint dicts with 'lat' and 'lon' keys
         target_spacing_km: Target distance between points (default: 10km)
 
     Returns:
-        List of (lon, lat) tuples with densified points
+        (N, 2) float64 array of (lon, lat) with densified points
     """
-    densified = []
+    points = np.array([(wp['lon'], wp['lat']) for wp in waypoints], dtype=np.float64)
+    lon, lat = points[:, 0], points[:, 1]
+
+    # Distance between consecutive waypoints
+    distances_km = haversine_km(lon[:-1], lat[:-1], lon[1:], lat[1:])
 
-    for i in range(len(waypoints) - 1):
-        wp1 = waypoints[i]
-        wp2 = waypoints[i + 1]
+    # Number of intermediate points needed per segment
+    num_intermediates = np.maximum(1, (distances_km / target_spacing_km).astype(np.int64))
 
-        point1 = (wp1['lat'], wp1['lon'])
-        point2 = (wp2['lat'], wp2['lon'])
+    for i, (distance_km, count) in enumerate(zip(distances_km.tolist(), num_intermediates.tolist())):
+        print(f"  {waypoints[i]['name']} → {waypoints[i + 1]['name']}: {distance_km:.1f}km, "
+              f"adding {count} intermediate points")
 
-        # Calculate distance between waypoints
-        distance_km = geodesic(point1, point2).kilometers
+    # Segment i contributes its start waypoint plus (count - 1) interpolated points
+    segment = np.repeat(np.arange(len(num_intermediates)), num_intermediates)
+    offsets = np.cumsum(num_intermediates) - num_intermediates
+    fraction = (np.arange(len(segment)) - offsets[segment]) / num_intermediates[segment]
 
-        # Calculate number of intermediate points needed
-        num_intermediates = max(1, int(distance_km / target_spacing_km))
+    start, end = points[segment], points[segment + 1]
+    densified = start + fraction[:, None] * (end - start)
 
-        print(f"  {wp1['name']} → {wp2['name']}: {distance_km:.1f}km, "
-              f"adding {num_intermediates} intermediate points")
+    # Long segments: follow the great circle instead of the lon/lat straight line
+    long_points = distances_km[segment] > SLERP_MIN_SEGMENT_KM
+    if long_points.any():
+        densified[long_points] = _slerp_lonlat(
+            start[long_points], end[long_points], fraction[long_points]
+        )
 
-        # Add first waypoint (lon, lat format for Mapbox)
-        densified.append((wp1['lon'], wp1['lat']))
+    # Add final waypoint
+    return np.vstack([densified, points[-1:]])
 
-        # Add intermediate points (linear interpolation)
-        for j in range(1, num_intermediates):
-            fraction = j / num_intermediates
 
-            lat = wp1['lat'] + fraction * (wp2['lat'] - wp1['lat'])
-            lon = wp1['lon'] + fraction * (wp2['lon'] - wp1['lon'])
+def _slerp_lonlat(start: np.ndarray, end: np.ndarray, fraction: np.ndarray) -> np.ndarray:
+    """
+    Spherical linear interpolation between (lon, lat) points, element-wise.
 
-            densified.append((lon, lat))
+    Args:
+        start, end: (N, 2) arrays of (lon, lat) in degrees
+        fraction: (N,) position along each great-circle arc (0 = start, 1 = end)
 
-    # Add final waypoint
-    final_wp = waypoints[-1]
-    densified.append((final_wp['lon'], final_wp['lat']))
+    Returns:
+        (N, 2) array of interpolated (lon, lat) in degrees
+    """
+    def to_unit(lonlat):
+        lon, lat = np.radians(lonlat[:, 0]), np.radians(lonlat[:, 1])
+        return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=1)
+
+    v1, v2 = to_unit(start), to_unit(end)
+    omega = np.arccos(np.clip(np.einsum('ij,ij->i', v1, v2), -1.0, 1.0))
+    sin_omega = np.sin(omega)
+
+    v = (np.sin((1 - fraction) * omega)[:, None] * v1
+         + np.sin(fraction * omega)[:, None] * v2) / sin_omega[:, None]
 
-    return densified
+    lon = np.degrees(np.arctan2(v[:, 1], v[:, 0]))
+    lat = np.degrees(np.arcsin(np.clip(v[:, 2], -1.0, 1.0)))
+    return np.stack([lon, lat], axis=1)
 
 
 def process_n2_section_by_section(
     waypoints: List[Dict],
     mapbox_token: str
-) -> Tuple[List[Tuple[float, float]], Dict]:
+) -> Tuple[np.ndarray, Dict]:
     """
     Process N2 by generating routes for each section (waypoint_i → waypoint_i+1).
 
-    Uses Directions API to generate route geometry between waypoints.
+    Fallback when route_through_waypoints() fails: one Directions request per
+    section, failures isolated per section (see route_section_by_section()).
 
     NOTE: Directions API optimizes for speed/distance, which may cause detours.
     For N2, this is acceptable as OSM data is too fragmented and no free GPX
@@ -122,111 +169,13 @@ def process_n2_section_by_section(
         mapbox_token: Mapbox API token
 
     Returns:
-        Tuple of (merged_coordinates, metadata)
+        Tuple of (merged (N, 2) coordinate array, metadata)
     """
-    print(f"\n🗺️  Processing {len(waypoints)-1} sections with Directions API...")
-
-    all_sections = []
-    failed_sections = []
-    total_sections = len(waypoints) - 1
-
-    for i in range(len(waypoints) - 1):
-        wp1 = waypoints[i]
-        wp2 = waypoints[i + 1]
-
-        section_name = f"{wp1['name']} → {wp2['name']}"
-        section_num = i + 1
-
-        print(f"\n🔹 Section {section_num}/{total_sections}: {section_name}")
-
-        # Just use the 2 waypoints (start, end)
-        # Directions API will generate the detailed route
-        section_coords = [
-            (wp1['lon'], wp1['lat']),
-            (wp2['lon'], wp2['lat'])
-        ]
-
-        try:
-            route_coords = mapbox_directions(section_coords, mapbox_token)
-
-            if not route_coords or len(route_coords) < 10:
-                print(f"   ❌ FAILED: Directions API returned too few points")
-                failed_sections.append(section_name)
-                continue
-
-            matched_coords = route_coords
-
-            distance_km = calculate_total_distance(matched_coords)
-            density = len(matched_coords) / distance_km if distance_km > 0 else 0
-
-            print(f"   ✅ SUCCESS")
-            print(f"      Points: {len(matched_coords)}")
-            print(f"      Distance: {distance_km:.2f} km")
-            print(f"      Density: {density:.2f} pts/km")
-
-            all_sections.append({
-                'name': section_name,
-                'coordinates': matched_coords,
-                'distance_km': distance_km
-            })
-
-        except Exception as e:
-            print(f"   ❌ FAILED: {e}")
-            failed_sections.append(section_name)
-
-    # Check if we have enough successful sections
-    success_rate = len(all_sections) / total_sections
-
-    print(f"\n{'='*70}")
-    print(f"📊 Section Processing Results:")
-    print(f"   ✅ Successful: {len(all_sections)}/{total_sections} ({success_rate*100:.0f}%)")
-    print(f"   ❌ Failed: {len(failed_sections)}/{total_sections}")
-    print(f"{'='*70}")
-
-    if success_rate < 0.70:
-        print(f"\n❌ REJECTED: Only {success_rate*100:.0f}% sections successful (need ≥70%)")
-        if failed_sections:
-            print(f"   Failed sections:")
-            for section_name in failed_sections:
-                print(f"   • {section_name}")
-        raise ValueError("Too many sections failed")
-
-    if not all_sections:
-        raise ValueError("No sections processed successfully")
-
-    # Merge sections (remove duplicate points at boundaries)
-    print(f"\n🔗 Merging {len(all_sections)} sections...")
-    merged_coords = []
-
-    for i, section in enumerate(all_sections):
-        coords = section['coordinates']
-
-        if i == 0:
-            # First section: add all points
-            merged_coords.extend(coords)
-        else:
-            # Skip first point if it duplicates last point
-            if merged_coords and coords and merged_coords[-1] == coords[0]:
-                merged_coords.extend(coords[1:])
-            else:
-                merged_coords.extend(coords)
-
-    total_distance = sum(s['distance_km'] for s in all_sections)
-
-    print(f"   🔗 Merged into {len(merged_coords)} total points")
-    print(f"   📏 Total distance: {total_distance:.2f} km")
-
-    return merged_coords, {
-        'sections_successful': len(all_sections),
-        'sections_failed': len(failed_sections),
-        'sections_total': total_sections,
-        'output_points': len(merged_coords),
-        'distance_km': total_distance
-    }
+    return route_section_by_section(waypoints, mapbox_token, max_workers=MAX_CONCURRENT_SECTIONS)
 
 
 def save_n2_geometry(
-    coordinates: List[Tuple[float, float]],
+    coordinates: np.ndarray,
     metadata: Dict,
     output_file: str = "n2_from_waypoints.json"
 ) -> None:
@@ -243,8 +192,8 @@ def save_n2_geometry(
 
     output_path = Path(__file__).parent / output_file
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    # orjson writes the (N, 2) array directly (stdlib json fallback)
+    write_json(output_path, data)
 
     print(f"\n💾 Saved to {output_file}")
 
@@ -270,16 +219,25 @@ def main():
         print(f"✅ Loaded {len(waypoints)} waypoints")
         print(f"   Expected distance: {expected_distance:.0f} km")
 
-        # Step 2: Process sections with Directions
-        print("\n🗺️  Step 2: Processing sections with Directions API...")
-        print(f"   Strategy: Generate route for each section (waypoint_i → waypoint_i+1)")
+        # Step 2: Route through all waypoints with Directions
+        print("\n🗺️  Step 2: Routing with Directions API...")
+        print(f"   Strategy: One request through all waypoints (max {MAX_WAYPOINTS_PER_REQUEST} per request)")
         print(f"   Sections: {len(waypoints) - 1}")
         print(f"   ⚠️  Note: Directions may optimize routes (potential detours)")
 
-        matched_coords, metadata = process_n2_section_by_section(
-            waypoints,
-            MAPBOX_TOKEN
-        )
+        try:
+            # One request for N2's 11 waypoints (instead of ten)
+            matched_coords, metadata = route_through_waypoints(
+                waypoints,
+                MAPBOX_TOKEN
+            )
+        except Exception as e:
+            # Fall back to one request per section (failures isolated per section)
+            print(f"\n⚠️  Single-request routing failed ({e}), processing section by section...")
+            matched_coords, metadata = process_n2_section_by_section(
+                waypoints,
+                MAPBOX_TOKEN
+            )
 
         # Step 3: Validate quality
         print("\n🔍 Step 3: Validating quality...")
@@ -291,6 +249,8 @@ def main():
             'coordinates': matched_coords
         }
 
+        # Reuse the distance already measured while routing (geodesic length
+        # of the merged route, or the per-section sum in the fallback)
         distance_km = metadata['distance_km']
         quality_report = get_quality_report(road_info, matched_coords, distance_km)
 
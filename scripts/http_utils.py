@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+==============================================================================
+HTTP Helpers
+==============================================================================
+Module: http_utils.py
+Purpose: Shared requests.Session factory with connection pooling and retries
+Author: Road Explorer Portugal
+==============================================================================
+
+Transient Mapbox failures (429 rate limiting, 5xx) are retried inside the
+session with exponential backoff, honouring Retry-After, instead of
+aborting a batch run that then has to be redone by hand. TokenBucket paces
+requests to a per-second quota without sleeping when there is headroom.
+==============================================================================
+"""
+
+import threading
+import time
+from typing import Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Retry configuration (backoff: 0.5s, 1s, 2s, 4s, ... unless Retry-After says otherwise)
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_STATUS_FORCELIST = (429, 500, 502, 503, 504)
+DEFAULT_POOL_SIZE = 10
+
+
+def create_session(
+    retries: int = DEFAULT_RETRIES,
+    backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+    status_forcelist: Iterable[int] = DEFAULT_STATUS_FORCELIST,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    raise_on_status: bool = True
+) -> requests.Session:
+    """
+    Create a requests session with keep-alive pooling and automatic retries.
+
+    Args:
+        retries: Maximum retries per request
+        backoff_factor: Exponential backoff base in seconds
+        status_forcelist: HTTP status codes that trigger a retry
+        pool_size: Connections kept alive per host
+        raise_on_status: Raise RetryError when retries run out on a listed
+            status (urllib3 default). With False the last response is
+            returned, so raise_for_status() gives an HTTPError carrying the
+            status code and headers (e.g. 429 + Retry-After)
+
+    Returns:
+        requests.Session: Session with the retrying adapter mounted on https://
+
+    Example:
+        >>> session = create_session()
+        >>> response = session.get(url, params=params, timeout=30)
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=list(status_forcelist),
+        respect_retry_after_header=True,
+        raise_on_status=raise_on_status
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Tokens refill continuously at `rate` per second up to `capacity`; each
+    request takes one. Unlike a fixed sleep before every call, a request
+    only waits when the quota is actually used up, and short bursts (up to
+    `capacity`) go straight through.
+
+    Example:
+        >>> bucket = TokenBucket(rate=5.0, capacity=10)
+        >>> bucket.acquire()   # returns immediately while tokens remain
+        >>> response = session.get(url, timeout=30)
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        """Add the tokens earned since the last update (caller holds the lock)."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        """Take one token, sleeping only as long as needed for it to refill."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self, seconds: float) -> None:
+        """
+        Drain the bucket so no request is let through for `seconds`.
+
+        Args:
+            seconds: Back-off period, e.g. from a 429 Retry-After header
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+
+# One bucket for every Mapbox routing request in the process (Directions and
+# Map Matching run concurrently in the hybrid fallback race): 5 req/s
+# sustained (300/min), bursts of 10
+MAPBOX_RATE_PER_SECOND = 5.0
+MAPBOX_BURST = 10
+MAPBOX_BUCKET = TokenBucket(MAPBOX_RATE_PER_SECOND, MAPBOX_BURST)
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """
+    Parse a Retry-After header value (delta-seconds).
+
+    Shared by the requests-based helpers and elevation.py's aiohttp client.
+
+    Args:
+        value: Header value, or None when the header is absent
+        default: Used when the value is missing or not a number of seconds
+
+    Returns:
+        float: Back-off in seconds
+    """
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def retry_after_seconds(response: requests.Response, default: float = 1.0) -> float:
+    """
+    Seconds to wait according to a response's Retry-After header.
+
+    Args:
+        response: HTTP response (typically a 429)
+        default: Used when the header is missing or not a number of seconds
+
+    Returns:
+        float: Back-off in seconds
+    """
+    return parse_retry_after(response.headers.get("Retry-After"), default)
@@ -29,24 +29,34 @@ Expected Results:
 
 import os
 import json
+import logging
 import time
-from dataclasses import dataclass, asdict
-from typing import List, Tuple, Optional, Dict
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, asdict, replace
+from functools import lru_cache
+from typing import Callable, List, Tuple, Optional, Dict, Union
 from pathlib import Path
 from datetime import datetime, timedelta
-from geopy.distance import geodesic
 
 # Import our modules
+from json_utils import read_json, write_json
+from metrics import haversine_path_km
 from osm_utils import get_road_from_osm
 from mapbox_matching import batch_map_matching, validate_coordinates_for_matching
 from mapbox_directions import get_road_geometry_with_auto_waypoints
 from validation import (
+    PORTUGAL_BOUNDS,
     validate_geometry_density,
     validate_all_points_in_portugal,
     get_quality_report,
     print_quality_report
 )
 
+# Progress goes through logging; formatting is skipped when INFO is off
+# (CLI entry points configure a plain INFO handler)
+logger = logging.getLogger(__name__)
+
 
 # ==============================================================================
 # Configuration
@@ -55,6 +65,14 @@ from validation import (
 CACHE_DIR = Path(__file__).parent / "cache"
 CACHE_MAX_AGE_DAYS = 30
 
+# In-process cache in front of the disk cache (entries per process, seconds)
+MEM_CACHE_MAX_ENTRIES = 256
+MEM_CACHE_TTL_SECONDS = 30 * 60
+
+# Cached coordinates are int32 fixed-point: degrees * 1e6 (~0.1 m, the same
+# precision as polyline6) at half the size of float64
+CACHE_COORD_SCALE = 1_000_000
+
 # Quality thresholds
 MIN_DENSITY = 2.0  # points/km
 MIN_POINTS = 100
@@ -70,8 +88,12 @@ class GeometryResult:
     """
     Result container for road geometry with quality metrics.
 
+    Coordinates are held as one (N, 2) float64 array (16 bytes/point instead
+    of a tuple of two Python floats per point); lists passed in are converted
+    on construction.
+
     Attributes:
-        coordinates: List of (lon, lat) tuples
+        coordinates: (N, 2) float64 array of (lon, lat); coordinates[:, 0] is lon
         source: Data source ('osm_recursive' or 'mapbox_matching')
         quality_report: Quality validation report dict
         point_count: Total number of GPS points
@@ -79,7 +101,7 @@ class GeometryResult:
         distance_km: Total road distance in kilometers
         cached: Whether result came from cache
     """
-    coordinates: List[Tuple[float, float]]
+    coordinates: np.ndarray
     source: str
     quality_report: Dict
     point_count: int
@@ -87,63 +109,226 @@ class GeometryResult:
     distance_km: float
     cached: bool = False
 
+    def __post_init__(self):
+        self.coordinates = np.ascontiguousarray(self.coordinates, dtype=np.float64).reshape(-1, 2)
+
+    def to_list(self) -> List[List[float]]:
+        """Coordinates as [[lon, lat], ...] for JSON/WKT output (the only place lists are needed)."""
+        return self.coordinates.tolist()
+
 
 # ==============================================================================
 # Cache Functions
 # ==============================================================================
 
-def _check_cache(road_ref: str) -> Optional[GeometryResult]:
+# road_ref -> (time.monotonic() when stored, result); insertion order = LRU order
+_MEM_CACHE: Dict[str, Tuple[float, GeometryResult]] = {}
+
+
+def _mem_cache_get(road_ref: str) -> Optional[GeometryResult]:
+    """Return the in-process entry for road_ref if younger than MEM_CACHE_TTL_SECONDS."""
+    entry = _MEM_CACHE.pop(road_ref, None)
+    if entry is None or time.monotonic() - entry[0] > MEM_CACHE_TTL_SECONDS:
+        return None
+
+    _MEM_CACHE[road_ref] = entry  # re-insert as most recently used
+    return entry[1]
+
+
+def _mem_cache_put(road_ref: str, result: GeometryResult) -> None:
+    """Store result in the in-process cache, evicting the least recently used entry."""
+    _MEM_CACHE.pop(road_ref, None)
+    _MEM_CACHE[road_ref] = (time.monotonic(), result)
+
+    if len(_MEM_CACHE) > MEM_CACHE_MAX_ENTRIES:
+        del _MEM_CACHE[next(iter(_MEM_CACHE))]
+
+
+@lru_cache(maxsize=512)
+def _flat_cache_path(road_ref: str, suffix: str = ".json") -> Path:
+    """Unsharded cache file ("N 222" -> cache/N_222.json), as also written by osm_utils."""
+    return CACHE_DIR / (road_ref.replace(" ", "_").replace("/", "_") + suffix)
+
+
+@lru_cache(maxsize=512)
+def _cache_path(road_ref: str, suffix: str) -> Path:
+    """
+    Cache file for road_ref, sharded by first character ("N 222" -> cache/N/N_222.npy).
+
+    Keeps any one directory small as the number of cached roads grows.
+    """
+    name = road_ref.replace(" ", "_").replace("/", "_")
+    return CACHE_DIR / name[:1].upper() / (name + suffix)
+
+
+def _is_expired(cache_file: Path) -> bool:
+    """
+    Check cache age from the file's mtime (one stat, no read/parse).
+
+    Files are rewritten on every save, so mtime tracks cached_at; expired
+    entries are rejected before paying for a load.
+    """
+    age_days = int((time.time() - cache_file.stat().st_mtime) // 86400)
+    if age_days > CACHE_MAX_AGE_DAYS:
+        logger.info("   💾 Cache expired (%sd old), re-fetching...", age_days)
+        return True
+    return False
+
+
+def _replace_atomically(path: Path, write: Callable[[Path], None]) -> None:
+    """
+    Write via a temp file + os.replace().
+
+    Readers may hold the old .npy memory-mapped; truncating it in place
+    would fault their pages, replacing the inode does not.
+    """
+    tmp_file = path.with_name(path.name + ".tmp")
+    write(tmp_file)
+    os.replace(tmp_file, path)
+
+
+def _load_cache_data(road_ref: str) -> Optional[Union[Dict, List]]:
+    """
+    Read the raw cache entry for a road.
+
+    Prefers the .npy + .meta.json pair written by _save_cache(), with the
+    coordinates memory-mapped (no parse, pages come from the OS cache) and
+    rescaled to float64 degrees in one vectorized pass.
+    Falls back to the flat .json file (dict written by previous versions,
+    or osm_utils' plain list). Files older than CACHE_MAX_AGE_DAYS (by
+    mtime) are not opened.
+
+    Returns:
+        Cache dict, legacy coordinate list, or None if missing/expired/unreadable
+    """
+    coords_file = _cache_path(road_ref, ".npy")
+    meta_file = _cache_path(road_ref, ".meta.json")
+
+    # Metadata is written last, so its presence means the pair is complete
+    if meta_file.exists() and coords_file.exists():
+        if _is_expired(meta_file):
+            return None
+        cache_data = read_json(meta_file)
+        coords = np.load(coords_file, mmap_mode='r')
+        scale = cache_data.get('coord_scale')
+        cache_data['coordinates'] = coords / scale if scale else coords
+        return cache_data
+
+    json_file = _flat_cache_path(road_ref, ".json")
+    if not json_file.exists() or _is_expired(json_file):
+        return None
+
+    with open(json_file, 'r') as f:
+        cache_data = json.load(f)
+
+    # FIX: Handle both legacy (list) and new (dict) cache formats
+    # (legacy list from osm_utils.py is returned as-is, see _upgrade_legacy_cache)
+    if not isinstance(cache_data, (list, dict)):
+        logger.warning("   ⚠️  Invalid cache format (type: %s), re-fetching...", type(cache_data))
+        return None
+
+    return cache_data
+
+
+def _upgrade_legacy_cache(
+    road_ref: str,
+    coordinates: List,
+    expected_distance_km: Optional[float]
+) -> Optional[GeometryResult]:
+    """
+    Turn a legacy list-only cache (raw OSM coordinates) into a full entry.
+
+    The list carries no metadata, so it is only accepted if it passes the
+    same checks as fresh OSM data (density, bounds, distance, point count);
+    it is then rewritten in the current format so later runs hit directly.
+
+    Args:
+        road_ref: Road reference
+        coordinates: Cached (lon, lat) list
+        expected_distance_km: Expected road distance (None = cannot validate)
+
+    Returns:
+        GeometryResult if the legacy data is good enough, None otherwise
+    """
+    if not expected_distance_km or len(coordinates) < MIN_POINTS:
+        logger.warning("   ⚠️  Found legacy cache format (no metadata) - validating from scratch")
+        return None
+
+    coords = np.asarray(coordinates, dtype=np.float64)
+    distance_km, _, geo_valid = _analyze_coords(coords)
+    quality_report = _get_quality_report({'code': road_ref}, coords, distance_km, geo_valid)
+    distance_diff_pct = abs(distance_km - expected_distance_km) / expected_distance_km
+
+    if not (quality_report['density_valid'] and quality_report['geo_valid']
+            and distance_diff_pct <= DISTANCE_TOLERANCE):
+        logger.warning("   ⚠️  Legacy cache fails quality checks - validating from scratch")
+        return None
+
+    result = GeometryResult(
+        coordinates=coords,
+        source='osm_recursive',
+        quality_report=quality_report,
+        point_count=len(coords),
+        density=quality_report['density'],
+        distance_km=distance_km,
+        cached=True
+    )
+
+    logger.info("   💾 Cache HIT (legacy format, upgraded): %s", road_ref)
+    _save_cache(road_ref, result)
+    return result
+
+
+def _check_cache(
+    road_ref: str,
+    expected_distance_km: Optional[float] = None
+) -> Optional[GeometryResult]:
     """
     Check if cached geometry exists and is fresh.
 
     Args:
         road_ref: Road reference (e.g., "N 222")
+        expected_distance_km: Expected distance, used to validate legacy
+            list-only cache files before reusing them
 
     Returns:
         GeometryResult if cache hit and fresh, None otherwise
     """
-    if not CACHE_DIR.exists():
-        return None
-
-    # Normalize road_ref for filename
-    cache_filename = road_ref.replace(" ", "_").replace("/", "_") + ".json"
-    cache_file = CACHE_DIR / cache_filename
+    result = _mem_cache_get(road_ref)
+    if result is not None:
+        logger.info("   💾 Cache HIT (memory): %s", road_ref)
+        return result
 
-    if not cache_file.exists():
+    if not CACHE_DIR.exists():
         return None
 
     try:
-        # Load cache data
-        with open(cache_file, 'r') as f:
-            cache_data = json.load(f)
+        cache_data = _load_cache_data(road_ref)
+        if cache_data is None:
+            return None
 
-        # FIX: Handle both legacy (list) and new (dict) cache formats
         if isinstance(cache_data, list):
-            # Legacy format from osm_utils.py - just a list of coordinates
-            # Cannot validate age, but assume it's valid OSM data
-            print(f"   ⚠️  Found legacy cache format (no metadata) - treating as expired")
-            return None  # Force re-fetch to get proper metadata
+            result = _upgrade_legacy_cache(road_ref, cache_data, expected_distance_km)
+            if result is not None:
+                _mem_cache_put(road_ref, result)
+            return result
 
-        elif not isinstance(cache_data, dict):
-            print(f"   ⚠️  Invalid cache format (type: {type(cache_data)}), re-fetching...")
-            return None
+        # Check age (plain arithmetic on the epoch field; ISO parse only for
+        # entries written before it existed)
+        cached_at_epoch = cache_data.get('cached_at_epoch')
+        if cached_at_epoch is None and cache_data.get('cached_at'):
+            cached_at_epoch = datetime.fromisoformat(cache_data['cached_at']).timestamp()
 
-        # Check age
-        cached_at_str = cache_data.get('cached_at')
-        if cached_at_str:
-            cached_at = datetime.fromisoformat(cached_at_str)
-            age = datetime.now() - cached_at
-            age_days = age.days
+        if cached_at_epoch is not None:
+            age_days = int((time.time() - cached_at_epoch) // 86400)
 
             if age_days > CACHE_MAX_AGE_DAYS:
-                print(f"   💾 Cache expired ({age_days}d old), re-fetching...")
+                logger.info("   💾 Cache expired (%sd old), re-fetching...", age_days)
                 return None
 
             # Cache is fresh - reconstruct GeometryResult
-            coordinates = [tuple(coord) for coord in cache_data['coordinates']]
-
             result = GeometryResult(
-                coordinates=coordinates,
+                coordinates=cache_data['coordinates'],
                 source=cache_data['source'],
                 quality_report=cache_data['quality_report'],
                 point_count=cache_data['point_count'],
@@ -152,13 +337,14 @@ def _check_cache(road_ref: str) -> Optional[GeometryResult]:
                 cached=True
             )
 
-            print(f"   💾 Cache HIT: {road_ref} ({age_days}d old)")
-            print(f"      Source: {result.source}, Density: {result.density:.2f} pts/km")
+            logger.info("   💾 Cache HIT: %s (%sd old)", road_ref, age_days)
+            logger.info("      Source: %s, Density: %.2f pts/km", result.source, result.density)
 
+            _mem_cache_put(road_ref, result)
             return result
 
     except Exception as e:
-        print(f"   ⚠️  Cache read error: {e}")
+        logger.warning("   ⚠️  Cache read error: %s", e)
         return None
 
     return None
@@ -168,38 +354,51 @@ def _save_cache(road_ref: str, result: GeometryResult) -> None:
     """
     Save geometry result to cache.
 
+    Coordinates go to a raw (N, 2) int32 fixed-point .npy file (see
+    CACHE_COORD_SCALE) that later hits memory-map; the scalar fields and
+    quality report go to a small .meta.json sidecar.
+
     Args:
         road_ref: Road reference
         result: GeometryResult to cache
     """
+    # Later lookups in this process skip the disk entirely
+    _mem_cache_put(road_ref, replace(result, cached=True))
+
     try:
-        # Create cache directory if doesn't exist
-        CACHE_DIR.mkdir(exist_ok=True)
+        coords_file = _cache_path(road_ref, ".npy")
+        meta_file = _cache_path(road_ref, ".meta.json")
 
-        # Normalize road_ref for filename
-        cache_filename = road_ref.replace(" ", "_").replace("/", "_") + ".json"
-        cache_file = CACHE_DIR / cache_filename
+        # Create cache (shard) directory if doesn't exist
+        coords_file.parent.mkdir(parents=True, exist_ok=True)
 
-        # Prepare cache data
+        # Prepare cache metadata (coordinates are stored separately)
         cache_data = {
             'road_ref': road_ref,
-            'coordinates': result.coordinates,
             'source': result.source,
             'quality_report': result.quality_report,
             'point_count': result.point_count,
             'density': result.density,
             'distance_km': result.distance_km,
-            'cached_at': datetime.now().isoformat()
+            'cached_at': datetime.now().isoformat(),
+            'cached_at_epoch': time.time()
         }
 
-        # Save to file
-        with open(cache_file, 'w') as f:
-            json.dump(cache_data, f, indent=2)
+        # Save coordinates first, metadata last (marks the entry complete)
+        fixed_point = np.rint(result.coordinates * CACHE_COORD_SCALE).astype(np.int32)
+        cache_data['coord_scale'] = CACHE_COORD_SCALE
+
+        def write_coords(path: Path) -> None:
+            with open(path, 'wb') as f:
+                np.save(f, fixed_point)
 
-        print(f"   💾 Cached: {road_ref} ({result.source}, {result.density:.2f} pts/km)")
+        _replace_atomically(coords_file, write_coords)
+        _replace_atomically(meta_file, lambda path: write_json(path, cache_data, indent=False))
+
+        logger.info("   💾 Cached: %s (%s, %.2f pts/km)", road_ref, result.source, result.density)
 
     except Exception as e:
-        print(f"   ⚠️  Cache save error: {e}")
+        logger.warning("   ⚠️  Cache save error: %s", e)
 
 
 # ==============================================================================
@@ -210,24 +409,295 @@ def _calculate_distance(coordinates: List[Tuple[float, float]]) -> float:
     """
     Calculate total distance of coordinate path in kilometers.
 
+    Uses the vectorized haversine from metrics.py (one NumPy/Numba pass)
+    rather than a geodesic call per pair; the ~0.5% spherical error is well
+    inside the ±20% distance tolerance this value is checked against.
+
     Args:
-        coordinates: List of (lon, lat) tuples
+        coordinates: List of (lon, lat) tuples or (N, 2) array
 
     Returns:
         Distance in kilometers
     """
-    if len(coordinates) < 2:
-        return 0.0
+    return haversine_path_km(coordinates)
+
+
+def _analyze_coords(coordinates: Union[List[Tuple[float, float]], np.ndarray]) -> Tuple[float, float, bool]:
+    """
+    Distance, density and Portugal-bounds check from one array conversion.
+
+    The bounds check is a single vectorized reduction instead of the
+    per-point Python loop in validation.py; its result is handed to
+    get_quality_report() so that loop only runs to describe a failure.
+
+    Args:
+        coordinates: List of (lon, lat) tuples or (N, 2) array
+
+    Returns:
+        Tuple of (distance_km, density in pts/km, geo_valid)
+    """
+    coords = np.asarray(coordinates, dtype=np.float64)
+    distance_km = _calculate_distance(coords)
+    density = len(coords) / distance_km if distance_km > 0 else 0.0
+
+    lat_min, lat_max = PORTUGAL_BOUNDS['lat']
+    lon_min, lon_max = PORTUGAL_BOUNDS['lon']
+    lon, lat = coords[:, 0], coords[:, 1]
+    geo_valid = bool(((lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)).all())
+
+    return distance_km, density, geo_valid
+
+
+# ==============================================================================
+# Quality Report Memo
+# ==============================================================================
+
+# Reports computed during the current get_road_geometry_hybrid() call, keyed
+# by a content signature of the coordinates (cleared at the start of each call)
+_quality_reports: Dict[tuple, Dict] = {}
+
+
+def _get_quality_report(
+    road_info: Dict,
+    coordinates: Union[List[Tuple[float, float]], np.ndarray],
+    distance_km: float,
+    geo_valid: Optional[bool] = None
+) -> Dict:
+    """
+    get_quality_report() memoized within one hybrid call.
+
+    The key is (road code, point count, first point, last point, distance
+    rounded to 1 m), so the same geometry seen twice, e.g. a legacy cache
+    list that failed the upgrade and then comes back from osm_utils in
+    step 2, is validated once.
+    """
+    coords = np.asarray(coordinates, dtype=np.float64)
+    key = (
+        road_info.get('code'),
+        len(coords),
+        tuple(coords[0].tolist()),
+        tuple(coords[-1].tolist()),
+        round(distance_km, 3)
+    )
+
+    report = _quality_reports.get(key)
+    if report is None:
+        report = _quality_reports[key] = get_quality_report(
+            road_info, coordinates, distance_km, geo_valid
+        )
+    return report
+
+
+# ==============================================================================
+# Failure Reporting
+# ==============================================================================
+
+def _failure_lines(
+    density: float,
+    density_valid: bool,
+    geo_valid: bool,
+    distance_km: float,
+    expected_distance_km: float,
+    point_count: int
+) -> List[str]:
+    """
+    One "   • reason" line per failed quality check.
+
+    Returns:
+        List of lines (empty if every check passed)
+    """
+    lines = []
+    distance_diff_pct = abs(distance_km - expected_distance_km) / expected_distance_km
+
+    if not density_valid:
+        lines.append(f"   • Density {density:.2f} < {MIN_DENSITY} pts/km")
+    if not geo_valid:
+        lines.append("   • Some points outside Portugal bounds")
+    if distance_diff_pct > DISTANCE_TOLERANCE:
+        lines.append(f"   • Distance {distance_km:.2f}km differs {distance_diff_pct*100:.1f}% "
+                     f"from expected {expected_distance_km}km")
+    if point_count < MIN_POINTS:
+        lines.append(f"   • Only {point_count} points (minimum: {MIN_POINTS})")
+    return lines
 
-    total_distance = 0.0
 
-    for i in range(len(coordinates) - 1):
-        point1 = (coordinates[i][1], coordinates[i][0])  # (lat, lon)
-        point2 = (coordinates[i + 1][1], coordinates[i + 1][0])
-        distance = geodesic(point1, point2).kilometers
-        total_distance += distance
+def _log_failures(header: str, *args) -> None:
+    """
+    Log header plus _failure_lines(*args) as one warning.
 
-    return total_distance
+    The lines are only built when WARNING is enabled, so runs with logging
+    silenced skip the formatting entirely.
+    """
+    if logger.isEnabledFor(logging.WARNING):
+        logger.warning("\n".join([header, *_failure_lines(*args)]))
+
+
+# ==============================================================================
+# Speculative Fallbacks (Layer 3 + Layer 4)
+# ==============================================================================
+
+FALLBACK_LABELS = {
+    'mapbox_matching': "Map Matching",
+    'mapbox_directions': "Directions API",
+}
+
+
+def _validate_candidate(
+    road_info: Dict,
+    coordinates: Optional[List[Tuple[float, float]]],
+    expected_distance_km: float,
+    source: str
+) -> Optional[GeometryResult]:
+    """
+    Run the four quality checks on a fallback geometry.
+
+    Args:
+        road_info: Road info dict (at least 'code')
+        coordinates: Geometry returned by the fallback layer (may be None)
+        expected_distance_km: Expected road distance for validation
+        source: 'mapbox_matching' or 'mapbox_directions'
+
+    Returns:
+        GeometryResult if density, bounds, distance and point count all pass,
+        None otherwise
+    """
+    label = FALLBACK_LABELS[source]
+
+    if coordinates is None or len(coordinates) < 2:
+        logger.warning("   ❌ %s failed to return coordinates", label)
+        return None
+
+    distance_km, _, geo_valid = _analyze_coords(coordinates)
+    quality_report = _get_quality_report(road_info, coordinates, distance_km, geo_valid)
+
+    logger.info("\n📊 %s Quality:", label)
+    if logger.isEnabledFor(logging.INFO):
+        print_quality_report(quality_report)
+
+    density = quality_report['density']
+    geo_valid = quality_report['geo_valid']
+    density_valid = quality_report['density_valid']
+    distance_diff_pct = abs(distance_km - expected_distance_km) / expected_distance_km
+    distance_valid = distance_diff_pct <= DISTANCE_TOLERANCE
+
+    if not (density_valid and geo_valid and distance_valid and len(coordinates) >= MIN_POINTS):
+        _log_failures(f"\n⚠️  {label} quality POOR:", density, density_valid, geo_valid,
+                      distance_km, expected_distance_km, len(coordinates))
+        return None
+
+    return GeometryResult(
+        coordinates=coordinates,
+        source=source,
+        quality_report=quality_report,
+        point_count=len(coordinates),
+        density=density,
+        distance_km=distance_km,
+        cached=False
+    )
+
+
+def _fetch_directions(
+    road_info: Dict,
+    expected_distance_km: float,
+    mapbox_token: str,
+    start_town: str,
+    end_town: str,
+    intermediate_towns: Optional[List[str]] = None
+) -> Optional[np.ndarray]:
+    """Layer 4: Directions API geometry through auto-generated waypoints."""
+    return get_road_geometry_with_auto_waypoints(
+        road_code=road_info['code'],
+        start_town=start_town,
+        end_town=end_town,
+        expected_distance_km=expected_distance_km,
+        mapbox_token=mapbox_token,
+        intermediate_towns=intermediate_towns
+    )
+
+
+def _try_layer4(
+    road_info: Dict,
+    expected_distance_km: float,
+    mapbox_token: str,
+    start_town: str,
+    end_town: str,
+    intermediate_towns: Optional[List[str]] = None
+) -> Optional[GeometryResult]:
+    """
+    Layer 4 on its own: fetch Directions geometry and validate it.
+
+    Used where Map Matching is not worth running (OSM distance >50% off,
+    or too many disconnected segments). The caller caches a success.
+
+    Returns:
+        GeometryResult if the Directions geometry passes, None otherwise
+    """
+    logger.info("\n🔄 Jumping to Layer 4: Directions API with auto-waypoints...")
+
+    result = _validate_candidate(
+        road_info,
+        _fetch_directions(road_info, expected_distance_km, mapbox_token,
+                          start_town, end_town, intermediate_towns),
+        expected_distance_km,
+        'mapbox_directions'
+    )
+
+    if result:
+        distance_diff_pct = abs(result.distance_km - expected_distance_km) / expected_distance_km
+        logger.info("\n✅ Layer 4 SUCCESS - using Directions geometry")
+        logger.info("   Source: mapbox_directions")
+        logger.info("   Distance: %.2fkm (error: %.1f%%)", result.distance_km, distance_diff_pct*100)
+
+    return result
+
+
+def _race_fallbacks(
+    road_info: Dict,
+    osm_coords: List[Tuple[float, float]],
+    expected_distance_km: float,
+    mapbox_token: str,
+    start_town: str,
+    end_town: str,
+    intermediate_towns: Optional[List[str]] = None
+) -> Optional[GeometryResult]:
+    """
+    Run Map Matching (Layer 3) and Directions (Layer 4) concurrently.
+
+    Both requests are sent at once and results are validated in the order
+    they arrive; the first to pass wins and the other is abandoned, so the
+    slower API is no longer on the critical path.
+
+    Returns:
+        GeometryResult from whichever layer passed first, or None if both failed
+    """
+    fetchers = {
+        'mapbox_matching': lambda: batch_map_matching(osm_coords, mapbox_token),
+        'mapbox_directions': lambda: _fetch_directions(
+            road_info, expected_distance_km, mapbox_token,
+            start_town, end_town, intermediate_towns
+        ),
+    }
+
+    executor = ThreadPoolExecutor(max_workers=len(fetchers))
+    try:
+        futures = {executor.submit(fetch): source for source, fetch in fetchers.items()}
+
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                coordinates = future.result()
+            except Exception as e:
+                logger.warning("   ❌ %s error: %s", FALLBACK_LABELS[source], e)
+                continue
+
+            result = _validate_candidate(road_info, coordinates, expected_distance_km, source)
+            if result:
+                return result
+    finally:
+        # Don't wait for the losing request; its result is simply dropped
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return None
 
 
 # ==============================================================================
@@ -259,6 +729,9 @@ def get_road_geometry_hybrid(
        ├─ GOOD → Cache + return
        └─ POOR → Reject (return None)
 
+    When town names are given, steps 4 and 5 run concurrently and the first
+    result to pass validation is used.
+
     Args:
         road_ref: Road reference (e.g., "N 222")
         bbox: Bounding box (south, west, north, east)
@@ -285,124 +758,94 @@ def get_road_geometry_hybrid(
         Source: osm_recursive, Density: 20.07
     """
 
-    print(f"\n{'='*70}")
-    print(f"🔄 HYBRID STRATEGY: {road_ref}")
-    print(f"{'='*70}")
+    _quality_reports.clear()
+
+    logger.info("\n%s", '='*70)
+    logger.info("🔄 HYBRID STRATEGY: %s", road_ref)
+    logger.info("%s", '='*70)
 
     # STEP 1: Check cache
-    print(f"\n📍 Step 1: Checking cache...")
-    cached_result = _check_cache(road_ref)
+    logger.info("\n📍 Step 1: Checking cache...")
+    cached_result = _check_cache(road_ref, expected_distance_km)
     if cached_result:
-        print(f"✅ Using cached geometry ({cached_result.source})")
+        logger.info("✅ Using cached geometry (%s)", cached_result.source)
         return cached_result
 
-    print(f"   💾 Cache MISS - fetching fresh data")
+    logger.info("   💾 Cache MISS - fetching fresh data")
 
     # STEP 2: Try OSM Overpass query
-    print(f"\n📍 Step 2: Fetching from OSM Overpass...")
-    print(f"   Bounding box: S={bbox[0]}, W={bbox[1]}, N={bbox[2]}, E={bbox[3]}")
+    logger.info("\n📍 Step 2: Fetching from OSM Overpass...")
+    logger.info("   Bounding box: S=%s, W=%s, N=%s, E=%s", bbox[0], bbox[1], bbox[2], bbox[3])
 
     osm_coords = get_road_from_osm(road_ref, bbox)
 
     if not osm_coords or len(osm_coords) < 2:
-        print(f"❌ OSM query failed - no coordinates returned")
-        print(f"   Road may not exist in OSM with ref='{road_ref}'")
+        logger.warning("❌ OSM query failed - no coordinates returned")
+        logger.info("   Road may not exist in OSM with ref='%s'", road_ref)
         return None
 
-    print(f"✅ OSM data: {len(osm_coords)} GPS points")
+    logger.info("✅ OSM data: %s GPS points", len(osm_coords))
 
-    # Calculate actual distance
-    distance_km = _calculate_distance(osm_coords)
-    print(f"   📏 Distance: {distance_km:.2f} km (expected: {expected_distance_km:.2f} km)")
+    road_info = {'code': road_ref}
 
-    # STEP 3: Validate OSM quality
-    print(f"\n📍 Step 3: Validating OSM quality...")
+    # Calculate actual distance, density and bounds in one go
+    distance_km, density, geo_valid = _analyze_coords(osm_coords)
+    logger.info("   📏 Distance: %.2f km (expected: %.2f km)", distance_km, expected_distance_km)
 
-    road_info = {'code': road_ref}
-    quality_report = get_quality_report(road_info, osm_coords, distance_km)
+    if density < MIN_DENSITY:
+        # Too few points for the measured length: the full report could
+        # only say POOR, so go straight to the fallbacks
+        logger.info("\n📍 Step 3: Skipped - %.2f pts/km is below %.1f pts/km",
+                    density, MIN_DENSITY)
+        density_valid = False
+    else:
+        # STEP 3: Validate OSM quality
+        logger.info("\n📍 Step 3: Validating OSM quality...")
 
-    # Print quality report
-    print_quality_report(quality_report)
+        quality_report = _get_quality_report(road_info, osm_coords, distance_km, geo_valid)
 
-    # Check if quality meets minimum standards
-    density = quality_report['density']
-    geo_valid = quality_report['geo_valid']
-    density_valid = quality_report['density_valid']
+        # Print quality report
+        if logger.isEnabledFor(logging.INFO):
+            print_quality_report(quality_report)
+
+        # Check if quality meets minimum standards
+        density = quality_report['density']
+        geo_valid = quality_report['geo_valid']
+        density_valid = quality_report['density_valid']
 
     # Distance validation
     distance_diff_pct = abs(distance_km - expected_distance_km) / expected_distance_km
     distance_valid = distance_diff_pct <= DISTANCE_TOLERANCE
 
     if not distance_valid:
-        print(f"⚠️  Warning: Distance mismatch {distance_diff_pct*100:.1f}% "
-              f"(tolerance: {DISTANCE_TOLERANCE*100:.0f}%)")
+        logger.warning("⚠️  Warning: Distance mismatch %.1f%% (tolerance: %.0f%%)",
+                       distance_diff_pct*100, DISTANCE_TOLERANCE*100)
 
         # CRITICAL: If distance is way off (>20% error), OSM data is incomplete/wrong
         # Don't waste time trying Map Matching - go straight to alternative strategies
         if distance_diff_pct > 0.50:  # >50% error = completely wrong data
-            print(f"\n❌ OSM data severely incomplete ({distance_diff_pct*100:.1f}% error)")
-            print(f"   Got {distance_km:.2f}km but expected {expected_distance_km:.2f}km")
-            print(f"   Skipping Map Matching (won't help with incomplete data)")
+            logger.warning("\n❌ OSM data severely incomplete (%.1f%% error)", distance_diff_pct*100)
+            logger.info("   Got %.2fkm but expected %.2fkm", distance_km, expected_distance_km)
+            logger.info("   Skipping Map Matching (won't help with incomplete data)")
 
             # Try Layer 4 (Directions with waypoints) if towns provided
             if start_town and end_town and mapbox_token:
-                print(f"\n🔄 Jumping to Layer 4: Directions API with auto-waypoints...")
-
-                directions_coords = get_road_geometry_with_auto_waypoints(
-                    road_code=road_info['code'],
-                    start_town=start_town,
-                    end_town=end_town,
-                    expected_distance_km=expected_distance_km,
-                    mapbox_token=mapbox_token,
-                    intermediate_towns=intermediate_towns
-                )
-
-                if directions_coords and len(directions_coords) >= 2:
-                    # Validate Layer 4 result
-                    directions_distance_km = _calculate_distance(directions_coords)
-                    directions_quality_report = get_quality_report(
-                        road_info, directions_coords, directions_distance_km
-                    )
-
-                    print(f"\n📊 Directions API Quality:")
-                    print_quality_report(directions_quality_report)
-
-                    directions_density = directions_quality_report['density']
-                    directions_geo_valid = directions_quality_report['geo_valid']
-                    directions_density_valid = directions_quality_report['density_valid']
-                    directions_distance_diff_pct = abs(directions_distance_km - expected_distance_km) / expected_distance_km
-                    directions_distance_valid = directions_distance_diff_pct <= DISTANCE_TOLERANCE
-
-                    if directions_density_valid and directions_geo_valid and directions_distance_valid and len(directions_coords) >= MIN_POINTS:
-                        print(f"\n✅ Layer 4 SUCCESS - using Directions geometry")
-                        print(f"   Source: mapbox_directions")
-                        print(f"   Distance: {directions_distance_km:.2f}km (error: {directions_distance_diff_pct*100:.1f}%)")
-
-                        result = GeometryResult(
-                            coordinates=directions_coords,
-                            source='mapbox_directions',
-                            quality_report=directions_quality_report,
-                            point_count=len(directions_coords),
-                            density=directions_density,
-                            distance_km=directions_distance_km,
-                            cached=False
-                        )
-
-                        _save_cache(road_ref, result)
-                        return result
-                    else:
-                        print(f"\n❌ Layer 4 also failed quality validation")
+                result = _try_layer4(road_info, expected_distance_km, mapbox_token,
+                                     start_town, end_town, intermediate_towns)
+                if result:
+                    _save_cache(road_ref, result)
+                    return result
 
             # All options exhausted
-            print(f"\n❌ REJECTED: OSM data incomplete, no alternative strategy available")
+            logger.warning("\n❌ REJECTED: OSM data incomplete, no alternative strategy available")
             return None
 
     # STEP 4a: If OSM quality is GOOD, use it
     if density_valid and geo_valid and distance_valid and len(osm_coords) >= MIN_POINTS:
-        print(f"\n✅ OSM quality GOOD - using OSM geometry")
-        print(f"   Source: osm_recursive")
-        print(f"   Density: {density:.2f} pts/km")
-        print(f"   Quality: {quality_report['quality']}")
+        logger.info("\n✅ OSM quality GOOD - using OSM geometry")
+        logger.info("   Source: osm_recursive")
+        logger.info("   Density: %.2f pts/km", density)
+        logger.info("   Quality: %s", quality_report['quality'])
 
         result = GeometryResult(
             coordinates=osm_coords,
@@ -420,175 +863,91 @@ def get_road_geometry_hybrid(
         return result
 
     # STEP 4b: OSM quality is POOR - try Map Matching fallback
-    print(f"\n⚠️  OSM quality POOR:")
-    if not density_valid:
-        print(f"   • Density {density:.2f} < {MIN_DENSITY} pts/km")
-    if not geo_valid:
-        print(f"   • Some points outside Portugal bounds")
-    if not distance_valid:
-        print(f"   • Distance {distance_km:.2f}km differs {distance_diff_pct*100:.1f}% from expected {expected_distance_km}km")
-    if len(osm_coords) < MIN_POINTS:
-        print(f"   • Only {len(osm_coords)} points (minimum: {MIN_POINTS})")
+    _log_failures("\n⚠️  OSM quality POOR:", density, density_valid, geo_valid,
+                  distance_km, expected_distance_km, len(osm_coords))
 
     if not mapbox_token:
-        print(f"\n❌ No Mapbox token provided - cannot refine with Map Matching")
-        print(f"   Rejecting road {road_ref}")
+        logger.warning("\n❌ No Mapbox token provided - cannot refine with Map Matching")
+        logger.info("   Rejecting road %s", road_ref)
         return None
 
-    print(f"\n🗺️  Trying Map Matching API fallback...")
+    logger.info("\n🗺️  Trying Map Matching API fallback...")
 
     # Pre-validate: Check for large coordinate gaps
-    print(f"   🔍 Pre-validating coordinates...")
+    logger.info("   🔍 Pre-validating coordinates...")
     coords_valid, warnings = validate_coordinates_for_matching(osm_coords)
 
     if warnings:
         for warning in warnings:
-            print(f"      {warning}")
+            logger.info("      %s", warning)
 
     if not coords_valid:
-        print(f"\n❌ Pre-validation failed: Too many disconnected segments")
-        print(f"   Map Matching would fail or produce poor results")
-        print(f"   Rejecting road {road_ref}")
-        return None
-
-    print(f"   ✅ Pre-validation passed - proceeding with Map Matching")
+        logger.warning("\n❌ Pre-validation failed: Too many disconnected segments")
+        logger.info("   Map Matching would fail or produce poor results")
 
-    # Use Map Matching to refine
-    matched_coords = batch_map_matching(osm_coords, mapbox_token)
+        # Directions doesn't use the OSM points, so it is still worth a try
+        if start_town and end_town:
+            result = _try_layer4(road_info, expected_distance_km, mapbox_token,
+                                 start_town, end_town, intermediate_towns)
+            if result:
+                _save_cache(road_ref, result)
+                return result
 
-    if not matched_coords or len(matched_coords) < 2:
-        print(f"❌ Map Matching failed")
+        logger.info("   Rejecting road %s", road_ref)
         return None
 
-    # Recalculate distance and validate
-    matched_distance_km = _calculate_distance(matched_coords)
-    matched_quality_report = get_quality_report(
-        road_info, matched_coords, matched_distance_km
-    )
+    logger.info("   ✅ Pre-validation passed - proceeding with Map Matching")
 
-    print(f"\n📊 Map Matching Quality:")
-    print_quality_report(matched_quality_report)
+    # Both fallbacks available: run them side by side, first GOOD result wins
+    if start_town and end_town:
+        logger.info("\n🔀 Running Map Matching and Directions API (auto-waypoints) concurrently...")
 
-    matched_density = matched_quality_report['density']
-    matched_geo_valid = matched_quality_report['geo_valid']
-    matched_density_valid = matched_quality_report['density_valid']
+        result = _race_fallbacks(
+            road_info, osm_coords, expected_distance_km, mapbox_token,
+            start_town, end_town, intermediate_towns
+        )
 
-    # Distance validation for Map Matching result
-    matched_distance_diff_pct = abs(matched_distance_km - expected_distance_km) / expected_distance_km
-    matched_distance_valid = matched_distance_diff_pct <= DISTANCE_TOLERANCE
+        if result:
+            logger.info("\n✅ %s quality GOOD - using %s geometry",
+                        FALLBACK_LABELS[result.source], result.source)
+            logger.info("   Source: %s", result.source)
+            logger.info("   Density: %.2f pts/km (was %.2f)", result.density, density)
+            logger.info("   Quality: %s", result.quality_report['quality'])
 
-    if not matched_distance_valid:
-        print(f"⚠️  Warning: Map Matching distance {matched_distance_km:.2f}km differs "
-              f"{matched_distance_diff_pct*100:.1f}% from expected {expected_distance_km}km")
+            # Cache the result
+            _save_cache(road_ref, result)
 
-    # Check if Map Matching improved quality
-    if matched_density_valid and matched_geo_valid and matched_distance_valid and len(matched_coords) >= MIN_POINTS:
-        print(f"\n✅ Map Matching quality GOOD - using refined geometry")
-        print(f"   Source: mapbox_matching")
-        print(f"   Density: {matched_density:.2f} pts/km (was {density:.2f})")
-        print(f"   Improvement: {matched_density/density:.1f}x")
+            return result
 
-        result = GeometryResult(
-            coordinates=matched_coords,
-            source='mapbox_matching',
-            quality_report=matched_quality_report,
-            point_count=len(matched_coords),
-            density=matched_density,
-            distance_km=matched_distance_km,
-            cached=False
-        )
+        # All layers failed
+        logger.warning("\n❌ ALL LAYERS FAILED - rejecting road")
+        logger.info("   Better NO road than BAD road")
+        return None
+
+    # Use Map Matching to refine
+    matched_coords = batch_map_matching(osm_coords, mapbox_token)
+    result = _validate_candidate(road_info, matched_coords, expected_distance_km, 'mapbox_matching')
+
+    if result:
+        logger.info("\n✅ Map Matching quality GOOD - using refined geometry")
+        logger.info("   Source: mapbox_matching")
+        logger.info("   Density: %.2f pts/km (was %.2f)", result.density, density)
+        if density > 0:
+            logger.info("   Improvement: %.1fx", result.density / density)
 
         # Cache the result
         _save_cache(road_ref, result)
 
         return result
 
-    else:
-        print(f"\n⚠️  Map Matching quality still POOR:")
-        if not matched_density_valid:
-            print(f"   • Density {matched_density:.2f} < {MIN_DENSITY} pts/km")
-        if not matched_geo_valid:
-            print(f"   • Some points outside Portugal bounds")
-        if not matched_distance_valid:
-            print(f"   • Distance {matched_distance_km:.2f}km differs {matched_distance_diff_pct*100:.1f}% from expected {expected_distance_km}km")
-        if len(matched_coords) < MIN_POINTS:
-            print(f"   • Only {len(matched_coords)} points (minimum: {MIN_POINTS})")
-
-        # STEP 5: Layer 4 - Try Directions API with auto-waypoints (last resort)
-        if start_town and end_town:
-            print(f"\n🔄 Trying Layer 4: Directions API with auto-waypoints...")
-
-            directions_coords = get_road_geometry_with_auto_waypoints(
-                road_code=road_info['code'],
-                start_town=start_town,
-                end_town=end_town,
-                expected_distance_km=expected_distance_km,
-                mapbox_token=mapbox_token,
-                intermediate_towns=intermediate_towns
-            )
-
-            if directions_coords and len(directions_coords) >= 2:
-                # Calculate distance and validate
-                directions_distance_km = _calculate_distance(directions_coords)
-                directions_quality_report = get_quality_report(
-                    road_info, directions_coords, directions_distance_km
-                )
-
-                print(f"\n📊 Directions API Quality:")
-                print_quality_report(directions_quality_report)
-
-                directions_density = directions_quality_report['density']
-                directions_geo_valid = directions_quality_report['geo_valid']
-                directions_density_valid = directions_quality_report['density_valid']
-
-                # Distance validation
-                directions_distance_diff_pct = abs(directions_distance_km - expected_distance_km) / expected_distance_km
-                directions_distance_valid = directions_distance_diff_pct <= DISTANCE_TOLERANCE
-
-                if not directions_distance_valid:
-                    print(f"⚠️  Warning: Directions distance {directions_distance_km:.2f}km differs "
-                          f"{directions_distance_diff_pct*100:.1f}% from expected {expected_distance_km}km")
-
-                # Check if Directions API provides acceptable quality
-                if directions_density_valid and directions_geo_valid and directions_distance_valid and len(directions_coords) >= MIN_POINTS:
-                    print(f"\n✅ Directions API quality GOOD - using auto-waypoints geometry")
-                    print(f"   Source: mapbox_directions")
-                    print(f"   Density: {directions_density:.2f} pts/km")
-                    print(f"   Quality: {directions_quality_report['quality']}")
-
-                    result = GeometryResult(
-                        coordinates=directions_coords,
-                        source='mapbox_directions',
-                        quality_report=directions_quality_report,
-                        point_count=len(directions_coords),
-                        density=directions_density,
-                        distance_km=directions_distance_km,
-                        cached=False
-                    )
-
-                    # Cache the result
-                    _save_cache(road_ref, result)
-
-                    return result
-                else:
-                    print(f"\n❌ Directions API quality also POOR:")
-                    if not directions_density_valid:
-                        print(f"   • Density {directions_density:.2f} < {MIN_DENSITY} pts/km")
-                    if not directions_geo_valid:
-                        print(f"   • Some points outside Portugal bounds")
-                    if not directions_distance_valid:
-                        print(f"   • Distance {directions_distance_km:.2f}km differs {directions_distance_diff_pct*100:.1f}% from expected {expected_distance_km}km")
-                    if len(directions_coords) < MIN_POINTS:
-                        print(f"   • Only {len(directions_coords)} points (minimum: {MIN_POINTS})")
-            else:
-                print(f"   ❌ Directions API failed to return coordinates")
-        else:
-            print(f"\n⏭️  Skipping Layer 4: No town names provided")
+    # STEP 5: Layer 4 already ran alongside Map Matching when town names
+    # were given (see _race_fallbacks), so only the no-towns case gets here
+    logger.info("\n⏭️  Skipping Layer 4: No town names provided")
 
-        # All layers failed
-        print(f"\n❌ ALL LAYERS FAILED - rejecting road")
-        print(f"   Better NO road than BAD road")
-        return None
+    # All layers failed
+    logger.warning("\n❌ ALL LAYERS FAILED - rejecting road")
+    logger.info("   Better NO road than BAD road")
+    return None
 
 
 # ==============================================================================
@@ -597,8 +956,15 @@ def get_road_geometry_hybrid(
 
 if __name__ == "__main__":
     import os
+    import sys
     from dotenv import load_dotenv
 
+    # --quiet: only warnings (failed layers, rejections)
+    logging.basicConfig(
+        level=logging.WARNING if '--quiet' in sys.argv[1:] else logging.INFO,
+        format="%(message)s"
+    )
+
     print("=" * 70)
     print("Hybrid Strategy - Test Suite")
     print("=" * 70)
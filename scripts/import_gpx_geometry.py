@@ -16,14 +16,23 @@ pipeline, allowing us to handle roads where OSM data is insufficient.
 ==============================================================================
 """
 
-import json
+import logging
 from typing import List, Tuple, Dict, Optional
 from pathlib import Path
 
+import numpy as np
+
 # Import our modules
-from metrics import calculate_total_distance
+from json_utils import loads
+from metrics import density_upper_bound, haversine_path_km
 from validation import get_quality_report
 
+# Progress goes through logging (CLI entry points configure a plain INFO handler)
+logger = logging.getLogger(__name__)
+
+# Minimum density accepted by validation.validate_geometry_density()
+MIN_DENSITY = 2.0  # points/km
+
 
 def load_geometry_from_json(
     json_file: str
@@ -43,7 +52,7 @@ def load_geometry_from_json(
         json_file: Path to JSON file (relative to scripts/ directory)
 
     Returns:
-        Dict with 'coordinates' and metadata, or None if failed
+        Dict with 'coordinates' ((N, 2) float64 array) and metadata, or None if failed
 
     Example:
         >>> data = load_geometry_from_json("n2_from_waypoints.json")
@@ -53,29 +62,33 @@ def load_geometry_from_json(
     file_path = Path(__file__).parent / json_file
 
     if not file_path.exists():
-        print(f"❌ File not found: {json_file}")
+        logger.warning("❌ File not found: %s", json_file)
         return None
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # orjson when installed (json_utils falls back to json)
+        data = loads(file_path.read_bytes())
 
         # Validate structure
         if 'coordinates' not in data or not isinstance(data['coordinates'], list):
-            print(f"❌ Invalid JSON: missing 'coordinates' array")
+            logger.warning("❌ Invalid JSON: missing 'coordinates' array")
             return None
 
         if len(data['coordinates']) < 100:
-            print(f"❌ Invalid JSON: too few coordinates ({len(data['coordinates'])})")
+            logger.warning("❌ Invalid JSON: too few coordinates (%s)", len(data['coordinates']))
             return None
 
-        # Convert coordinates to tuples if needed
-        coordinates = [tuple(coord) for coord in data['coordinates']]
+        # One (N, 2) float64 array, used as-is by distance/validation/metrics
+        coordinates = np.asarray(data['coordinates'], dtype=np.float64)
+        if coordinates.ndim != 2 or coordinates.shape[1] != 2:
+            logger.warning("❌ Invalid JSON: coordinates must be [lon, lat] pairs")
+            return None
 
-        print(f"✅ Loaded geometry from {json_file}")
-        print(f"   Road: {data.get('road_code', 'UNKNOWN')} - {data.get('road_name', 'Unknown')}")
-        print(f"   Source: {data.get('source', 'unknown')}")
-        print(f"   Points: {len(coordinates)}")
+        logger.info("✅ Loaded geometry from %s", json_file)
+        logger.info("   Road: %s - %s",
+                    data.get('road_code', 'UNKNOWN'), data.get('road_name', 'Unknown'))
+        logger.info("   Source: %s", data.get('source', 'unknown'))
+        logger.info("   Points: %s", len(coordinates))
 
         return {
             'coordinates': coordinates,
@@ -85,11 +98,11 @@ def load_geometry_from_json(
             'metadata': data.get('metadata', {})
         }
 
-    except json.JSONDecodeError as e:
-        print(f"❌ Invalid JSON format: {e}")
+    except ValueError as e:  # json.JSONDecodeError / orjson.JSONDecodeError
+        logger.warning("❌ Invalid JSON format: %s", e)
         return None
     except Exception as e:
-        print(f"❌ Error loading JSON: {e}")
+        logger.warning("❌ Error loading JSON: %s", e)
         return None
 
 
@@ -107,7 +120,8 @@ def validate_imported_geometry(
 
     Args:
         road_info: Road definition from roads_data.json
-        geometry_data: Imported geometry data with coordinates
+        geometry_data: Imported geometry data with coordinates (the computed
+            'distance_km' and 'quality_report' are added to it)
 
     Returns:
         True if valid, False otherwise
@@ -121,29 +135,47 @@ def validate_imported_geometry(
     coordinates = geometry_data['coordinates']
     expected_distance_km = road_info.get('expected_distance_km', 0)
 
-    print(f"\n🔍 Validating imported geometry...")
+    logger.info("\n🔍 Validating imported geometry...")
+
+    # Cheap rejections first: the endpoints alone bound the density from
+    # above, so hopelessly sparse files skip the distance and bounds passes
+    if len(coordinates) < 2:
+        logger.warning("\n❌ VALIDATION FAILED: only %s point(s)", len(coordinates))
+        return False
+
+    max_density = density_upper_bound(coordinates)
+    if max_density < MIN_DENSITY:
+        logger.warning("\n❌ VALIDATION FAILED:")
+        logger.warning("   • Density at most %.2f pts/km (< %.1f) from the endpoints alone",
+                       max_density, MIN_DENSITY)
+        return False
 
-    # Calculate distance
-    distance_km = calculate_total_distance(coordinates)
+    # Calculate distance (vectorized haversine, same as hybrid_strategy)
+    distance_km = haversine_path_km(coordinates)
 
     # Get quality report
     road_info_with_coords = {**road_info, 'coordinates': coordinates}
     quality_report = get_quality_report(road_info_with_coords, coordinates, distance_km)
 
-    print(f"\n📊 Quality Report:")
-    print(f"   Points: {quality_report['point_count']}")
-    print(f"   Distance: {quality_report['distance_km']:.2f} km")
-    print(f"   Expected: {expected_distance_km:.0f} km")
-    print(f"   Density: {quality_report['density']:.2f} pts/km")
-    print(f"   Quality: {quality_report['quality']}")
-    print(f"   Density valid: {quality_report['density_valid']}")
-    print(f"   Geography valid: {quality_report['geo_valid']}")
+    # Keep the results with the geometry so get_geometry_from_file() does not
+    # walk the coordinates again
+    geometry_data['distance_km'] = distance_km
+    geometry_data['quality_report'] = quality_report
+
+    logger.info("\n📊 Quality Report:")
+    logger.info("   Points: %s", quality_report['point_count'])
+    logger.info("   Distance: %.2f km", quality_report['distance_km'])
+    logger.info("   Expected: %.0f km", expected_distance_km)
+    logger.info("   Density: %.2f pts/km", quality_report['density'])
+    logger.info("   Quality: %s", quality_report['quality'])
+    logger.info("   Density valid: %s", quality_report['density_valid'])
+    logger.info("   Geography valid: %s", quality_report['geo_valid'])
 
     # Check quality
     if quality_report['quality'] == 'REJECTED':
-        print(f"\n❌ VALIDATION FAILED:")
+        logger.warning("\n❌ VALIDATION FAILED:")
         for msg in quality_report.get('messages', []):
-            print(f"   • {msg}")
+            logger.warning("   • %s", msg)
         return False
 
     # For imported geometries, we're more lenient with distance
@@ -151,17 +183,17 @@ def validate_imported_geometry(
     if expected_distance_km > 0:
         distance_diff_pct = abs(distance_km - expected_distance_km) / expected_distance_km
         if distance_diff_pct > 0.30:
-            print(f"\n⚠️  WARNING: Distance differs by {distance_diff_pct*100:.1f}%")
-            print(f"   Expected: {expected_distance_km:.0f} km")
-            print(f"   Actual: {distance_km:.2f} km")
-            print(f"   Difference: {abs(distance_km - expected_distance_km):.2f} km")
-            print(f"\n   For imported geometries, this is acceptable if quality is EXCELLENT")
+            logger.warning("\n⚠️  WARNING: Distance differs by %.1f%%", distance_diff_pct*100)
+            logger.info("   Expected: %.0f km", expected_distance_km)
+            logger.info("   Actual: %.2f km", distance_km)
+            logger.info("   Difference: %.2f km", abs(distance_km - expected_distance_km))
+            logger.info("\n   For imported geometries, this is acceptable if quality is EXCELLENT")
 
             if quality_report['quality'] != 'EXCELLENT':
-                print(f"❌ REJECTED: Distance too different and quality not EXCELLENT")
+                logger.warning("❌ REJECTED: Distance too different and quality not EXCELLENT")
                 return False
 
-    print(f"\n✅ Validation PASSED")
+    logger.info("\n✅ Validation PASSED")
     return True
 
 
@@ -188,7 +220,7 @@ def get_geometry_from_file(
 
     Format matches GeometryResult from hybrid_strategy.py:
     {
-        'coordinates': [(lon, lat), ...],
+        'coordinates': (N, 2) float64 array of (lon, lat),
         'source': 'external_json' or specific source,
         'distance_km': float,
         'point_count': int,
@@ -205,7 +237,7 @@ def get_geometry_from_file(
         "expected_distance_km": 739.0
     }
     """
-    print(f"\n📥 Loading external geometry from {geometry_file}...")
+    logger.info("\n📥 Loading external geometry from %s...", geometry_file)
 
     # Load geometry
     geometry_data = load_geometry_from_json(geometry_file)
@@ -216,14 +248,12 @@ def get_geometry_from_file(
     if not validate_imported_geometry(road_info, geometry_data):
         return None
 
-    # Calculate metrics for return value
+    # Metrics for return value (computed once, during validation)
     coordinates = geometry_data['coordinates']
-    distance_km = calculate_total_distance(coordinates)
+    distance_km = geometry_data['distance_km']
+    quality_report = geometry_data['quality_report']
     density = len(coordinates) / distance_km if distance_km > 0 else 0
 
-    road_info_with_coords = {**road_info, 'coordinates': coordinates}
-    quality_report = get_quality_report(road_info_with_coords, coordinates, distance_km)
-
     # Return in GeometryResult-compatible format
     return {
         'coordinates': coordinates,
@@ -241,6 +271,14 @@ def get_geometry_from_file(
 # ==============================================================================
 
 if __name__ == "__main__":
+    import sys
+
+    # --quiet: only warnings (missing files, failed validation)
+    logging.basicConfig(
+        level=logging.WARNING if '--quiet' in sys.argv[1:] else logging.INFO,
+        format="%(message)s"
+    )
+
     print("=" * 70)
     print("GPX/External Geometry Import - Test Suite")
     print("=" * 70)
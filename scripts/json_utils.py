@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+==============================================================================
+JSON Helpers
+==============================================================================
+Module: json_utils.py
+Purpose: Fast JSON (de)serialization with orjson, falling back to json
+Author: Road Explorer Portugal
+==============================================================================
+
+orjson parses and emits floats in C, which matters for route files with
+tens of thousands of coordinate pairs. When it is not installed the standard
+library is used with equivalent output (UTF-8, 2-space indent).
+==============================================================================
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Union
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _to_builtin(obj: Any) -> Any:
+    """json.dumps default= hook for NumPy arrays and scalars."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Parse a JSON document.
+
+    Args:
+        data: JSON text or UTF-8 bytes
+
+    Returns:
+        Parsed Python object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """
+    Serialize to UTF-8 JSON bytes (NumPy arrays are written as nested lists).
+
+    Args:
+        obj: Object to serialize
+        indent: Pretty-print with 2-space indentation
+
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+
+    return json.dumps(
+        obj,
+        indent=2 if indent else None,
+        ensure_ascii=False,
+        default=_to_builtin
+    ).encode('utf-8')
+
+
+def read_json(path: Union[str, Path]) -> Any:
+    """Read and parse a JSON file."""
+    return loads(Path(path).read_bytes())
+
+
+def write_json(path: Union[str, Path], obj: Any, indent: bool = True) -> None:
+    """
+    Write obj to a JSON file in one buffered call.
+
+    Example:
+        >>> write_json("n247_from_waypoints.json", {'coordinates': coords})
+    """
+    Path(path).write_bytes(dumps(obj, indent=indent))
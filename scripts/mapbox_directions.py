@@ -28,22 +28,88 @@ NOT recommended for:
 ==============================================================================
 """
 
+import numpy as np
 import requests
-from typing import List, Tuple, Optional
-import time
-from geopy.distance import geodesic
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple, Optional
+
+from http_utils import MAPBOX_BUCKET, create_session, retry_after_seconds
+from json_utils import loads
+from metrics import calculate_total_distance, douglas_peucker, haversine_path_km, measure_and_simplify
+from polyline_utils import clean_coordinates, decode_polyline, format_coordinates
+import route_cache
 
 # Import our waypoint generator
 from waypoint_generator import generate_waypoints_for_road
 
 
+DIRECTIONS_API_BASE = "https://api.mapbox.com/directions/v5/mapbox"
+
+# Connections kept alive for concurrent section requests
+SESSION_POOL_SIZE = 8
+
+# Batches of one multi-waypoint route fetched at once
+MAX_CONCURRENT_REQUESTS = 5
+
+# Local Douglas-Peucker tolerance when a route exceeds max_points
+SIMPLIFY_EPSILON_M = 5.0
+
+MAX_WAYPOINTS_PER_REQUEST = 25  # Directions API limit
+
+# Route piece boundary points closer than this (degrees, ~1 cm) are duplicates
+BOUNDARY_TOLERANCE_DEG = 1e-7
+
+# Sections that must route for a section-by-section result to be accepted
+MIN_SECTION_SUCCESS_RATE = 0.70
+
+# One successfully routed section: (name, (N, 2) coords array, distance_km)
+Section = namedtuple('Section', ['name', 'coords', 'distance_km'])
+
+
+@lru_cache(maxsize=1)
+def _get_session() -> requests.Session:
+    """
+    Shared keep-alive session (retries 429/5xx) used when no session is passed.
+
+    A 429 that outlasts the retries comes back as a response, not a
+    RetryError, so mapbox_directions() can drain the token bucket.
+    """
+    return create_session(
+        retries=3,
+        status_forcelist=(429, 502, 503, 504),
+        pool_size=SESSION_POOL_SIZE,
+        raise_on_status=False
+    )
+
+
+def close_session() -> None:
+    """Close the shared session's pooled connections (a fresh one is made on next use)."""
+    if _get_session.cache_info().currsize:
+        _get_session().close()
+        _get_session.cache_clear()
+
+
+def _limit_points(coords: np.ndarray, max_points: Optional[int] = None) -> np.ndarray:
+    """Douglas-Peucker (SIMPLIFY_EPSILON_M) a route that is longer than max_points."""
+    if max_points is None or len(coords) <= max_points:
+        return coords
+    simplified = douglas_peucker(coords, SIMPLIFY_EPSILON_M)
+    print(f"   ✂️  Simplified {len(coords)} → {len(simplified)} points (ε = {SIMPLIFY_EPSILON_M:.0f} m)")
+    return simplified
+
+
 def mapbox_directions(
     coordinates: List[Tuple[float, float]],
     mapbox_token: str,
     profile: str = "driving",
     overview: str = "full",
-    delay_ms: int = 200
-) -> Optional[List[Tuple[float, float]]]:
+    rate_limit: bool = True,
+    session: Optional[requests.Session] = None,
+    simplify: bool = False,
+    max_points: Optional[int] = None
+) -> Optional[np.ndarray]:
     """
     Generate route geometry using Mapbox Directions API.
 
@@ -52,13 +118,19 @@ def mapbox_directions(
         mapbox_token: Mapbox API token
         profile: Routing profile (driving, walking, cycling)
         overview: full (all points) or simplified (fewer points)
-        delay_ms: Delay between requests in milliseconds (rate limiting)
+        rate_limit: Pace through http_utils.MAPBOX_BUCKET, shared with Map
+            Matching (waits only when the 5 req/s quota is used up)
+        session: requests session to send through (default: shared pooled session)
+        simplify: Request overview=simplified (Mapbox simplifies server-side,
+            far fewer points; too sparse for the density check of Layer 4)
+        max_points: Simplify locally (SIMPLIFY_EPSILON_M) when the route has more points
 
     Returns:
-        List of (lon, lat) tuples representing the route, or None if failed
+        (N, 2) float64 array of (lon, lat) along the route, or None if failed
 
     Raises:
-        requests.exceptions.HTTPError: If API request fails
+        ValueError: If the token is missing or the waypoints are invalid
+            (fewer than 2, more than 25, NaN or out-of-range values)
 
     Example:
         >>> coords = [(-7.4688, 41.7402), (-7.7441, 41.3006)]  # Chaves → Vila Real
@@ -72,29 +144,48 @@ def mapbox_directions(
     if len(coordinates) < 2:
         raise ValueError("Need at least 2 coordinates")
 
+    # Fail before any network work on malformed input; repeated points dropped
+    coordinates = clean_coordinates(coordinates)
+    if len(coordinates) < 2:
+        raise ValueError("Need at least 2 distinct coordinates")
+
     if len(coordinates) > 25:
         raise ValueError("Directions API supports max 25 waypoints per request")
 
-    # Format coordinates as "lon1,lat1;lon2,lat2;..."
-    coords_str = ";".join([f"{lon},{lat}" for lon, lat in coordinates])
-
-    # Build API URL
-    url = (
-        f"https://api.mapbox.com/directions/v5/mapbox/{profile}/{coords_str}"
-        f"?access_token={mapbox_token}"
-        f"&geometries=geojson"
-        f"&overview={overview}"
-    )
+    if simplify:
+        overview = "simplified"
 
-    # Rate limiting delay
-    if delay_ms > 0:
-        time.sleep(delay_ms / 1000.0)
+    # Format coordinates as "lon1,lat1;lon2,lat2;..."
+    coords_str = format_coordinates(coordinates)
+
+    # Build API URL (token passed separately so the cache key leaves it out)
+    url = f"{DIRECTIONS_API_BASE}/{profile}/{coords_str}"
+    params = {
+        'geometries': 'polyline6',
+        'overview': overview,
+        'steps': 'false',
+        'alternatives': 'false'
+    }
+
+    # Identical requests return identical routes: no API call, no rate limit
+    # (same key as fetch_road_with_waypoints, so either path can reuse the other's)
+    cache_key = route_cache.request_key(url, params)
+    cached = route_cache.get(cache_key)
+    if cached is not None:
+        print(f"💾 Directions cache hit: {len(cached)} points")
+        return _limit_points(cached, max_points)
+
+    # Rate limiting (no wait while tokens remain)
+    if rate_limit:
+        MAPBOX_BUCKET.acquire()
 
     try:
-        response = requests.get(url, timeout=30)
+        response = (session or _get_session()).get(
+            url, params={'access_token': mapbox_token, **params}, timeout=30
+        )
         response.raise_for_status()
 
-        data = response.json()
+        data = loads(response.content)  # orjson when installed
 
         if 'routes' not in data or not data['routes']:
             print(f"❌ No routes found in Directions API response")
@@ -104,17 +195,20 @@ def mapbox_directions(
         route = data['routes'][0]
         geometry = route['geometry']
 
-        if geometry['type'] != 'LineString':
-            print(f"❌ Unexpected geometry type: {geometry['type']}")
+        if not isinstance(geometry, str):
+            print(f"❌ Unexpected geometry format: {type(geometry).__name__}")
             return None
 
-        # Geometry coordinates are already in [lon, lat] format
-        route_coords = [tuple(coord) for coord in geometry['coordinates']]
+        # polyline6 string (~4x smaller than GeoJSON), decoded to (lon, lat)
+        decoded = decode_polyline(geometry)
 
         # Get route distance for logging
         distance_m = route.get('distance', 0)
         duration_s = route.get('duration', 0)
 
+        route_cache.put(cache_key, decoded, {'distance_m': distance_m, 'duration_s': duration_s})
+        route_coords = _limit_points(decoded, max_points)
+
         print(f"✅ Directions API:")
         print(f"   Waypoints: {len(coordinates)}")
         print(f"   Route points: {len(route_coords)}")
@@ -124,6 +218,8 @@ def mapbox_directions(
         return route_coords
 
     except requests.exceptions.HTTPError as e:
+        if e.response.status_code == 429:
+            MAPBOX_BUCKET.penalize(retry_after_seconds(e.response))
         print(f"❌ HTTP error {e.response.status_code}: {e}")
         return None
     except Exception as e:
@@ -134,21 +230,25 @@ def mapbox_directions(
 def directions_with_multiple_waypoints(
     waypoints: List[Tuple[float, float]],
     mapbox_token: str,
-    max_waypoints_per_request: int = 25
-) -> Optional[List[Tuple[float, float]]]:
+    max_waypoints_per_request: int = 25,
+    simplify: bool = False
+) -> Optional[np.ndarray]:
     """
     Generate route through many waypoints by batching requests.
 
     Directions API has limit of 25 waypoints per request.
-    This function splits into batches and merges results.
+    This function splits into batches, fetches them concurrently (up to
+    MAX_CONCURRENT_REQUESTS over the shared session) and merges the results
+    in route order into one preallocated array.
 
     Args:
         waypoints: List of (lon, lat) tuples
         mapbox_token: Mapbox API token
         max_waypoints_per_request: Max waypoints per API call (default: 25)
+        simplify: Request server-simplified geometry (see mapbox_directions)
 
     Returns:
-        List of (lon, lat) tuples representing complete route, or None if failed
+        (N, 2) array of (lon, lat) for the complete route, or None if failed
 
     Example:
         >>> waypoints = [(lon1, lat1), (lon2, lat2), ..., (lon50, lat50)]
@@ -157,50 +257,275 @@ def directions_with_multiple_waypoints(
     """
     if len(waypoints) <= max_waypoints_per_request:
         # Single request
-        return mapbox_directions(waypoints, mapbox_token)
+        return mapbox_directions(waypoints, mapbox_token, simplify=simplify)
 
     # Multiple batches needed
     print(f"⚠️  {len(waypoints)} waypoints require multiple batches")
 
-    merged_route = []
     num_batches = (len(waypoints) + max_waypoints_per_request - 2) // (max_waypoints_per_request - 1)
 
     print(f"   Splitting into {num_batches} batches...")
 
+    # Consecutive batches share their boundary waypoint
+    batches = []
     for i in range(num_batches):
         start_idx = i * (max_waypoints_per_request - 1)
         end_idx = min(start_idx + max_waypoints_per_request, len(waypoints))
-
-        batch_waypoints = waypoints[start_idx:end_idx]
-
         print(f"\n🔹 Batch {i+1}/{num_batches}: waypoints {start_idx}-{end_idx-1}")
+        batches.append(waypoints[start_idx:end_idx])
 
-        batch_route = mapbox_directions(batch_waypoints, mapbox_token)
+    # Independent requests: fetch together, map() keeps them in route order
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_REQUESTS, num_batches)) as executor:
+        batch_routes = list(executor.map(
+            lambda batch_waypoints: mapbox_directions(batch_waypoints, mapbox_token, simplify=simplify),
+            batches
+        ))
 
-        if not batch_route:
+    for i, batch_route in enumerate(batch_routes):
+        if batch_route is None:
             print(f"   ❌ Batch {i+1} failed")
             return None
 
-        if i == 0:
-            # First batch: add all points
-            merged_route.extend(batch_route)
-        else:
-            # Subsequent batches: skip first point to avoid duplication
-            merged_route.extend(batch_route[1:])
+    # Subsequent batches skip their first point (the previous batch's last):
+    # size the result once and copy each batch into its slot
+    sizes = [len(route) - (1 if i else 0) for i, route in enumerate(batch_routes)]
+    offsets = np.cumsum([0] + sizes)
+    merged_route = np.empty((offsets[-1], 2), dtype=np.float64)
+    for i, batch_route in enumerate(batch_routes):
+        merged_route[offsets[i]:offsets[i + 1]] = batch_route[1:] if i else batch_route
 
     print(f"\n🔗 Merged {num_batches} batches into {len(merged_route)} points")
 
     return merged_route
 
 
+def merge_route_parts(parts: Sequence) -> np.ndarray:
+    """
+    Concatenate consecutive route pieces, dropping duplicated boundary points.
+
+    Args:
+        parts: (lon, lat) sequences or (N, 2) arrays in route order
+
+    Returns:
+        Merged (N, 2) float64 array
+
+    Example:
+        >>> merge_route_parts([[(0, 0), (1, 1)], [(1, 1), (2, 2)]]).tolist()
+        [[0.0, 0.0], [1.0, 1.0], [2.0, 2.0]]
+    """
+    sections = [np.asarray(p, dtype=np.float64) for p in parts]
+
+    # Pass 1: skip each piece's first point if it duplicates the previous
+    # piece's last point (within float tolerance: Mapbox may round joints)
+    skip = [0] + [
+        int(np.allclose(prev[-1], curr[0], rtol=0, atol=BOUNDARY_TOLERANCE_DEG))
+        for prev, curr in zip(sections, sections[1:])
+    ]
+    sizes = [len(coords) - k for coords, k in zip(sections, skip)]
+
+    # Pass 2: copy every piece straight into one preallocated buffer
+    merged_coords = np.empty((sum(sizes), 2), dtype=np.float64)
+    offset = 0
+    for coords, k, size in zip(sections, skip, sizes):
+        merged_coords[offset:offset + size] = coords[k:]
+        offset += size
+
+    return merged_coords
+
+
+def route_through_waypoints(
+    waypoints: Sequence[Dict],
+    mapbox_token: str
+) -> Tuple[np.ndarray, Dict]:
+    """
+    Route through named waypoints with as few Directions requests as possible.
+
+    Up to 25 waypoints fit in one request. Longer lists are split into
+    overlapping 25-waypoint windows (last waypoint of one window is the first
+    of the next) whose routes are merged with merge_route_parts(). Used by the
+    N2 and N247 generators, so both report the geodesic length of the merged
+    geometry.
+
+    Args:
+        waypoints: List of waypoint dicts with 'lat' and 'lon'
+        mapbox_token: Mapbox API token
+
+    Returns:
+        Tuple of (merged (N, 2) coordinate array, metadata)
+
+    Raises:
+        ValueError: If Mapbox returns no usable route for a window
+    """
+    step = MAX_WAYPOINTS_PER_REQUEST - 1
+    windows = [
+        waypoints[i:i + MAX_WAYPOINTS_PER_REQUEST]
+        for i in range(0, len(waypoints) - 1, step)
+    ]
+
+    print(f"\n🗺️  Routing {len(waypoints)} waypoints in {len(windows)} Directions request(s)...")
+
+    parts = []
+    for n, window in enumerate(windows, 1):
+        print(f"\n🔹 Request {n}/{len(windows)}: {len(window)} waypoints")
+        route_coords = mapbox_directions([(wp['lon'], wp['lat']) for wp in window], mapbox_token)
+
+        if route_coords is None or len(route_coords) < 10:
+            raise ValueError("Directions API returned too few points")
+
+        parts.append(route_coords)
+
+    merged_coords = merge_route_parts(parts)
+    total_distance = calculate_total_distance(merged_coords)
+
+    print(f"   🔗 Merged into {len(merged_coords)} total points")
+    print(f"   📏 Total distance: {total_distance:.2f} km")
+
+    total_sections = len(waypoints) - 1
+    return merged_coords, {
+        'sections_successful': total_sections,
+        'sections_failed': 0,
+        'sections_total': total_sections,
+        'requests': len(windows),
+        'output_points': len(merged_coords),
+        'distance_km': total_distance
+    }
+
+
+def route_section_by_section(
+    waypoints: Sequence[Dict],
+    mapbox_token: str,
+    max_workers: int = MAX_CONCURRENT_REQUESTS
+) -> Tuple[np.ndarray, Dict]:
+    """
+    Route each section (waypoint_i → waypoint_i+1) with its own Directions request.
+
+    Fallback for route_through_waypoints(): sections are fetched concurrently
+    over the shared session (retries, token bucket, route cache), a failed
+    section is skipped instead of failing the whole road, and the routed
+    sections are merged with merge_route_parts().
+
+    Args:
+        waypoints: List of waypoint dicts with 'name', 'lat' and 'lon'
+        mapbox_token: Mapbox API token
+        max_workers: Section requests in flight at once
+
+    Returns:
+        Tuple of (merged (N, 2) coordinate array, metadata)
+
+    Raises:
+        ValueError: If fewer than MIN_SECTION_SUCCESS_RATE of the sections route
+    """
+    print(f"\n🗺️  Processing {len(waypoints)-1} sections with Directions API...")
+    print(f"   🔀 Concurrency: {max_workers} requests in flight")
+
+    all_sections = []
+    failed_sections = []
+    total_sections = len(waypoints) - 1
+
+    # Fire all sections concurrently (threads wait on network I/O);
+    # results are stored by index so processing below stays in route order
+    results: List = [None] * total_sections
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            # Just use the 2 waypoints (start, end)
+            # Directions API will generate the detailed route
+            executor.submit(
+                mapbox_directions,
+                [(wp1['lon'], wp1['lat']), (wp2['lon'], wp2['lat'])],
+                mapbox_token
+            ): i
+            for i, (wp1, wp2) in enumerate(zip(waypoints, waypoints[1:]))
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                results[i] = e
+
+    for i, route_coords in enumerate(results):
+        wp1 = waypoints[i]
+        wp2 = waypoints[i + 1]
+
+        section_name = f"{wp1['name']} → {wp2['name']}"
+        section_num = i + 1
+
+        print(f"\n🔹 Section {section_num}/{total_sections}: {section_name}")
+
+        try:
+            if isinstance(route_coords, Exception):
+                raise route_coords
+
+            if route_coords is None or len(route_coords) < 10:
+                print(f"   ❌ FAILED: Directions API returned too few points")
+                failed_sections.append(section_name)
+                continue
+
+            matched_coords = np.asarray(route_coords, dtype=np.float64)
+
+            distance_km = calculate_total_distance(matched_coords)
+            density = len(matched_coords) / distance_km if distance_km > 0 else 0
+
+            print(f"   ✅ SUCCESS")
+            print(f"      Points: {len(matched_coords)}")
+            print(f"      Distance: {distance_km:.2f} km")
+            print(f"      Density: {density:.2f} pts/km")
+
+            all_sections.append(Section(section_name, matched_coords, distance_km))
+
+        except Exception as e:
+            print(f"   ❌ FAILED: {e}")
+            failed_sections.append(section_name)
+
+    # Check if we have enough successful sections
+    success_rate = len(all_sections) / total_sections
+
+    print(f"\n{'='*70}")
+    print(f"📊 Section Processing Results:")
+    print(f"   ✅ Successful: {len(all_sections)}/{total_sections} ({success_rate*100:.0f}%)")
+    print(f"   ❌ Failed: {len(failed_sections)}/{total_sections}")
+    print(f"{'='*70}")
+
+    if success_rate < MIN_SECTION_SUCCESS_RATE:
+        print(f"\n❌ REJECTED: Only {success_rate*100:.0f}% sections successful (need ≥{MIN_SECTION_SUCCESS_RATE*100:.0f}%)")
+        if failed_sections:
+            print(f"   Failed sections:")
+            for section_name in failed_sections:
+                print(f"   • {section_name}")
+        raise ValueError("Too many sections failed")
+
+    if not all_sections:
+        raise ValueError("No sections processed successfully")
+
+    # Merge sections (remove duplicate points at boundaries)
+    print(f"\n🔗 Merging {len(all_sections)} sections...")
+    merged_coords = merge_route_parts([s.coords for s in all_sections])
+
+    total_distance = sum(s.distance_km for s in all_sections)
+
+    print(f"   🔗 Merged into {len(merged_coords)} total points")
+    print(f"   📏 Total distance: {total_distance:.2f} km")
+
+    return merged_coords, {
+        'sections_successful': len(all_sections),
+        'sections_failed': len(failed_sections),
+        'sections_total': total_sections,
+        'output_points': len(merged_coords),
+        'distance_km': total_distance
+    }
+
+
 def get_road_geometry_with_auto_waypoints(
     road_code: str,
     start_town: str,
     end_town: str,
     expected_distance_km: float,
     mapbox_token: str,
-    intermediate_towns: Optional[List[str]] = None
-) -> Optional[List[Tuple[float, float]]]:
+    intermediate_towns: Optional[List[str]] = None,
+    simplify: bool = False,
+    max_points: Optional[int] = None
+) -> Optional[np.ndarray]:
     """
     Get complete road geometry using auto-generated waypoints + Directions API (Layer 4).
 
@@ -217,9 +542,12 @@ def get_road_geometry_with_auto_waypoints(
         expected_distance_km: Expected road distance
         mapbox_token: Mapbox API token
         intermediate_towns: Optional list of intermediate towns
+        simplify: Request server-simplified geometry (display-only use;
+            leave off when the result must pass the density check)
+        max_points: Douglas-Peucker the merged route locally above this many points
 
     Returns:
-        List of (lon, lat) coordinates if successful, None otherwise
+        (N, 2) array of (lon, lat) coordinates if successful, None otherwise
 
     Example:
         >>> coords = get_road_geometry_with_auto_waypoints(
@@ -258,18 +586,21 @@ def get_road_geometry_with_auto_waypoints(
     waypoints_lonlat = [(wp[1], wp[0]) for wp in waypoints]
 
     print(f"   🗺️  Fetching route from Directions API...")
-    coordinates = directions_with_multiple_waypoints(waypoints_lonlat, mapbox_token)
+    coordinates = directions_with_multiple_waypoints(waypoints_lonlat, mapbox_token, simplify=simplify)
 
-    if not coordinates:
+    if coordinates is None:
         print(f"   ❌ Directions API failed")
         return None
 
-    # Calculate distance for validation
-    distance_km = 0.0
-    for i in range(len(coordinates) - 1):
-        point1 = (coordinates[i][1], coordinates[i][0])  # (lat, lon)
-        point2 = (coordinates[i + 1][1], coordinates[i + 1][0])
-        distance_km += geodesic(point1, point2).kilometers
+    # Calculate distance for validation (one vectorized haversine pass;
+    # <0.5% off geodesic, well inside the 20% tolerance below). When the
+    # route must also be cut down to max_points, both come from one kernel.
+    if max_points is not None and len(coordinates) > max_points:
+        point_count = len(coordinates)
+        distance_km, coordinates = measure_and_simplify(coordinates, SIMPLIFY_EPSILON_M)
+        print(f"   ✂️  Simplified {point_count} → {len(coordinates)} points (ε = {SIMPLIFY_EPSILON_M:.0f} m)")
+    else:
+        distance_km = haversine_path_km(coordinates)
 
     print(f"   📏 Route distance: {distance_km:.2f}km (expected: {expected_distance_km:.2f}km)")
 
@@ -314,7 +645,7 @@ if __name__ == "__main__":
 
     route = mapbox_directions(coords, MAPBOX_TOKEN)
 
-    if route:
+    if route is not None:
         print(f"✅ Test 1 PASSED: {len(route)} points")
     else:
         print(f"❌ Test 1 FAILED")
@@ -331,7 +662,7 @@ if __name__ == "__main__":
 
     route = mapbox_directions(coords, MAPBOX_TOKEN)
 
-    if route:
+    if route is not None:
         print(f"✅ Test 2 PASSED: {len(route)} points")
     else:
         print(f"❌ Test 2 FAILED")
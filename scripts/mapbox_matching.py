@@ -25,9 +25,16 @@ Directions API (DO NOT USE):
 """
 
 import requests
-import time
-from typing import List, Tuple, Optional, Dict
-from geopy.distance import geodesic
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Tuple, Optional, Dict, Union
+
+from http_utils import MAPBOX_BUCKET, create_session, retry_after_seconds
+from json_utils import loads
+from metrics import chord_segment_lengths_km, haversine_km
+from polyline_utils import clean_coordinates, format_coordinates
+import route_cache
 
 
 # ==============================================================================
@@ -35,15 +42,44 @@ from geopy.distance import geodesic
 # ==============================================================================
 
 MAPBOX_API_BASE = "https://api.mapbox.com/matching/v5/mapbox"
-RATE_LIMIT_DELAY = 0.2  # seconds (600/min → 5/sec safe)
 REQUEST_TIMEOUT = 30  # seconds
 MAX_COORDS_PER_REQUEST = 100  # Mapbox limit
+STITCH_TOLERANCE_KM = 0.001  # Batch joints closer than 1 m are the same point
+SESSION_POOL_SIZE = 8  # Keep-alive connections to api.mapbox.com
+MAX_CONCURRENT_REQUESTS = 5  # Batches in flight at once
 
 # Pre-validation thresholds
 MAX_GAP_KM = 50.0  # Maximum acceptable gap between consecutive points
 MAX_LARGE_GAPS = 5  # Maximum number of large gaps allowed
 
 
+# ==============================================================================
+# HTTP Session
+# ==============================================================================
+
+@lru_cache(maxsize=1)
+def _get_session() -> requests.Session:
+    """
+    Shared keep-alive session (retries 429/5xx with backoff) used when no
+    session is passed, so the batches of one road reuse one TLS connection.
+    A 429 that outlasts the retries comes back as a response (not a
+    RetryError) so the HTTP 429 handler can drain the token bucket.
+    """
+    return create_session(
+        retries=3,
+        backoff_factor=0.3,
+        pool_size=SESSION_POOL_SIZE,
+        raise_on_status=False
+    )
+
+
+def close_session() -> None:
+    """Close the shared session's pooled connections (a fresh one is made on next use)."""
+    if _get_session.cache_info().currsize:
+        _get_session().close()
+        _get_session.cache_clear()
+
+
 # ==============================================================================
 # Pre-Validation
 # ==============================================================================
@@ -61,7 +97,7 @@ def validate_coordinates_for_matching(
     from Map Matching API, wasting API quota.
 
     Args:
-        coordinates: List of (lon, lat) tuples
+        coordinates: List of (lon, lat) tuples or (N, 2) array
         max_gap_km: Maximum acceptable gap in kilometers (default: 50km)
         max_gaps_allowed: Maximum number of large gaps allowed (default: 5)
 
@@ -78,24 +114,24 @@ def validate_coordinates_for_matching(
         Validation failed: ['Large gap detected: 8234.5 km between points 1-2']
     """
 
-    if not coordinates or len(coordinates) < 2:
+    if coordinates is None or len(coordinates) < 2:
         return True, []  # Empty or single point - technically valid
 
     warnings = []
     large_gaps = []
 
-    for i in range(len(coordinates) - 1):
-        point1 = (coordinates[i][1], coordinates[i][0])  # (lat, lon)
-        point2 = (coordinates[i + 1][1], coordinates[i + 1][0])
+    # Only "is this gap > max_gap_km" matters here, so the chord-based
+    # lengths (one vectorized pass, no per-pair geodesic) are accurate enough
+    coords = np.asarray(coordinates, dtype=np.float64)
+    segment_km = chord_segment_lengths_km(coords)
 
-        distance_km = geodesic(point1, point2).kilometers
-
-        if distance_km > max_gap_km:
-            large_gaps.append((i, i + 1, distance_km))
-            warnings.append(
-                f"Large gap: {distance_km:.1f}km between points {i}-{i+1} "
-                f"({coordinates[i]} → {coordinates[i+1]})"
-            )
+    for i in np.flatnonzero(segment_km > max_gap_km).tolist():
+        distance_km = float(segment_km[i])
+        large_gaps.append((i, i + 1, distance_km))
+        warnings.append(
+            f"Large gap: {distance_km:.1f}km between points {i}-{i+1} "
+            f"({tuple(coords[i].tolist())} → {tuple(coords[i + 1].tolist())})"
+        )
 
     # Check if too many large gaps
     num_gaps = len(large_gaps)
@@ -118,26 +154,29 @@ def validate_coordinates_for_matching(
 # ==============================================================================
 
 def mapbox_map_matching(
-    coordinates: List[Tuple[float, float]],
+    coordinates: Union[List[Tuple[float, float]], np.ndarray],
     mapbox_token: str,
-    profile: str = 'driving'
-) -> Optional[List[Tuple[float, float]]]:
+    profile: str = 'driving',
+    session: Optional[requests.Session] = None
+) -> Optional[np.ndarray]:
     """
     Use Mapbox Map Matching API to refine GPS trace.
 
     This function aligns a GPS trace to the road network, improving quality
     and density. It does NOT optimize routes - it follows the input trace.
 
+    Invalid input (NaN, out-of-range values, more than 100 points) is
+    reported and returns None before any request is made; consecutive
+    duplicate points are dropped.
+
     Args:
-        coordinates: List of (lon, lat) tuples (max 100)
+        coordinates: List of (lon, lat) tuples or (N, 2) array (max 100)
         mapbox_token: Mapbox API token
         profile: Routing profile ('driving', 'cycling', 'walking')
+        session: requests session to send through (default: shared pooled session)
 
     Returns:
-        List of refined (lon, lat) tuples or None on failure
-
-    Raises:
-        ValueError: If coordinates > 100 or invalid format
+        (N, 2) array of refined (lon, lat) or None on failure
 
     Example:
         >>> coords = [(-7.79, 41.16), (-7.75, 41.17), (-7.60, 41.18)]
@@ -148,10 +187,20 @@ def mapbox_map_matching(
     """
 
     # Validate inputs
-    if not coordinates:
+    if coordinates is None or len(coordinates) == 0:
         print("❌ Error: Empty coordinates list")
         return None
 
+    try:
+        coordinates = clean_coordinates(coordinates)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return None
+
+    if len(coordinates) < 2:
+        print("❌ Error: Need at least 2 distinct coordinates")
+        return None
+
     if len(coordinates) > MAX_COORDS_PER_REQUEST:
         print(f"❌ Error: Too many coordinates ({len(coordinates)}). Max: {MAX_COORDS_PER_REQUEST}")
         print(f"   💡 Use batch_map_matching() for long roads")
@@ -162,7 +211,7 @@ def mapbox_map_matching(
         return None
 
     # Format coordinates as semicolon-separated string: "lon,lat;lon,lat;..."
-    coords_str = ";".join([f"{lon},{lat}" for lon, lat in coordinates])
+    coords_str = format_coordinates(coordinates)
 
     # Build request URL
     url = f"{MAPBOX_API_BASE}/{profile}/{coords_str}"
@@ -175,22 +224,29 @@ def mapbox_map_matching(
         'tidy': 'true'  # Remove outliers
     }
 
+    # Identical traces match identically: no API call, no rate limit
+    cache_key = route_cache.request_key(url, params)
+    cached = route_cache.get(cache_key)
+    if cached is not None:
+        print(f"💾 Map Matching cache hit: {len(coordinates)} → {len(cached)} points")
+        return cached
+
     try:
-        # Make request
-        response = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        # Make request (waits only if the shared quota is used up)
+        MAPBOX_BUCKET.acquire()
+        response = (session or _get_session()).get(url, params=params, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
-        data = response.json()
+        data = loads(response.content)  # orjson when installed
 
         # Parse response
         if 'matchings' in data and len(data['matchings']) > 0:
             # Extract geometry from first matching
             geometry = data['matchings'][0]['geometry']
 
-            # Convert GeoJSON coordinates [[lon, lat], ...] to tuples
-            matched_coords = [
-                (coord[0], coord[1])
-                for coord in geometry['coordinates']
-            ]
+            # GeoJSON coordinates [[lon, lat], ...] straight into one array
+            matched_coords = np.asarray(geometry['coordinates'], dtype=np.float64).reshape(-1, 2)
+
+            route_cache.put(cache_key, matched_coords)
 
             # Log success
             input_count = len(coordinates)
@@ -212,8 +268,10 @@ def mapbox_map_matching(
     except requests.exceptions.HTTPError as e:
         status_code = e.response.status_code
         if status_code == 429:
-            print("❌ Rate limit exceeded (HTTP 429)")
-            print("   💡 Add delay between requests or reduce frequency")
+            # Hold back every other batch for as long as Mapbox asks
+            backoff_s = retry_after_seconds(e.response)
+            MAPBOX_BUCKET.penalize(backoff_s)
+            print(f"❌ Rate limit exceeded (HTTP 429) - pausing requests {backoff_s:.0f}s")
         else:
             print(f"❌ HTTP error {status_code}: {e}")
         return None
@@ -228,25 +286,31 @@ def mapbox_map_matching(
 # ==============================================================================
 
 def batch_map_matching(
-    coordinates: List[Tuple[float, float]],
+    coordinates: Union[List[Tuple[float, float]], np.ndarray],
     mapbox_token: str,
     profile: str = 'driving',
-    batch_size: int = 100
-) -> List[Tuple[float, float]]:
+    batch_size: int = 100,
+    session: Optional[requests.Session] = None
+) -> np.ndarray:
     """
     Process long coordinate lists (>100 points) in batches.
 
-    Splits coordinates into chunks of max 100 points, processes each batch
-    separately with rate limiting, and merges results.
+    Splits coordinates into chunks of max 100 points, matches the batches
+    concurrently (up to MAX_CONCURRENT_REQUESTS; the session retries 429
+    with backoff), and merges results in input order. Batches are views
+    into one (N, 2) array (no per-batch list copies); joints where a batch
+    starts on the previous batch's last point are de-duplicated in one
+    vectorized haversine pass.
 
     Args:
-        coordinates: List of (lon, lat) tuples
+        coordinates: List of (lon, lat) tuples or (N, 2) array
         mapbox_token: Mapbox API token
         profile: Routing profile ('driving', 'cycling', 'walking')
         batch_size: Maximum coords per batch (default: 100)
+        session: requests session shared by all batches (default: shared pooled session)
 
     Returns:
-        List of all refined coordinates merged from batches
+        (N, 2) float64 array of all refined coordinates merged from batches
 
     Example:
         >>> coords = [...]  # 300 points
@@ -255,42 +319,49 @@ def batch_map_matching(
         300 → 4521 points (15.1x improvement)
     """
 
-    if not coordinates:
-        return []
+    coords = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
 
-    if len(coordinates) <= MAX_COORDS_PER_REQUEST:
+    if len(coords) == 0:
+        return coords
+
+    if len(coords) <= MAX_COORDS_PER_REQUEST:
         # No batching needed
-        result = mapbox_map_matching(coordinates, mapbox_token, profile)
-        return result if result else coordinates
+        result = mapbox_map_matching(coords, mapbox_token, profile, session)
+        return result if result is not None else coords
 
     # Calculate number of batches
-    num_batches = (len(coordinates) + batch_size - 1) // batch_size
-
-    print(f"🔄 Batch processing: {len(coordinates)} points → {num_batches} batches")
+    num_batches = (len(coords) + batch_size - 1) // batch_size
 
-    all_matched = []
+    print(f"🔄 Batch processing: {len(coords)} points → {num_batches} batches")
 
-    for i in range(0, len(coordinates), batch_size):
-        batch_num = (i // batch_size) + 1
-        batch = coordinates[i:i + batch_size]
+    batches = [coords[i:i + batch_size] for i in range(0, len(coords), batch_size)]  # views, no copy
 
+    def match_batch(batch_num: int, batch: np.ndarray) -> np.ndarray:
         print(f"   📍 Processing batch {batch_num}/{num_batches} ({len(batch)} points)...")
 
-        # Process batch
-        matched = mapbox_map_matching(batch, mapbox_token, profile)
+        matched = mapbox_map_matching(batch, mapbox_token, profile, session)
 
-        if matched:
-            all_matched.extend(matched)
-        else:
-            # If matching fails, keep original batch
-            print(f"   ⚠️  Batch {batch_num} failed - using original coordinates")
-            all_matched.extend(batch)
+        if matched is not None:
+            return matched
+
+        # If matching fails, keep original batch
+        print(f"   ⚠️  Batch {batch_num} failed - using original coordinates")
+        return batch
+
+    # Batches are independent: fetch together, map() keeps input order
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_REQUESTS, num_batches)) as executor:
+        pieces = list(executor.map(match_batch, range(1, num_batches + 1), batches))
+
+    # Stitch: drop a batch's first point when it repeats the previous batch's last
+    ends = np.array([piece[-1] for piece in pieces[:-1]])
+    starts = np.array([piece[0] for piece in pieces[1:]])
+    duplicate = haversine_km(ends[:, 0], ends[:, 1], starts[:, 0], starts[:, 1]) < STITCH_TOLERANCE_KM
+    for k in np.flatnonzero(duplicate):
+        pieces[k + 1] = pieces[k + 1][1:]
 
-        # Rate limiting: Wait between batches to avoid HTTP 429
-        if i + batch_size < len(coordinates):
-            time.sleep(RATE_LIMIT_DELAY)
+    all_matched = np.concatenate(pieces)
 
-    print(f"✅ Batch complete: {len(coordinates)} → {len(all_matched)} points")
+    print(f"✅ Batch complete: {len(coords)} → {len(all_matched)} points")
 
     return all_matched
 
@@ -334,7 +405,7 @@ if __name__ == "__main__":
 
     try:
         result = mapbox_map_matching(test_coords_small, MAPBOX_TOKEN)
-        if result:
+        if result is not None:
             print(f"✅ Success: {len(test_coords_small)} → {len(result)} points")
         else:
             print(f"❌ Failed: No result returned")
@@ -356,7 +427,7 @@ if __name__ == "__main__":
 
     try:
         result = batch_map_matching(test_coords_large, MAPBOX_TOKEN)
-        if result:
+        if len(result):
             print(f"✅ Success: {len(test_coords_large)} → {len(result)} points")
         else:
             print(f"❌ Failed: No result returned")
@@ -370,7 +441,7 @@ if __name__ == "__main__":
     print("-" * 70)
     try:
         result = mapbox_map_matching(test_coords_small, "invalid_token_xyz")
-        if not result:
+        if result is None:
             print("✅ Correctly handled invalid token (returned None)")
         else:
             print("⚠️  Unexpected: Got result with invalid token")
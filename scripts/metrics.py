@@ -9,9 +9,24 @@ Author: Road Explorer Portugal
 ==============================================================================
 """
 
-from geopy.distance import geodesic
+import heapq
+import importlib
 import math
-from typing import List, Tuple, Dict, Optional
+import numpy as np
+from functools import lru_cache
+from typing import List, Tuple, Dict, Optional, Union
+
+
+# Mean Earth radius used by the spherical (haversine) helpers
+EARTH_RADIUS_KM = 6371.0
+
+# Below this many points a plain math loop over a list beats the array
+# conversion + kernel dispatch (e.g. short Directions responses)
+SMALL_PATH_POINTS = 32
+
+# Polylines shorter than this are simplified with NumPy; the compiled
+# Douglas-Peucker kernel only pays off once per-span dispatch dominates
+DP_KERNEL_MIN_POINTS = 256
 
 
 # ==============================================================================
@@ -42,11 +57,15 @@ def calculate_total_distance(coordinates: List[Tuple[float, float]]) -> float:
         - Requires at least 2 coordinates
         - Returns 0.0 for invalid input
         - Coordinates format: (longitude, latitude)
+        - geopy is imported on first call (~0.4 s), so modules that only
+          need the haversine helpers do not pay for it
     """
 
-    if not coordinates or len(coordinates) < 2:
+    if coordinates is None or len(coordinates) < 2:
         return 0.0
 
+    from geopy.distance import geodesic
+
     total_distance = 0.0
 
     # Sum distances between consecutive GPS points
@@ -62,6 +81,399 @@ def calculate_total_distance(coordinates: List[Tuple[float, float]]) -> float:
     return round(total_distance, 2)
 
 
+def haversine_km(
+    lon1: Union[float, np.ndarray],
+    lat1: Union[float, np.ndarray],
+    lon2: Union[float, np.ndarray],
+    lat2: Union[float, np.ndarray]
+) -> Union[float, np.ndarray]:
+    """
+    Great-circle distance on a spherical Earth, element-wise over arrays.
+
+    Args:
+        lon1, lat1: Start point(s) in degrees (scalars or arrays)
+        lon2, lat2: End point(s) in degrees (broadcast against the start)
+
+    Returns:
+        Distance(s) in kilometers (ndarray for array input)
+
+    Example:
+        >>> round(float(haversine_km(-8.0, 39.5, -8.01, 39.51)), 2)
+        1.4
+    """
+    lon1, lat1, lon2, lat2 = (np.radians(v) for v in (lon1, lat1, lon2, lat2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _haversine_path_loop(arr: np.ndarray) -> float:
+    """
+    Streaming haversine sum over a contiguous (N, 2) float64 array.
+
+    Plain Python loop on purpose: it is slow interpreted, but Numba compiles
+    it to a single pass with no temporary arrays (see _get_path_kernel).
+    """
+    to_rad = math.pi / 180.0
+    total = 0.0
+    lon1 = arr[0, 0] * to_rad
+    lat1 = arr[0, 1] * to_rad
+    for i in range(1, arr.shape[0]):
+        lon2 = arr[i, 0] * to_rad
+        lat2 = arr[i, 1] * to_rad
+        s_lat = math.sin((lat2 - lat1) * 0.5)
+        s_lon = math.sin((lon2 - lon1) * 0.5)
+        a = s_lat * s_lat + math.cos(lat1) * math.cos(lat2) * s_lon * s_lon
+        total += math.asin(math.sqrt(a))
+        lon1, lat1 = lon2, lat2
+    return 2.0 * EARTH_RADIUS_KM * total
+
+
+def _haversine_path_small(coordinates: List[Tuple[float, float]]) -> float:
+    """
+    Haversine sum over a short (lon, lat) sequence with the math module.
+
+    No array is built; each latitude's cosine is computed once and carried
+    to the next segment.
+    """
+    to_rad = math.pi / 180.0
+    points = iter(coordinates)
+    lon1, lat1 = next(points)
+    lon1, lat1 = lon1 * to_rad, lat1 * to_rad
+    cos1 = math.cos(lat1)
+    total = 0.0
+    for lon2, lat2 in points:
+        lon2, lat2 = lon2 * to_rad, lat2 * to_rad
+        cos2 = math.cos(lat2)
+        s_lat = math.sin((lat2 - lat1) * 0.5)
+        s_lon = math.sin((lon2 - lon1) * 0.5)
+        total += math.asin(math.sqrt(s_lat * s_lat + cos1 * cos2 * s_lon * s_lon))
+        lon1, lat1, cos1 = lon2, lat2, cos2
+    return 2.0 * EARTH_RADIUS_KM * total
+
+
+@lru_cache(maxsize=1)
+def _get_path_kernel():
+    """JIT-compile _haversine_path_loop with Numba on first use (None without Numba)."""
+    try:
+        numba = importlib.import_module("numba")
+    except ImportError:
+        return None
+    return numba.njit(cache=True, fastmath=True)(_haversine_path_loop)
+
+
+def haversine_path_km(coordinates: Union[List[Tuple[float, float]], np.ndarray]) -> float:
+    """
+    Total haversine length of a (lon, lat) polyline in one vectorized pass.
+
+    Faster (and up to ~0.5% less precise) than calculate_total_distance(); meant for
+    long Mapbox polylines where per-point geodesic calls dominate.
+
+    Args:
+        coordinates: (lon, lat) sequence or (N, 2) array
+
+    Returns:
+        float: Distance in kilometers (unrounded), 0.0 for fewer than 2 points
+
+    Note:
+        Uses a Numba kernel (no temporaries) when numba is installed; lists
+        shorter than SMALL_PATH_POINTS take a pure-math path instead
+    """
+    if not isinstance(coordinates, np.ndarray) and 2 <= len(coordinates) < SMALL_PATH_POINTS:
+        return _haversine_path_small(coordinates)
+
+    arr = np.ascontiguousarray(coordinates, dtype=np.float64)
+    if arr.ndim != 2 or len(arr) < 2:
+        return 0.0
+
+    kernel = _get_path_kernel()
+    if kernel is not None:
+        return float(kernel(arr))
+
+    lon, lat = arr[:, 0], arr[:, 1]
+    return float(haversine_km(lon[:-1], lat[:-1], lon[1:], lat[1:]).sum())
+
+
+def road_metrics(coordinates: Union[List[Tuple[float, float]], np.ndarray]) -> Tuple[float, float]:
+    """
+    Length and point density of a (lon, lat) polyline in one pass.
+
+    Same compiled haversine kernel as haversine_path_km(); the density is
+    derived from the point count without another walk over the points.
+
+    Args:
+        coordinates: (lon, lat) sequence or (N, 2) array
+
+    Returns:
+        Tuple[float, float]: (distance_km, density in points/km); density is
+        0.0 when the path has no length
+
+    Example:
+        >>> distance_km, density = road_metrics(coords)
+        >>> print(f"{distance_km:.1f} km, {density:.2f} pts/km")
+        27.0 km, 20.07 pts/km
+    """
+    distance_km = haversine_path_km(coordinates)
+    density = len(coordinates) / distance_km if distance_km > 0 else 0.0
+    return distance_km, density
+
+
+def chord_segment_lengths_km(coordinates: Union[List[Tuple[float, float]], np.ndarray]) -> np.ndarray:
+    """
+    Approximate length of every segment from 3D chord lengths.
+
+    Each point is turned into a unit vector (x, y, z) once, so a segment
+    costs a subtraction and a norm instead of its own trig; the chord c is
+    turned back into an arc with c + c**3 / 24 (error < 0.01% below 500 km).
+    Meant for threshold checks (e.g. gap detection), not reported distances.
+
+    Args:
+        coordinates: (lon, lat) sequence or (N, 2) array
+
+    Returns:
+        np.ndarray: N - 1 segment lengths in kilometers (empty for < 2 points)
+
+    Example:
+        >>> chord_segment_lengths_km([(-8.0, 39.5), (-8.01, 39.51)]).round(2)
+        array([1.4])
+    """
+    xyz = _unit_vectors(np.asarray(coordinates, dtype=np.float64).reshape(-1, 2))
+
+    chord = np.sqrt((np.diff(xyz, axis=0) ** 2).sum(axis=1))
+    return EARTH_RADIUS_KM * (chord + chord ** 3 / 24.0)
+
+
+def _unit_vectors(arr: np.ndarray) -> np.ndarray:
+    """(N, 2) degrees (lon, lat) → (N, 3) unit vectors on the sphere."""
+    lon, lat = np.radians(arr[:, 0]), np.radians(arr[:, 1])
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def _span_offsets(xyz: np.ndarray, i: int, j: int) -> np.ndarray:
+    """
+    Angular distance (radians) of points i+1..j-1 from the arc i → j.
+
+    Points whose projection falls on the arc are measured to the great
+    circle (asin |p · n|); points beyond either end to the nearer endpoint,
+    so hairpins that fold back past the span are not dropped.
+    """
+    a, b = xyz[i], xyz[j]
+    span = xyz[i + 1:j]
+    to_a = 2.0 * np.arcsin(np.minimum(np.linalg.norm(span - a, axis=1) / 2.0, 1.0))
+
+    normal = np.cross(a, b)
+    length = np.linalg.norm(normal)
+    if length < 1e-12:
+        # Span starts and ends on the same point (loop): distance to it
+        return to_a
+
+    normal /= length
+    to_b = 2.0 * np.arcsin(np.minimum(np.linalg.norm(span - b, axis=1) / 2.0, 1.0))
+    on_arc = (span @ np.cross(normal, a) >= 0) & (span @ np.cross(b, normal) >= 0)
+    return np.where(on_arc, np.arcsin(np.minimum(np.abs(span @ normal), 1.0)), np.minimum(to_a, to_b))
+
+
+def _dp_keep_loop(xyz: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Douglas-Peucker keep mask over (N, 3) unit vectors, same offsets as _span_offsets.
+
+    Plain loops on purpose: Numba compiles this to one scan per span with
+    no temporary arrays (see _get_dp_kernel).
+    """
+    n = xyz.shape[0]
+    keep = np.zeros(n, dtype=np.bool_)
+    keep[0] = True
+    keep[n - 1] = True
+    stack = [(0, n - 1)]
+
+    while len(stack) > 0:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+
+        ax, ay, az = xyz[i, 0], xyz[i, 1], xyz[i, 2]
+        bx, by, bz = xyz[j, 0], xyz[j, 1], xyz[j, 2]
+        nx, ny, nz = ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx
+        length = math.sqrt(nx * nx + ny * ny + nz * nz)
+        degenerate = length < 1e-12
+        if not degenerate:
+            nx, ny, nz = nx / length, ny / length, nz / length
+        # p · (n × a) >= 0 and p · (b × n) >= 0  <=>  projection on the arc
+        ux, uy, uz = ny * az - nz * ay, nz * ax - nx * az, nx * ay - ny * ax
+        vx, vy, vz = by * nz - bz * ny, bz * nx - bx * nz, bx * ny - by * nx
+
+        best = -1.0
+        best_k = i + 1
+        for k in range(i + 1, j):
+            px, py, pz = xyz[k, 0], xyz[k, 1], xyz[k, 2]
+            da = math.sqrt((px - ax) ** 2 + (py - ay) ** 2 + (pz - az) ** 2)
+            to_a = 2.0 * math.asin(min(da * 0.5, 1.0))
+            if degenerate:
+                d = to_a
+            elif px * ux + py * uy + pz * uz >= 0 and px * vx + py * vy + pz * vz >= 0:
+                d = math.asin(min(abs(px * nx + py * ny + pz * nz), 1.0))
+            else:
+                db = math.sqrt((px - bx) ** 2 + (py - by) ** 2 + (pz - bz) ** 2)
+                d = min(to_a, 2.0 * math.asin(min(db * 0.5, 1.0)))
+            if d > best:
+                best = d
+                best_k = k
+
+        if best > tolerance:
+            keep[best_k] = True
+            stack.append((i, best_k))
+            stack.append((best_k, j))
+
+    return keep
+
+
+@lru_cache(maxsize=1)
+def _get_dp_kernel():
+    """JIT-compile _dp_keep_loop with Numba on first use (None without Numba)."""
+    try:
+        numba = importlib.import_module("numba")
+    except ImportError:
+        return None
+    return numba.njit(cache=True)(_dp_keep_loop)
+
+
+def douglas_peucker(
+    coordinates: Union[List[Tuple[float, float]], np.ndarray],
+    epsilon_m: float,
+    max_vertices: Optional[int] = None
+) -> np.ndarray:
+    """
+    Simplify a (lon, lat) polyline with Douglas-Peucker on the sphere.
+
+    Offsets are true distances to each span's great-circle arc, not planar
+    degree distances, which would over-simplify east-west spans. Iterative
+    (no recursion limit): spans wait in a heap ordered by their farthest
+    point, and each span's offsets are one vectorized pass. Splitting the
+    worst span first gives the same result as classic DP, and lets
+    max_vertices stop early with the most significant points kept.
+
+    Args:
+        coordinates: (lon, lat) sequence or (N, 2) array
+        epsilon_m: Maximum allowed deviation in meters
+        max_vertices: Optional cap on the number of points returned (>= 2)
+
+    Returns:
+        np.ndarray: Kept (lon, lat) points, endpoints always included
+
+    Note:
+        Without max_vertices, polylines of DP_KERNEL_MIN_POINTS or more use a
+        Numba kernel when numba is installed
+
+    Example:
+        >>> douglas_peucker([(-8.0, 40.0), (-7.9, 40.00001), (-7.8, 40.0)], 5.0)
+        array([[-8. , 40. ],
+               [-7.8, 40. ]])
+    """
+    arr = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    n = len(arr)
+    if n < 3:
+        return arr.copy()
+
+    xyz = _unit_vectors(arr)
+    tolerance = epsilon_m / 1000.0 / EARTH_RADIUS_KM  # radians
+
+    kernel = _get_dp_kernel() if max_vertices is None and n >= DP_KERNEL_MIN_POINTS else None
+    if kernel is not None:
+        return arr[kernel(xyz, tolerance)]
+
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    kept = 2
+    heap = []
+
+    def push(i: int, j: int) -> None:
+        if j - i >= 2:
+            offsets = _span_offsets(xyz, i, j)
+            k = int(np.argmax(offsets))
+            heapq.heappush(heap, (-offsets[k], i, j, i + 1 + k))
+
+    push(0, n - 1)
+    while heap and (max_vertices is None or kept < max_vertices):
+        worst, i, j, k = heapq.heappop(heap)
+        if -worst <= tolerance:
+            break  # Every remaining span is within tolerance
+        keep[k] = True
+        kept += 1
+        push(i, k)
+        push(k, j)
+
+    return arr[keep]
+
+
+@lru_cache(maxsize=1)
+def _get_geom_extension():
+    """The compiled _geom_kernel extension (_geom_kernel.pyx), or None if not built."""
+    try:
+        return importlib.import_module("_geom_kernel")
+    except ImportError:
+        return None
+
+
+def measure_and_simplify(
+    coordinates: Union[List[Tuple[float, float]], np.ndarray],
+    epsilon_m: float
+) -> Tuple[float, np.ndarray]:
+    """
+    Haversine length of a route and its Douglas-Peucker simplification.
+
+    With the optional _geom_kernel C extension built, both come from one
+    kernel that reads the coordinates once; otherwise this is
+    haversine_path_km() followed by douglas_peucker() (same results).
+
+    Args:
+        coordinates: (lon, lat) sequence or (N, 2) array
+        epsilon_m: Maximum allowed deviation in meters
+
+    Returns:
+        Tuple[float, np.ndarray]: (distance_km of the full route, kept points)
+
+    Example:
+        >>> distance_km, simplified = measure_and_simplify(route, 5.0)
+        >>> print(f"{distance_km:.1f} km, {len(route)} → {len(simplified)} points")
+        274.3 km, 8120 → 1432 points
+    """
+    arr = np.ascontiguousarray(coordinates, dtype=np.float64).reshape(-1, 2)
+
+    extension = _get_geom_extension()
+    if extension is not None and len(arr) >= 3:
+        tolerance = epsilon_m / 1000.0 / EARTH_RADIUS_KM
+        return extension.simplify_route(arr, tolerance, EARTH_RADIUS_KM)
+
+    return haversine_path_km(arr), douglas_peucker(arr, epsilon_m)
+
+
+def density_upper_bound(coordinates: Union[List[Tuple[float, float]], np.ndarray]) -> float:
+    """
+    Cheap upper bound on point density from the endpoints alone.
+
+    A path is never shorter than the straight line between its ends, so
+    points / straight_line_km >= the real density. If even this bound is
+    below the minimum, the geometry can be rejected without a distance pass.
+
+    Args:
+        coordinates: (lon, lat) sequence or (N, 2) array
+
+    Returns:
+        float: Upper bound in points/km (inf when the ends coincide)
+
+    Example:
+        >>> if density_upper_bound(coords) < 2.0:
+        ...     print("too sparse, skip full validation")
+    """
+    if coordinates is None or len(coordinates) < 2:
+        return 0.0
+
+    (lon1, lat1), (lon2, lat2) = coordinates[0], coordinates[-1]
+    straight_km = float(haversine_km(lon1, lat1, lon2, lat2))
+    return len(coordinates) / straight_km if straight_km > 0 else math.inf
+
+
 # ==============================================================================
 # Bearing and Direction Calculations
 # ==============================================================================
@@ -208,7 +620,7 @@ def analyze_curves(
     """
 
     # Validate input
-    if not coordinates or len(coordinates) < 3:
+    if coordinates is None or len(coordinates) < 3:
         return {
             'curve_count_total': 0,
             'curve_count_gentle': 0,
@@ -337,7 +749,7 @@ def calculate_all_metrics(coordinates: List[Tuple[float, float]]) -> Dict:
         Curves: 147
     """
 
-    if not coordinates or len(coordinates) < 2:
+    if coordinates is None or len(coordinates) < 2:
         return {
             'distance_km': 0.0,
             'curve_count_total': 0,
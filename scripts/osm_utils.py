@@ -13,9 +13,14 @@ import requests
 import time
 import json
 import os
+import hashlib
+import numpy as np
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Tuple, Optional, Dict
 
+from http_utils import create_session
+
 
 # ==============================================================================
 # Configuration
@@ -28,6 +33,11 @@ RATE_LIMIT_DELAY = 1.0  # seconds between requests (be respectful!)
 # Cache configuration
 CACHE_DIR = Path(__file__).parent / "cache"
 CACHE_MAX_AGE_DAYS = 30  # Cache expires after 30 days
+OVERPASS_CACHE_DIR = CACHE_DIR / "overpass"  # Raw geometry per (road_ref, bbox), as .npy
+
+# Continental Portugal ONLY (south, west, north, east) - very restrictive to ensure quality
+# Lat: 36.96-42.15°N, Lon: -9.50 to -6.19°W
+PORTUGAL_BBOX = (36.96, -9.50, 42.15, -6.19)
 
 # Segmentation configuration (for long roads)
 SEGMENTATION_ENABLED = True  # Auto-segment on timeout
@@ -36,17 +46,53 @@ NUM_SEGMENTS = 4  # Divide bbox into 4 vertical segments
 # Disconnected segments threshold
 MAX_DISCONNECTED_SEGMENTS = 10  # Maximum disconnected segments to allow
 
+# Keep-alive connections to Overpass (reused across roads in one run)
+SESSION_POOL_SIZE = 2
+
+
+@lru_cache(maxsize=1)
+def _get_session() -> requests.Session:
+    """
+    Shared keep-alive session for Overpass queries.
+
+    Only connection errors are retried here: 429/504 responses must reach
+    query_overpass_api() so 504 can trigger bbox segmentation.
+    """
+    return create_session(retries=2, status_forcelist=(), pool_size=SESSION_POOL_SIZE)
+
 
 # ==============================================================================
 # Cache Functions
 # ==============================================================================
 
-def _load_cache(road_ref: str) -> Optional[List[Tuple[float, float]]]:
+def _overpass_cache_file(road_ref: str, bbox: Optional[Tuple[float, float, float, float]]) -> Path:
+    """
+    Cache file for one (road_ref, bbox) query.
+
+    The bbox is rounded to 3 decimals (~100 m) so float noise in callers'
+    boxes still hits; a genuinely different box gets its own entry.
+    """
+    rounded = None if bbox is None else tuple(round(v, 3) for v in bbox)
+    digest = hashlib.sha1(f"{road_ref}|{rounded}".encode("utf-8")).hexdigest()[:12]
+    name = road_ref.replace(" ", "_").replace("/", "_")
+    return OVERPASS_CACHE_DIR / f"{name}_{digest}.npy"
+
+
+def _load_cache(
+    road_ref: str,
+    bbox: Optional[Tuple[float, float, float, float]] = None
+) -> Optional[List[Tuple[float, float]]]:
     """
     Load road coordinates from cache if exists and fresh.
 
+    Looks for the binary per-bbox entry first, then the older per-road
+    JSON file (written before entries were keyed by bbox). That file holds
+    a whole-road query, so it is only used for the default Portugal bbox,
+    never for a section's smaller box.
+
     Args:
         road_ref: Road reference (e.g., "N 222")
+        bbox: Bounding box the coordinates were fetched for
 
     Returns:
         Cached coordinates if available and fresh, None otherwise
@@ -54,7 +100,26 @@ def _load_cache(road_ref: str) -> Optional[List[Tuple[float, float]]]:
     if not CACHE_DIR.exists():
         return None
 
-    # Normalize road_ref for filename (remove spaces, special chars)
+    binary_file = _overpass_cache_file(road_ref, bbox)
+    if binary_file.exists():
+        age_days = (time.time() - binary_file.stat().st_mtime) / 86400
+
+        if age_days > CACHE_MAX_AGE_DAYS:
+            print(f"   ⚠️  Cache expired ({int(age_days)} days old), re-fetching...")
+            return None
+
+        try:
+            coords = list(map(tuple, np.load(binary_file).tolist()))
+            print(f"   💾 Loaded from cache ({len(coords)} points, {int(age_days)}d old)")
+            return coords
+        except Exception as e:
+            print(f"   ⚠️  Cache read error: {e}")
+            return None
+
+    # Legacy per-road JSON (not keyed by bbox): whole-road queries only
+    if bbox is not None and tuple(round(v, 3) for v in bbox) != PORTUGAL_BBOX:
+        return None
+
     cache_filename = road_ref.replace(" ", "_").replace("/", "_") + ".json"
     cache_file = CACHE_DIR / cache_filename
 
@@ -62,7 +127,6 @@ def _load_cache(road_ref: str) -> Optional[List[Tuple[float, float]]]:
         return None
 
     # Check cache age
-    import time
     age_seconds = time.time() - cache_file.stat().st_mtime
     age_days = age_seconds / 86400
 
@@ -95,25 +159,28 @@ def _load_cache(road_ref: str) -> Optional[List[Tuple[float, float]]]:
         return None
 
 
-def _save_cache(road_ref: str, coordinates: List[Tuple[float, float]]) -> None:
+def _save_cache(
+    road_ref: str,
+    coordinates: List[Tuple[float, float]],
+    bbox: Optional[Tuple[float, float, float, float]] = None
+) -> None:
     """
     Save road coordinates to cache.
 
+    Stored as a raw (N, 2) float64 .npy keyed by (road_ref, bbox), separate
+    from the hybrid strategy's validated-result cache, so a road whose OSM
+    data fails validation still skips Overpass on the next run.
+
     Args:
         road_ref: Road reference (e.g., "N 222")
         coordinates: List of (lon, lat) tuples
+        bbox: Bounding box the coordinates were fetched for
     """
     try:
         # Create cache directory if doesn't exist
-        CACHE_DIR.mkdir(exist_ok=True)
-
-        # Normalize road_ref for filename
-        cache_filename = road_ref.replace(" ", "_").replace("/", "_") + ".json"
-        cache_file = CACHE_DIR / cache_filename
+        OVERPASS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
-        # Save coordinates as JSON
-        with open(cache_file, 'w') as f:
-            json.dump(coordinates, f)
+        np.save(_overpass_cache_file(road_ref, bbox), np.asarray(coordinates, dtype=np.float64))
 
         print(f"   💾 Saved to cache ({len(coordinates)} points)")
     except Exception as e:
@@ -334,15 +401,14 @@ def get_road_from_osm(road_ref: str, bbox: Optional[Tuple[float, float, float, f
     # TIGHT bbox for Continental Portugal to avoid fetching roads from other countries
     # (Previous bbox was too wide and returned roads from Africa with same ref)
     if bbox is None:
-        # Continental Portugal ONLY - very restrictive to ensure quality
-        bbox = (36.96, -9.50, 42.15, -6.19)  # Lat: 36.96-42.15°N, Lon: -9.50 to -6.19°W
+        bbox = PORTUGAL_BBOX
         print(f"📍 Using Continental Portugal bbox: {bbox}")
 
     print(f"📡 Fetching road data for: {road_ref}")
     print(f"   Bounding box: S={bbox[0]}, W={bbox[1]}, N={bbox[2]}, E={bbox[3]}")
 
     # STEP 1: Try loading from cache
-    cached = _load_cache(road_ref)
+    cached = _load_cache(road_ref, bbox)
     if cached:
         return cached
 
@@ -350,7 +416,7 @@ def get_road_from_osm(road_ref: str, bbox: Optional[Tuple[float, float, float, f
     # Many national roads are stored as relations in OSM which contain ALL segments
     relation_coords = fetch_route_relation(road_ref, bbox)
     if relation_coords:
-        _save_cache(road_ref, relation_coords)
+        _save_cache(road_ref, relation_coords, bbox)
         return relation_coords
 
     # Try alternative ref formats for relation query
@@ -359,7 +425,7 @@ def get_road_from_osm(road_ref: str, bbox: Optional[Tuple[float, float, float, f
         print(f"   🔄 Layer 1: Trying alternative format: {alt_ref}")
         relation_coords = fetch_route_relation(alt_ref, bbox)
         if relation_coords:
-            _save_cache(road_ref, relation_coords)  # Cache under original ref
+            _save_cache(road_ref, relation_coords, bbox)  # Cache under original ref
             return relation_coords
 
     # Build Overpass QL query with bounding box
@@ -423,7 +489,7 @@ def get_road_from_osm(road_ref: str, bbox: Optional[Tuple[float, float, float, f
                     if len(coordinates) < 100:
                         print(f"   ⚠️  WARNING: Only {len(coordinates)} points - may be insufficient")
 
-                    _save_cache(road_ref, coordinates)
+                    _save_cache(road_ref, coordinates, bbox)
                     return coordinates
 
             # Still no results after trying alternatives
@@ -437,7 +503,7 @@ def get_road_from_osm(road_ref: str, bbox: Optional[Tuple[float, float, float, f
         if len(coordinates) < 100:
             print(f"   ⚠️  WARNING: Only {len(coordinates)} points - may be insufficient")
 
-        _save_cache(road_ref, coordinates)
+        _save_cache(road_ref, coordinates, bbox)
         return coordinates
 
     except requests.Timeout:
@@ -449,7 +515,7 @@ def get_road_from_osm(road_ref: str, bbox: Optional[Tuple[float, float, float, f
             try:
                 coordinates = _fetch_segmented(road_ref, bbox)
                 if coordinates:
-                    _save_cache(road_ref, coordinates)
+                    _save_cache(road_ref, coordinates, bbox)
                     return coordinates
                 else:
                     print(f"   ❌ Segmentation also failed")
@@ -526,12 +592,13 @@ def _generate_ref_alternatives(road_ref: str) -> List[str]:
     return unique_alternatives
 
 
-def query_overpass_api(query: str) -> dict:
+def query_overpass_api(query: str, session: Optional[requests.Session] = None) -> dict:
     """
     Execute a raw Overpass QL query.
 
     Args:
         query (str): Overpass QL query string
+        session: requests session to send through (default: shared pooled session)
 
     Returns:
         dict: JSON response from Overpass API
@@ -543,7 +610,7 @@ def query_overpass_api(query: str) -> dict:
     """
 
     try:
-        response = requests.post(
+        response = (session or _get_session()).post(
             OVERPASS_API_URL,
             data={'data': query},
             timeout=REQUEST_TIMEOUT,
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+==============================================================================
+Encoded Polyline Decoding
+==============================================================================
+Module: polyline_utils.py
+Purpose: Vectorized decoder for Google/Mapbox encoded polylines (polyline6)
+         and the "lon,lat;lon,lat" coordinate strings sent to Mapbox
+Author: Road Explorer Portugal
+==============================================================================
+
+Requesting `geometries=polyline6` from the Directions API instead of GeoJSON
+roughly halves the response size and replaces a huge JSON float array with
+one short string. The string is decoded here with NumPy (no per-character
+Python loop and no extra dependency).
+==============================================================================
+"""
+
+from functools import lru_cache
+from typing import List, Tuple, Union
+
+import numpy as np
+
+
+# Decimal places in request coordinates (~0.1 m)
+COORD_DECIMALS = 6
+
+
+def decode_polyline(encoded: str, precision: int = 6) -> np.ndarray:
+    """
+    Decode an encoded polyline into an (N, 2) array of (lon, lat).
+
+    Each value is a zigzag-encoded delta split into 5-bit groups (low bits
+    first), offset by 63; bit 0x20 marks "more groups follow". Values
+    alternate lat, lon.
+
+    Args:
+        encoded: Encoded polyline string
+        precision: Decimal places used by the encoder (6 for polyline6, 5 for polyline)
+
+    Returns:
+        np.ndarray: (N, 2) float64 array in (lon, lat) order
+
+    Example:
+        >>> decode_polyline("_p~iF~ps|U_ulLnnqC_mqNvxq`@", precision=5)
+        array([[-120.2  ,   38.5  ],
+               [-120.95 ,   40.7  ],
+               [-126.453,   43.252]])
+    """
+    chunks = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    if chunks.size == 0:
+        return np.empty((0, 2), dtype=np.float64)
+
+    # Group boundaries: a value ends at the first chunk without the 0x20 flag
+    ends = (chunks & 0x20) == 0
+    value_id = np.concatenate(([0], np.cumsum(ends)[:-1]))
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    position = np.arange(chunks.size) - starts[value_id]
+
+    # Reassemble each value from its 5-bit groups
+    values = np.zeros(ends.sum(), dtype=np.int64)
+    np.add.at(values, value_id, (chunks & 0x1f) << (5 * position))
+
+    # Undo zigzag, then the delta encoding
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+    latlon = np.cumsum(deltas.reshape(-1, 2), axis=0) / 10.0 ** precision
+
+    return np.ascontiguousarray(latlon[:, ::-1])
+
+
+def _format_array(arr: np.ndarray) -> str:
+    """One %-format over the flattened array (no f-string per point)."""
+    template = ";".join([f"%.{COORD_DECIMALS}f,%.{COORD_DECIMALS}f"] * len(arr))
+    return template % tuple(arr.ravel().tolist())
+
+
+@lru_cache(maxsize=2048)
+def _format_points(points: Tuple[Tuple[float, float], ...]) -> str:
+    """Cached formatting for repeated waypoint windows (retries, overlapping batches)."""
+    return _format_array(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+
+
+def format_coordinates(coordinates: Union[List[Tuple[float, float]], np.ndarray]) -> str:
+    """
+    Format (lon, lat) points as the "lon1,lat1;lon2,lat2;..." URL segment.
+
+    Args:
+        coordinates: (lon, lat) sequence or (N, 2) array
+
+    Returns:
+        str: Semicolon-separated pairs with COORD_DECIMALS decimals
+
+    Example:
+        >>> format_coordinates([(-7.4688, 41.7402), (-7.7441, 41.3006)])
+        '-7.468800,41.740200;-7.744100,41.300600'
+    """
+    if isinstance(coordinates, np.ndarray):
+        return _format_array(coordinates.reshape(-1, 2))
+    return _format_points(tuple(map(tuple, coordinates)))
+
+
+def clean_coordinates(coordinates: Union[List[Tuple[float, float]], np.ndarray]) -> np.ndarray:
+    """
+    Check request points before any network work and drop consecutive duplicates.
+
+    A NaN or swapped (lat, lon) pair would otherwise cost a full round trip
+    (or a 30 s timeout) only to get a 422 back; repeated points are
+    rejected by Mapbox too.
+
+    Args:
+        coordinates: (lon, lat) sequence or (N, 2) array
+
+    Returns:
+        np.ndarray: (M, 2) float64 array, M <= N
+
+    Raises:
+        ValueError: If the shape is not (N, 2), a value is not finite, or a
+            longitude/latitude is outside ±180/±90
+
+    Example:
+        >>> clean_coordinates([(-8.0, 40.0), (-8.0, 40.0), (-7.9, 40.1)])
+        array([[-8. , 40. ],
+               [-7.9, 40.1]])
+    """
+    arr = np.asarray(coordinates, dtype=np.float64)
+    if arr.ndim != 2 or arr.shape[1] != 2:
+        raise ValueError(f"Expected (lon, lat) pairs, got array of shape {arr.shape}")
+    if not np.isfinite(arr).all():
+        raise ValueError("Coordinates contain NaN or infinite values")
+    if not ((np.abs(arr[:, 0]) <= 180).all() and (np.abs(arr[:, 1]) <= 90).all()):
+        raise ValueError("Coordinates out of range (lon ±180, lat ±90) - swapped (lat, lon)?")
+
+    if len(arr) > 1:
+        moved = np.concatenate(([True], (np.diff(arr, axis=0) != 0).any(axis=1)))
+        if not moved.all():
+            arr = arr[moved]
+    return arr
@@ -24,42 +24,34 @@ Benefits:
 """
 
 import os
-import json
 from typing import List, Tuple, Dict, Optional
 from pathlib import Path
 from dataclasses import dataclass
+import numpy as np
+from functools import lru_cache
+from types import MappingProxyType
 
 # Import our modules
-from hybrid_strategy import get_road_geometry_hybrid, GeometryResult
+from json_utils import read_json
+from hybrid_strategy import get_road_geometry_hybrid, GeometryResult, MIN_DENSITY
 from validation import get_quality_report
-from metrics import calculate_total_distance
+from metrics import density_upper_bound, road_metrics
 
 
 # ==============================================================================
 # Helper Functions
 # ==============================================================================
 
-def load_waypoints(waypoints_file: str) -> Dict:
-    """
-    Load waypoints from JSON file.
-
-    Args:
-        waypoints_file: Path to waypoints JSON file (e.g., "n2_waypoints.json")
-
-    Returns:
-        Dict with 'waypoints' list and metadata
-
-    Raises:
-        FileNotFoundError: If waypoints file doesn't exist
-        ValueError: If waypoints data is invalid
-    """
+@lru_cache(maxsize=8)
+def _read_waypoints(waypoints_file: str) -> Dict:
+    """Parse and validate a waypoints file once per name (see load_waypoints)."""
     file_path = Path(__file__).parent / waypoints_file
 
     if not file_path.exists():
         raise FileNotFoundError(f"Waypoints file not found: {waypoints_file}")
 
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # orjson when installed (json_utils falls back to json)
+    data = read_json(file_path)
 
     # Validate structure
     if 'waypoints' not in data or not isinstance(data['waypoints'], list):
@@ -68,13 +60,31 @@ def load_waypoints(waypoints_file: str) -> Dict:
     if len(data['waypoints']) < 2:
         raise ValueError(f"Need at least 2 waypoints, got {len(data['waypoints'])}")
 
-    print(f"📍 Loaded {len(data['waypoints'])} waypoints from {waypoints_file}")
-    print(f"   Road: {data.get('road_name', 'Unknown')}")
-    print(f"   Expected distance: {data.get('total_distance_km', 0):.0f} km")
-
+    data['waypoints'] = tuple(MappingProxyType(wp) for wp in data['waypoints'])
     return data
 
 
+def load_waypoints(waypoints_file: str) -> Dict:
+    """
+    Load waypoints from JSON file.
+
+    The file is read and parsed once per name (processing several roads, or
+    re-running a road, reuses it). Each call gets its own copy of the dict;
+    the waypoints are a tuple of read-only mappings shared with the cache.
+
+    Args:
+        waypoints_file: Path to waypoints JSON file (e.g., "n2_waypoints.json")
+
+    Returns:
+        Dict with 'waypoints' tuple and metadata
+
+    Raises:
+        FileNotFoundError: If waypoints file doesn't exist
+        ValueError: If waypoints data is invalid
+    """
+    return dict(_read_waypoints(waypoints_file))
+
+
 def calculate_section_bbox(waypoint1: Dict, waypoint2: Dict, buffer: float = 0.15) -> Tuple[float, float, float, float]:
     """
     Calculate bounding box for a section between two waypoints.
@@ -109,7 +119,7 @@ def calculate_section_bbox(waypoint1: Dict, waypoint2: Dict, buffer: float = 0.1
     return (south, west, north, east)
 
 
-def merge_section_coordinates(sections: List[GeometryResult]) -> List[Tuple[float, float]]:
+def merge_section_coordinates(sections: List[GeometryResult]) -> np.ndarray:
     """
     Merge coordinates from multiple sections into a single path.
 
@@ -119,33 +129,30 @@ def merge_section_coordinates(sections: List[GeometryResult]) -> List[Tuple[floa
         sections: List of GeometryResult objects (already validated)
 
     Returns:
-        List of (lon, lat) tuples representing the complete road
+        (N, 2) float64 array of (lon, lat) representing the complete road
 
     Example:
-        >>> section1.coordinates = [(0, 0), (1, 1), (2, 2)]
-        >>> section2.coordinates = [(2, 2), (3, 3), (4, 4)]
-        >>> merge_section_coordinates([section1, section2])
-        [(0, 0), (1, 1), (2, 2), (3, 3), (4, 4)]
+        >>> section1.coordinates = np.array([(0, 0), (1, 1), (2, 2)])
+        >>> section2.coordinates = np.array([(2, 2), (3, 3), (4, 4)])
+        >>> merge_section_coordinates([section1, section2]).tolist()
+        [[0.0, 0.0], [1.0, 1.0], [2.0, 2.0], [3.0, 3.0], [4.0, 4.0]]
     """
     if not sections:
-        return []
+        return np.empty((0, 2), dtype=np.float64)
 
-    merged = []
+    parts = [sections[0].coordinates]
 
-    for i, section in enumerate(sections):
+    for section in sections[1:]:
         coords = section.coordinates
 
-        if i == 0:
-            # First section: add all points
-            merged.extend(coords)
+        # Skip first point if it duplicates last (sections should connect at waypoints)
+        if len(parts[-1]) and len(coords) and np.array_equal(parts[-1][-1], coords[0]):
+            parts.append(coords[1:])
         else:
-            # Subsequent sections: skip first point if it duplicates last
-            # (sections should connect at waypoints)
-            if merged and coords and merged[-1] == coords[0]:
-                merged.extend(coords[1:])
-            else:
-                # No overlap - add all points
-                merged.extend(coords)
+            # No overlap - add all points
+            parts.append(coords)
+
+    merged = np.concatenate(parts)
 
     print(f"   🔗 Merged {len(sections)} sections into {len(merged)} points")
 
@@ -204,6 +211,10 @@ def process_road_with_waypoints(
         print(f"❌ Failed to load waypoints: {e}")
         return None
 
+    print(f"📍 Loaded {len(waypoints)} waypoints from {waypoints_file}")
+    print(f"   Road: {waypoints_data.get('road_name', 'Unknown')}")
+    print(f"   Expected distance: {waypoints_data.get('total_distance_km', 0):.0f} km")
+
     # Step 2: Process each section
     sections = []
     failed_sections = []
@@ -287,14 +298,20 @@ def process_road_with_waypoints(
     print(f"\n🔗 Merging {len(sections)} sections...")
     merged_coords = merge_section_coordinates(sections)
 
-    if not merged_coords or len(merged_coords) < 100:
+    if len(merged_coords) < 100:
         print(f"❌ REJECTED: Only {len(merged_coords)} points after merge (need ≥100)")
         return None
 
+    # Step 4.5: Reject hopelessly sparse geometry before the full passes
+    # (points / straight-line distance bounds the real density from above)
+    max_density = density_upper_bound(merged_coords)
+    if max_density < MIN_DENSITY:
+        print(f"❌ REJECTED: Density at most {max_density:.2f} pts/km (need ≥{MIN_DENSITY})")
+        return None
+
     # Step 5: Calculate final metrics
     print(f"\n📊 Calculating final metrics...")
-    final_distance = calculate_total_distance(merged_coords)
-    final_density = len(merged_coords) / final_distance if final_distance > 0 else 0
+    final_distance, final_density = road_metrics(merged_coords)
 
     print(f"   Total points: {len(merged_coords)}")
     print(f"   Total distance: {final_distance:.2f} km")
@@ -352,8 +369,12 @@ def process_road_with_waypoints(
 
 if __name__ == "__main__":
     import os
+    import logging
     from dotenv import load_dotenv
 
+    # hybrid_strategy reports its progress through logging
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     print("=" * 70)
     print("Long Road Processing - Test Suite")
     print("=" * 70)
@@ -35,8 +35,10 @@ Data Sources:
 
 import os
 import json
+import logging
 import time
 from typing import Dict, List, Optional, Callable, Any
+import numpy as np
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
@@ -443,7 +445,7 @@ def prepare_road_data(
 
     Args:
         road_info (Dict): Original road definition
-        coordinates (List): GPS coordinates
+        coordinates (List): GPS coordinates (list of (lon, lat) or (N, 2) array)
         metrics (Dict): Calculated metrics
         elevation_metrics (Dict): Elevation metrics
         data_source (str): Source of geometry data ('osm', 'mapbox_waypoints', etc.)
@@ -451,7 +453,9 @@ def prepare_road_data(
     Returns:
         Dict: Complete road data ready for database
     """
-    # Convert coordinates to WKT LINESTRING format
+    # Convert coordinates to WKT LINESTRING format (.tolist() so an (N, 2)
+    # array is written with the same float repr as a list of tuples)
+    coordinates = np.asarray(coordinates, dtype=np.float64).tolist()
     coords_wkt = ", ".join([f"{lon} {lat}" for lon, lat in coordinates])
     geometry_wkt = f"LINESTRING({coords_wkt})"
 
@@ -493,6 +497,9 @@ def prepare_road_data(
 def main():
     """Main execution function."""
 
+    # Modules that log (e.g. elevation) print their progress as plain lines
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     print("=" * 70)
     print("🚀 Road Explorer Portugal - Data Processing")
     print("=" * 70)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+==============================================================================
+Mapbox Route Cache
+==============================================================================
+Module: route_cache.py
+Purpose: Two-tier (memory LRU + SQLite) cache of Directions/Map Matching geometries
+Author: Road Explorer Portugal
+==============================================================================
+
+Both APIs return the same geometry for the same (coordinates, profile,
+options) request, so re-running Layer 4 for a road while iterating should not
+spend quota again. Entries are keyed by the SHA1 of the request URL without
+the access token and store the decoded (N, 2) float64 coordinates (plus a
+small JSON dict such as the reported distance/duration), so a hit skips the
+network, the rate limiter and the response parsing. This is the only
+on-disk cache for Directions responses.
+
+Only successful responses are stored; failures are retried on the next call.
+==============================================================================
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from json_utils import dumps, loads
+
+
+# Cache configuration
+CACHE_DIR = Path(__file__).parent / "cache"
+ROUTE_CACHE_FILE = CACHE_DIR / "mapbox_routes.sqlite"
+CACHE_MAX_AGE_DAYS = 30  # Road network edits make very old routes stale
+MEM_CACHE_MAX_ENTRIES = 512  # Decoded geometries kept in memory (LRU)
+
+_MEM_CACHE: "OrderedDict[str, Tuple[np.ndarray, Dict]]" = OrderedDict()
+_CACHE_DB: Optional[sqlite3.Connection] = None
+_LOCK = threading.Lock()  # Batches are fetched from worker threads
+
+
+def request_key(url: str, params: Optional[Dict[str, str]] = None) -> str:
+    """
+    Cache key for a request: SHA1 of the URL and options, minus the token.
+
+    Args:
+        url: Request URL (without ?access_token=...)
+        params: Query parameters (access_token is ignored)
+
+    Returns:
+        str: Hex digest
+
+    Example:
+        >>> request_key(f"{MAPBOX_API_BASE}/driving/{coords_str}", params)
+        '3f1c...'
+    """
+    options = sorted((k, v) for k, v in (params or {}).items() if k != 'access_token')
+    return hashlib.sha1(f"{url}|{options}".encode("utf-8")).hexdigest()
+
+
+def _get_cache_db() -> sqlite3.Connection:
+    """Open (once) the route cache database, creating it if needed (caller holds _LOCK)."""
+    global _CACHE_DB
+    if _CACHE_DB is None:
+        CACHE_DIR.mkdir(exist_ok=True)
+        _CACHE_DB = sqlite3.connect(ROUTE_CACHE_FILE, check_same_thread=False)
+        _CACHE_DB.execute("PRAGMA journal_mode=WAL")
+        _CACHE_DB.execute("PRAGMA synchronous=NORMAL")
+        _CACHE_DB.execute(
+            "CREATE TABLE IF NOT EXISTS routes ("
+            "key TEXT PRIMARY KEY, created REAL, coords BLOB, info BLOB)"
+        )
+        columns = {row[1] for row in _CACHE_DB.execute("PRAGMA table_info(routes)")}
+        if "info" not in columns:  # Databases created before route info was stored
+            _CACHE_DB.execute("ALTER TABLE routes ADD COLUMN info BLOB")
+    return _CACHE_DB
+
+
+def _remember(key: str, coords: np.ndarray, info: Dict) -> None:
+    """Insert into the memory LRU, evicting the least recently used (caller holds _LOCK)."""
+    _MEM_CACHE[key] = (coords, info)
+    _MEM_CACHE.move_to_end(key)
+    while len(_MEM_CACHE) > MEM_CACHE_MAX_ENTRIES:
+        _MEM_CACHE.popitem(last=False)
+
+
+def get_entry(key: str) -> Optional[Tuple[np.ndarray, Dict]]:
+    """
+    Look up a cached geometry and its route info (memory first, then SQLite).
+
+    Args:
+        key: Key from request_key()
+
+    Returns:
+        (read-only (N, 2) array of (lon, lat), copy of the info dict), or
+        None on a miss
+    """
+    with _LOCK:
+        entry = _MEM_CACHE.get(key)
+        if entry is not None:
+            _MEM_CACHE.move_to_end(key)
+            return entry[0], dict(entry[1])
+
+        try:
+            row = _get_cache_db().execute(
+                "SELECT created, coords, info FROM routes WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+
+        if row is None or (time.time() - row[0]) / 86400 > CACHE_MAX_AGE_DAYS:
+            return None
+
+        coords = np.frombuffer(row[1], dtype=np.float64).reshape(-1, 2)
+        info = loads(row[2]) if row[2] else {}
+        _remember(key, coords, info)
+        return coords, dict(info)
+
+
+def get(key: str) -> Optional[np.ndarray]:
+    """
+    Look up a cached geometry (memory first, then SQLite).
+
+    Args:
+        key: Key from request_key()
+
+    Returns:
+        Read-only (N, 2) array of (lon, lat), or None on a miss
+    """
+    entry = get_entry(key)
+    return None if entry is None else entry[0]
+
+
+def put(key: str, coords, info: Optional[Dict] = None) -> None:
+    """
+    Store a successful response's geometry in both tiers.
+
+    Args:
+        key: Key from request_key()
+        coords: (N, 2) array or list of (lon, lat)
+        info: Optional JSON-serializable route details (e.g. distance_m)
+    """
+    arr = np.ascontiguousarray(coords, dtype=np.float64).reshape(-1, 2)
+    arr.setflags(write=False)  # Shared between callers
+    info = dict(info or {})
+
+    with _LOCK:
+        _remember(key, arr, info)
+        try:
+            db = _get_cache_db()
+            db.execute(
+                "INSERT OR REPLACE INTO routes (key, created, coords, info) VALUES (?, ?, ?, ?)",
+                (key, time.time(), arr.tobytes(), dumps(info))
+            )
+            db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not write route cache: {e}")
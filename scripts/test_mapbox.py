@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Test script for the Mapbox request helpers (no API needed)
+"""
+
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+
+import numpy as np
+import requests
+
+import http_utils
+import route_cache
+from http_utils import create_session
+from mapbox_matching import mapbox_map_matching
+from polyline_utils import clean_coordinates, decode_polyline
+
+# Keep the test's cache lookups out of scripts/cache
+route_cache.CACHE_DIR = Path(tempfile.mkdtemp())
+route_cache.ROUTE_CACHE_FILE = route_cache.CACHE_DIR / "mapbox_routes.sqlite"
+
+print("=" * 70)
+print("MAPBOX REQUEST HELPERS - COMPREHENSIVE TEST")
+print("=" * 70)
+
+# Test 1: A 429 that outlasts the retries reaches the caller as a response
+print("\n🧪 Test 1: Exhausted 429 Retries (Local Server)")
+print("-" * 70)
+
+
+class AlwaysRateLimited(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(429)
+        self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+server = HTTPServer(("127.0.0.1", 0), AlwaysRateLimited)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+local_url = f"http://127.0.0.1:{server.server_port}/"
+
+session = create_session(retries=2, raise_on_status=False)
+session.mount("http://", session.get_adapter("https://"))
+response = session.get(local_url, timeout=5)
+print(f"✅ raise_on_status=False: HTTP {response.status_code} (expected: 429)")
+assert response.status_code == 429
+
+strict = create_session(retries=2)
+strict.mount("http://", strict.get_adapter("https://"))
+try:
+    strict.get(local_url, timeout=5)
+    raise AssertionError("Expected RetryError with the urllib3 default")
+except requests.exceptions.RetryError:
+    print("✅ raise_on_status=True: RetryError (urllib3 default)")
+server.shutdown()
+
+# Test 2: A 429 drains the bucket shared by Directions and Map Matching
+print("\n🧪 Test 2: HTTP 429 Penalizes the Shared Bucket")
+print("-" * 70)
+
+
+class RateLimitedSession:
+    """Returns a 429 like the pooled session does once retries run out."""
+
+    def get(self, url, params=None, timeout=None):
+        rate_limited = requests.Response()
+        rate_limited.status_code = 429
+        rate_limited.headers["Retry-After"] = "3"
+        rate_limited.url = url
+        return rate_limited
+
+
+result = mapbox_map_matching([(-7.79, 41.16), (-7.75, 41.17)], "pk.test", session=RateLimitedSession())
+tokens = http_utils.MAPBOX_BUCKET._tokens
+print(f"✅ Result: {result} (expected: None)")
+print(f"✅ Bucket tokens after 429: {tokens:.1f} (expected: < 0)")
+assert result is None
+assert tokens < 0, "429 did not drain the token bucket"
+print("✅ All calculations verified!")
+
+# Test 3: Polyline decoding
+print("\n🧪 Test 3: Encoded Polyline Decoding")
+print("-" * 70)
+
+
+def encode_polyline(lonlat, precision=6):
+    """Reference encoder (Google algorithm) for the round-trip check."""
+    out, prev = [], (0, 0)
+    for lon, lat in lonlat:
+        point = (round(lat * 10 ** precision), round(lon * 10 ** precision))
+        for value in (point[0] - prev[0], point[1] - prev[1]):
+            value = ~(value << 1) if value < 0 else value << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        prev = point
+    return "".join(out)
+
+
+# Google's reference vector (precision 5)
+decoded = decode_polyline("_p~iF~ps|U_ulLnnqC_mqNvxq`@", precision=5)
+expected = [(-120.2, 38.5), (-120.95, 40.7), (-126.453, 43.252)]
+print(f"✅ Reference vector: {decoded.tolist()}")
+assert decoded.shape == (3, 2) and np.allclose(decoded, expected, atol=1e-9)
+assert encode_polyline(expected, precision=5) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@", "Reference encoder broken"
+
+empty = decode_polyline("")
+print(f"✅ Empty string: shape {empty.shape} (expected: (0, 2))")
+assert empty.shape == (0, 2)
+
+route = np.round(np.column_stack((
+    np.linspace(-8.7, -6.2, 500),
+    41.0 + 0.3 * np.sin(np.linspace(0, 9, 500))
+)), 6)
+round_trip = decode_polyline(encode_polyline(route))
+print(f"✅ polyline6 round trip: {len(round_trip)} points, max error {np.abs(round_trip - route).max():.1e}°")
+assert np.allclose(round_trip, route, atol=1e-9)
+print("✅ All calculations verified!")
+
+# Test 4: Coordinate pre-validation
+print("\n🧪 Test 4: Coordinate Pre-Validation")
+print("-" * 70)
+invalid_inputs = {
+    "NaN": [(-8.0, 41.0), (float("nan"), 41.1)],
+    "infinite": [(-8.0, 41.0), (-8.1, float("inf"))],
+    "latitude > 90": [(-8.0, 41.0), (-8.1, 95.0)],
+    "longitude < -180": [(-181.0, 41.0), (-8.1, 41.1)],
+    "wrong shape": [(-8.0, 41.0, 100.0)],
+}
+for label, coords in invalid_inputs.items():
+    try:
+        clean_coordinates(coords)
+        raise AssertionError(f"{label} accepted")
+    except ValueError as e:
+        print(f"✅ {label}: rejected ({e})")
+
+cleaned = clean_coordinates([(-8.0, 41.0), (-8.0, 41.0), (-8.1, 41.1), (-8.1, 41.1), (-8.0, 41.0)])
+print(f"✅ Consecutive duplicates: 5 → {len(cleaned)} points (expected: 3)")
+assert cleaned.tolist() == [[-8.0, 41.0], [-8.1, 41.1], [-8.0, 41.0]], "Only consecutive repeats may be dropped"
+print("✅ All calculations verified!")
+
+# Test 5: Route cache (memory LRU + SQLite)
+print("\n🧪 Test 5: Route Cache")
+print("-" * 70)
+key = route_cache.request_key("https://api.mapbox.com/directions/v5/mapbox/driving/x", {"access_token": "pk.a"})
+assert key == route_cache.request_key("https://api.mapbox.com/directions/v5/mapbox/driving/x", {"access_token": "pk.b"}), \
+    "Token must not be part of the cache key"
+
+geometry = [(-8.0, 41.0), (-8.1, 41.1), (-8.2, 41.2)]
+route_cache.put(key, geometry)
+hit = route_cache.get(key)
+print(f"✅ Memory hit: {len(hit)} points, same object on repeat: {route_cache.get(key) is hit}")
+assert route_cache.get(key) is hit and np.allclose(hit, geometry)
+assert not hit.flags.writeable, "Cached arrays are shared and must be read-only"
+
+saved_max = route_cache.MEM_CACHE_MAX_ENTRIES
+route_cache.MEM_CACHE_MAX_ENTRIES = 2
+route_cache._MEM_CACHE.clear()
+route_cache.put("lru-0", geometry)
+route_cache.put("lru-1", geometry)
+route_cache.get("lru-0")  # Now most recently used
+route_cache.put("lru-2", geometry)
+route_cache.MEM_CACHE_MAX_ENTRIES = saved_max
+print(f"✅ LRU with 2 slots keeps: {list(route_cache._MEM_CACHE)} (expected: lru-0, lru-2)")
+assert list(route_cache._MEM_CACHE) == ["lru-0", "lru-2"], "Recently read entry was evicted"
+
+route_cache._MEM_CACHE.clear()
+from_disk = route_cache.get(key)
+print(f"✅ SQLite hit after clearing memory: {len(from_disk)} points, read-only: {not from_disk.flags.writeable}")
+assert np.allclose(from_disk, geometry) and not from_disk.flags.writeable
+
+route_cache.put("info", geometry, {"distance_m": 1234.5, "duration_s": 60.0})
+route_cache._MEM_CACHE.clear()
+coords, info = route_cache.get_entry("info")
+print(f"✅ Route info from SQLite: {info}")
+assert np.allclose(coords, geometry) and info == {"distance_m": 1234.5, "duration_s": 60.0}
+
+route_cache._MEM_CACHE.clear()
+expired = time.time() - (route_cache.CACHE_MAX_AGE_DAYS + 1) * 86400
+with route_cache._LOCK:
+    route_cache._get_cache_db().execute("UPDATE routes SET created = ? WHERE key = ?", (expired, key))
+print(f"✅ Entry older than {route_cache.CACHE_MAX_AGE_DAYS} days: {route_cache.get(key)} (expected: None)")
+assert route_cache.get(key) is None, "Expired SQLite entry returned"
+print("✅ All calculations verified!")
+
+print("\n" + "=" * 70)
+print("✅ ALL TESTS PASSED!")
+print("=" * 70)
@@ -5,11 +5,16 @@ Test script for metrics calculations
 
 from metrics import (
     calculate_total_distance,
+    haversine_path_km,
     calculate_bearing,
     calculate_angle_difference,
     analyze_curves,
-    calculate_all_metrics
+    calculate_all_metrics,
+    douglas_peucker,
+    measure_and_simplify
 )
+import metrics
+import numpy as np
 
 print("=" * 70)
 print("METRICS CALCULATION - COMPREHENSIVE TEST")
@@ -26,6 +31,8 @@ test_coords = [
 distance = calculate_total_distance(test_coords)
 print(f"✅ Distance for 3 points: {distance} km")
 print(f"   Expected: ~2.8 km")
+haversine_distance = haversine_path_km(test_coords)
+print(f"✅ Haversine distance: {haversine_distance:.2f} km (expected: within 0.5% of geodesic)")
 
 # Test 2: Bearing Calculation
 print("\n🧪 Test 2: Bearing Calculation")
@@ -106,6 +113,72 @@ print(f"✅ Empty coordinates: {empty_result['distance_km']} km (expected: 0)")
 print(f"✅ Single point: {single_point['distance_km']} km (expected: 0)")
 print(f"✅ Two points: {two_points['distance_km']} km (expected: ~1.4)")
 
+# Test 7: Douglas-Peucker Simplification
+print("\n🧪 Test 7: Douglas-Peucker Simplification")
+print("-" * 70)
+# Middle point is ~1.1 m off the line: dropped at 5 m, kept at 0.5 m
+nearly_straight = [(-8.0, 40.0), (-7.9, 40.00001), (-7.8, 40.0)]
+simplified = douglas_peucker(nearly_straight, 5.0)
+print(f"✅ Docstring example: {simplified.tolist()}")
+assert simplified.tolist() == [[-8.0, 40.0], [-7.8, 40.0]], "Docstring example changed"
+assert len(douglas_peucker(nearly_straight, 0.5)) == 3, "Point beyond epsilon dropped"
+
+# Noisy winding trace (~5 m jitter), deterministic
+rng = np.random.default_rng(42)
+t = np.linspace(0.0, 1.0, 2000)
+noisy_trace = np.column_stack((
+    -8.0 + 0.5 * t + rng.normal(0, 5e-5, t.size),
+    40.0 + 0.05 * np.sin(20 * t) + rng.normal(0, 5e-5, t.size)
+))
+
+counts = []
+for epsilon_m in (1.0, 5.0, 20.0, 100.0):
+    result = douglas_peucker(noisy_trace, epsilon_m)
+    assert (result[0] == noisy_trace[0]).all() and (result[-1] == noisy_trace[-1]).all(), \
+        f"Endpoints not kept at {epsilon_m} m"
+    counts.append(len(result))
+print(f"✅ Points kept at 1/5/20/100 m: {counts} (expected: non-increasing)")
+assert counts == sorted(counts, reverse=True), "Larger epsilon kept more points"
+
+for cap in (2, 10, 50):
+    capped = douglas_peucker(noisy_trace, 1.0, max_vertices=cap)
+    print(f"✅ max_vertices={cap}: {len(capped)} points")
+    assert len(capped) <= cap, "max_vertices exceeded"
+    assert (capped[0] == noisy_trace[0]).all() and (capped[-1] == noisy_trace[-1]).all()
+print("✅ All calculations verified!")
+
+# Test 8: Compiled vs NumPy Douglas-Peucker
+print("\n🧪 Test 8: Douglas-Peucker Kernel Parity")
+print("-" * 70)
+kernel = metrics._get_dp_kernel()
+print(f"✅ Numba kernel: {'available' if kernel is not None else 'not installed (NumPy only)'}")
+assert len(noisy_trace) >= metrics.DP_KERNEL_MIN_POINTS
+tolerance = 5.0 / 1000.0 / metrics.EARTH_RADIUS_KM
+for epsilon_m in (1.0, 5.0, 20.0):
+    # max_vertices above the point count forces the NumPy heap path
+    compiled = douglas_peucker(noisy_trace, epsilon_m)
+    numpy_path = douglas_peucker(noisy_trace, epsilon_m, max_vertices=len(noisy_trace) + 1)
+    print(f"✅ ε = {epsilon_m:.0f} m: kernel {len(compiled)} / NumPy {len(numpy_path)} points")
+    assert np.array_equal(compiled, numpy_path), f"Kernel and NumPy paths differ at {epsilon_m} m"
+
+# Same loop interpreted (what Numba compiles) on a shorter prefix
+prefix = noisy_trace[:300]
+interpreted = prefix[metrics._dp_keep_loop(metrics._unit_vectors(prefix), tolerance)]
+assert np.array_equal(interpreted, douglas_peucker(prefix, 5.0, max_vertices=len(prefix) + 1)), \
+    "Interpreted kernel differs from the NumPy path"
+print("✅ All calculations verified!")
+
+# Test 9: Fused Length + Simplification
+print("\n🧪 Test 9: measure_and_simplify (Cython kernel if built)")
+print("-" * 70)
+extension = metrics._get_geom_extension()
+print(f"✅ _geom_kernel: {'built' if extension is not None else 'not built (fallback)'}")
+distance_km, simplified = measure_and_simplify(noisy_trace, 5.0)
+print(f"✅ {distance_km:.3f} km, {len(noisy_trace)} → {len(simplified)} points")
+assert abs(distance_km - haversine_path_km(noisy_trace)) < 1e-9, "Length differs from haversine_path_km"
+assert np.array_equal(simplified, douglas_peucker(noisy_trace, 5.0)), "Points differ from douglas_peucker"
+print("✅ All calculations verified!")
+
 print("\n" + "=" * 70)
 print("✅ ALL TESTS PASSED!")
 print("=" * 70)
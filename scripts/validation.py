@@ -97,7 +97,7 @@ def validate_road_coordinates(road_info):
 
     # Validate start point (if coordinates provided)
     coordinates = road_info.get('coordinates', [])
-    if coordinates and len(coordinates) > 0:
+    if coordinates is not None and len(coordinates) > 0:
         start_lon, start_lat = coordinates[0]
         start_name = road_info.get('start_point_name', 'Start point')
 
@@ -109,7 +109,7 @@ def validate_road_coordinates(road_info):
             errors.append(error_msg)
 
     # Validate end point (if coordinates provided)
-    if coordinates and len(coordinates) > 1:
+    if coordinates is not None and len(coordinates) > 1:
         end_lon, end_lat = coordinates[-1]
         end_name = road_info.get('end_point_name', 'End point')
 
@@ -121,7 +121,7 @@ def validate_road_coordinates(road_info):
             errors.append(error_msg)
 
     # Validate a few intermediate points (sample every 10th point)
-    if coordinates and len(coordinates) > 2:
+    if coordinates is not None and len(coordinates) > 2:
         sample_interval = max(1, len(coordinates) // 10)
         for i in range(1, len(coordinates) - 1, sample_interval):
             lon, lat = coordinates[i]
@@ -218,7 +218,7 @@ def validate_geometry_density(coordinates, distance_km, road_code="Unknown"):
         >>> validate_geometry_density(coords, 10.0, "N2")
         (False, 0.2, "N2: Density 0.20 < 1.0 points/km - REJECTED")
     """
-    if not coordinates or distance_km <= 0:
+    if coordinates is None or len(coordinates) == 0 or distance_km <= 0:
         return (False, 0.0, f"{road_code}: Invalid coordinates or distance")
 
     point_count = len(coordinates)
@@ -303,7 +303,7 @@ def validate_all_points_in_portugal(coordinates, road_code="Unknown"):
     return (len(errors) == 0, errors)
 
 
-def get_quality_report(road_info, coordinates, distance_km):
+def get_quality_report(road_info, coordinates, distance_km, geo_valid=None):
     """
     Generate comprehensive quality report for a road.
 
@@ -313,7 +313,11 @@ def get_quality_report(road_info, coordinates, distance_km):
     Args:
         road_info (dict): Road information dict with 'code' and other metadata
         coordinates (list): List of (lon, lat) tuples
-        distance_km (float): Total road distance in kilometers
+        distance_km (float): Total road distance in kilometers, as already
+            computed by the caller (used as given, never recomputed here)
+        geo_valid (bool): Optional bounds result the caller already has (e.g.
+            from a vectorized pass); True skips the per-point check, which
+            then only runs to list the offending points
 
     Returns:
         dict: Quality report with metrics and validation results
@@ -344,9 +348,12 @@ def get_quality_report(road_info, coordinates, distance_km):
     )
 
     # Validate geography
-    geo_valid, geo_errors = validate_all_points_in_portugal(
-        coordinates, road_code
-    )
+    if geo_valid:
+        geo_errors = []
+    else:
+        geo_valid, geo_errors = validate_all_points_in_portugal(
+            coordinates, road_code
+        )
 
     # Determine overall quality
     if not density_valid or not geo_valid: